@@ -12,3 +12,6 @@ python manage.py collectstatic --noinput
 # Appliquer les migrations
 python manage.py migrate --noinput
 
+# Créer la table du cache partagé entre le service web et harvest_worker (sans effet si elle existe)
+python manage.py createcachetable
+
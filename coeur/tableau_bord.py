@@ -0,0 +1,77 @@
+"""
+Données du tableau de bord de la page d'accueil.
+
+Les compteurs, les catégories principales et les tendances mensuelles sont
+calculés en quelques requêtes groupées puis conservés dans le cache Django.
+Le cache est invalidé explicitement en fin de moissonnage; la durée de vie
+(settings.TABLEAU_BORD_DUREE_CACHE) ne sert que de filet de sécurité pour les
+modifications faites hors moissonnage.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from donnees.models import Organisation, Categorie, JeuDonnees, Ressource
+
+CLE_CACHE = 'coeur:tableau_bord'
+NOMBRE_CATEGORIES = 10
+NOMBRE_MOIS = 12
+
+
+def _debut_mois(date, decalage=0):
+    """Premier jour du mois de date, décalé de decalage mois (négatif = passé)"""
+    index = date.year * 12 + date.month - 1 + decalage
+    return date.replace(year=index // 12, month=index % 12 + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def calculer_tableau_bord():
+    """
+    Calcule les données du tableau de bord
+
+    Returns:
+        dict: compteurs, répartition des catégories (top 10) et jeux créés
+              par mois calendaire sur les 12 derniers mois
+    """
+    # Répartition thématique: jointure agrégée sur la table d'association
+    top_categories = (
+        Categorie.objects.annotate(nombre=Count('jeux_donnees'))
+        .filter(nombre__gt=0)
+        .order_by('-nombre', 'nom')[:NOMBRE_CATEGORIES]
+    )
+
+    # Tendances temporelles: un seul regroupement par mois calendaire
+    maintenant = timezone.localtime()
+    mois = [_debut_mois(maintenant, -decalage) for decalage in range(NOMBRE_MOIS - 1, -1, -1)]
+    tendances = {debut.strftime('%Y-%m'): 0 for debut in mois}
+    par_mois = (
+        JeuDonnees.objects.filter(date_creation__gte=mois[0])
+        .annotate(mois=TruncMonth('date_creation'))
+        .values_list('mois')
+        .annotate(nombre=Count('pk'))
+        .order_by()
+    )
+    for debut, nombre in par_mois:
+        cle = timezone.localtime(debut).strftime('%Y-%m')
+        if cle in tendances:
+            tendances[cle] += nombre
+
+    return {
+        'nombre_organisations': Organisation.objects.count(),
+        'nombre_jeux_donnees': JeuDonnees.objects.count(),
+        'nombre_ressources': Ressource.objects.count(),
+        'repartition_categories': {categorie.nom: categorie.nombre for categorie in top_categories},
+        'tendances_temporelles': tendances,
+    }
+
+
+def obtenir_tableau_bord():
+    """Retourne les données du tableau de bord depuis le cache (calculées au besoin)"""
+    return cache.get_or_set(
+        CLE_CACHE, calculer_tableau_bord, getattr(settings, 'TABLEAU_BORD_DUREE_CACHE', 900)
+    )
+
+
+def invalider_tableau_bord():
+    """Invalide le tableau de bord mis en cache (appelé en fin de moissonnage)"""
+    cache.delete(CLE_CACHE)
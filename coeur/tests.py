@@ -1,6 +1,10 @@
+from django.core.cache import cache
 from django.test import TestCase, Client
 from django.urls import reverse
+from django.utils import timezone
+from donnees.categories import reconstruire_liens
 from donnees.models import Organisation, JeuDonnees, Ressource
+from .tableau_bord import calculer_tableau_bord, invalider_tableau_bord, _debut_mois
 
 
 class AccueilViewTest(TestCase):
@@ -8,6 +12,7 @@ class AccueilViewTest(TestCase):
     
     def setUp(self):
         """Configuration initiale"""
+        cache.clear()
         self.client = Client()
         self.organisation = Organisation.objects.create(
             nom="Ville de Montréal",
@@ -52,3 +57,50 @@ class AccueilViewTest(TestCase):
         self.assertEqual(context['nombre_organisations'], 1)
         self.assertEqual(context['nombre_jeux_donnees'], 1)
         self.assertEqual(context['nombre_ressources'], 1)
+
+
+class TableauBordTest(TestCase):
+    """Tests pour les données du tableau de bord"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.organisation = Organisation.objects.create(nom="Ville de Québec", type_organisation="Ville")
+        for titre, categories in [('A', 'Transport; Culture'), ('B', 'Transport'), ('C', '')]:
+            JeuDonnees.objects.create(
+                titre=titre, description='', organisation=self.organisation, categories=categories
+            )
+        reconstruire_liens()
+    
+    def test_debut_mois(self):
+        """Test du calcul des mois calendaires"""
+        date = timezone.now().replace(year=2025, month=2, day=28)
+        self.assertEqual(_debut_mois(date, -2).strftime('%Y-%m-%d'), '2024-12-01')
+        self.assertEqual(_debut_mois(date, 11).strftime('%Y-%m-%d'), '2026-01-01')
+    
+    def test_calculer_tableau_bord(self):
+        """Test des catégories principales et des tendances mensuelles"""
+        ancien = JeuDonnees.objects.get(titre='C')
+        JeuDonnees.objects.filter(pk=ancien.pk).update(date_creation=_debut_mois(timezone.now(), -1))
+        
+        with self.assertNumQueries(5):
+            donnees = calculer_tableau_bord()
+        
+        self.assertEqual(donnees['repartition_categories'], {'Transport': 2, 'Culture': 1})
+        tendances = donnees['tendances_temporelles']
+        self.assertEqual(len(tendances), 12)
+        self.assertEqual(list(tendances.values())[-2:], [1, 2])
+        self.assertEqual(list(tendances)[-1], timezone.localtime().strftime('%Y-%m'))
+    
+    def test_cache_invalide_en_fin_de_moissonnage(self):
+        """Test que l'accueil est servi depuis le cache jusqu'à l'invalidation"""
+        self.client.get(reverse('accueil'))
+        JeuDonnees.objects.create(titre='D', description='', organisation=self.organisation)
+        
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('accueil'))
+        self.assertEqual(response.context['nombre_jeux_donnees'], 3)
+        
+        invalider_tableau_bord()
+        response = self.client.get(reverse('accueil'))
+        self.assertEqual(response.context['nombre_jeux_donnees'], 4)
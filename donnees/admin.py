@@ -1,14 +1,15 @@
 from django.contrib import admin
+from .categories import lier_categories_et_etiquettes
 from .models import (
-    Organisation, Categorie, JeuDonnees, Ressource,
-    SourceDonnees, ConfigurationFiltres, ConfigurationPlanification
+    Organisation, Categorie, Etiquette, JeuDonnees, Ressource,
+    SourceDonnees, ConfigurationFiltres
 )
 
 @admin.register(Organisation)
 class OrganisationAdmin(admin.ModelAdmin):
     list_display = ['nom', 'type_organisation', 'nombre_jeux_donnees', 'date_creation']
-    list_filter = ['type_organisation', 'date_creation']
-    search_fields = ['nom', 'nom_complet']
+    list_filter = ['type_organisation', 'source', 'date_creation']
+    search_fields = ['nom', 'nom_complet', 'ckan_name', 'ckan_id']
     ordering = ['nom']
 
 @admin.register(Categorie)
@@ -17,26 +18,37 @@ class CategorieAdmin(admin.ModelAdmin):
     search_fields = ['nom']
     ordering = ['nom']
 
+@admin.register(Etiquette)
+class EtiquetteAdmin(admin.ModelAdmin):
+    list_display = ['nom']
+    search_fields = ['nom']
+    ordering = ['nom']
+
 @admin.register(JeuDonnees)
 class JeuDonneesAdmin(admin.ModelAdmin):
     list_display = ['titre', 'organisation', 'niveau_acces', 'date_creation']
-    list_filter = ['organisation', 'niveau_acces', 'date_creation']
-    search_fields = ['titre', 'description', 'categories']
+    list_filter = ['organisation', 'niveau_acces', 'source', 'date_creation']
+    search_fields = ['titre', 'description', 'categories', 'ckan_name', 'ckan_id']
     ordering = ['-date_creation']
     raw_id_fields = ['organisation']
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Les relations suivent les champs texte saisis
+        lier_categories_et_etiquettes([obj])
 
 @admin.register(Ressource)
 class RessourceAdmin(admin.ModelAdmin):
     list_display = ['nom', 'jeu_donnees', 'format_fichier', 'type_ressource']
-    list_filter = ['format_fichier', 'type_ressource', 'date_creation']
-    search_fields = ['nom', 'description']
+    list_filter = ['format_fichier', 'type_ressource', 'source', 'date_creation']
+    search_fields = ['nom', 'description', 'ckan_id']
     ordering = ['nom']
     raw_id_fields = ['jeu_donnees']
 
 
 @admin.register(SourceDonnees)
 class SourceDonneesAdmin(admin.ModelAdmin):
-    list_display = ['nom', 'url_base', 'active', 'derniere_synchronisation', 'date_creation']
+    list_display = ['nom', 'url_base', 'mode_moissonnage', 'active', 'derniere_synchronisation', 'date_creation']
     list_filter = ['active', 'date_creation']
     search_fields = ['nom', 'description', 'url_base']
     ordering = ['nom']
@@ -46,6 +58,9 @@ class SourceDonneesAdmin(admin.ModelAdmin):
         ('Informations générales', {
             'fields': ('nom', 'url_base', 'description', 'active')
         }),
+        ('Moissonnage', {
+            'fields': ('mode_moissonnage', 'taille_page', 'concurrence_max')
+        }),
         ('Synchronisation', {
             'fields': ('derniere_synchronisation',)
         }),
@@ -93,30 +108,3 @@ class ConfigurationFiltresAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
-
-
-@admin.register(ConfigurationPlanification)
-class ConfigurationPlanificationAdmin(admin.ModelAdmin):
-    list_display = ['nom', 'source', 'frequence', 'active', 'prochaine_execution', 'derniere_execution']
-    list_filter = ['active', 'frequence', 'source', 'date_creation']
-    search_fields = ['nom', 'description']
-    ordering = ['-date_creation']
-    readonly_fields = ['date_creation', 'date_modification', 'prochaine_execution', 'derniere_execution']
-    
-    fieldsets = (
-        ('Informations générales', {
-            'fields': ('nom', 'source', 'configuration_filtres', 'active', 'description')
-        }),
-        ('Planification', {
-            'fields': ('frequence', 'heure_execution', 'jour_semaine', 'jour_mois', 'expression_cron'),
-            'description': 'Configurez la planification selon la fréquence choisie. Seuls les champs pertinents seront utilisés.'
-        }),
-        ('Exécution', {
-            'fields': ('prochaine_execution', 'derniere_execution',),
-            'classes': ('collapse',)
-        }),
-        ('Dates', {
-            'fields': ('date_creation', 'date_modification'),
-            'classes': ('collapse',)
-        }),
-    )
@@ -2,14 +2,31 @@ from rest_framework import viewsets, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db.models import Q
-from .models import Organisation, Categorie, JeuDonnees, Ressource
+from .categories import lier_categories_et_etiquettes, recompter_categories
+from .statistiques import invalider_statistiques, obtenir_statistiques
+from .models import Organisation, Categorie, JeuDonnees, JeuDonneesCategorie, JeuDonneesEtiquette, Ressource
 from .serializers import (
     OrganisationSerializer, OrganisationDetailSerializer,
     CategorieSerializer, JeuDonneesSerializer, JeuDonneesDetailSerializer,
     RessourceSerializer
 )
 
-class OrganisationViewSet(viewsets.ModelViewSet):
+class InvaliderStatistiquesMixin:
+    """Invalide l'instantané des statistiques après chaque modification via l'API (recalcul à la lecture)"""
+    
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        invalider_statistiques()
+    
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        invalider_statistiques()
+    
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        invalider_statistiques()
+
+class OrganisationViewSet(InvaliderStatistiquesMixin, viewsets.ModelViewSet):
     """ViewSet pour les organisations"""
     
     queryset = Organisation.objects.all()
@@ -43,7 +60,7 @@ class CategorieViewSet(viewsets.ModelViewSet):
     ordering_fields = ['nom', 'nombre_jeux_donnees']
     ordering = ['nom']
 
-class JeuDonneesViewSet(viewsets.ModelViewSet):
+class JeuDonneesViewSet(InvaliderStatistiquesMixin, viewsets.ModelViewSet):
     """ViewSet pour les jeux de données"""
     
     queryset = JeuDonnees.objects.select_related('organisation').all()
@@ -65,13 +82,46 @@ class JeuDonneesViewSet(viewsets.ModelViewSet):
             except (ValueError, TypeError):
                 pass
         
-        # Filtre par catégorie (nom de la catégorie dans le champ categories)
-        categorie = self.request.query_params.get('categories', None)
-        if categorie:
-            queryset = queryset.filter(categories__icontains=categorie)
+        # Filtres par catégorie et par étiquette: nom exact (sans distinction de casse)
+        # résolu sur la table des noms, puis jointure indexée sur la table d'association.
+        # Les variantes *_contient gardent l'ancienne correspondance partielle (non indexée).
+        filtres_noms = [
+            ('categories', JeuDonneesCategorie, 'categorie__nom__iexact'),
+            ('categories_contient', JeuDonneesCategorie, 'categorie__nom__icontains'),
+            ('etiquettes', JeuDonneesEtiquette, 'etiquette__nom__iexact'),
+            ('etiquettes_contient', JeuDonneesEtiquette, 'etiquette__nom__icontains'),
+        ]
+        for parametre, association, recherche in filtres_noms:
+            valeur = self.request.query_params.get(parametre, '').strip()
+            if valeur:
+                jeux = association.objects.filter(**{recherche: valeur}).values('jeu_donnees_id')
+                queryset = queryset.filter(pk__in=jeux)
         
         return queryset
     
+    def perform_create(self, serializer):
+        """Crée le jeu de données et ses relations catégories/étiquettes"""
+        super().perform_create(serializer)
+        lier_categories_et_etiquettes([serializer.instance])
+        recompter_categories(self._categories_liees(serializer.instance))
+    
+    def perform_update(self, serializer):
+        """Met à jour le jeu de données et ses relations catégories/étiquettes"""
+        anciennes = self._categories_liees(serializer.instance)
+        super().perform_update(serializer)
+        lier_categories_et_etiquettes([serializer.instance])
+        recompter_categories(anciennes | self._categories_liees(serializer.instance))
+    
+    def perform_destroy(self, instance):
+        """Supprime le jeu de données et décompte ses catégories"""
+        anciennes = self._categories_liees(instance)
+        super().perform_destroy(instance)
+        recompter_categories(anciennes)
+    
+    @staticmethod
+    def _categories_liees(jeu_donnees):
+        return set(jeu_donnees.categories_liees.values_list('pk', flat=True))
+    
     def get_serializer_class(self):
         """Utilise le sérialiseur détaillé pour la vue détaillée"""
         if self.action == 'retrieve':
@@ -86,7 +136,7 @@ class JeuDonneesViewSet(viewsets.ModelViewSet):
         serializer = RessourceSerializer(ressources, many=True)
         return Response(serializer.data)
 
-class RessourceViewSet(viewsets.ModelViewSet):
+class RessourceViewSet(InvaliderStatistiquesMixin, viewsets.ModelViewSet):
     """ViewSet pour les ressources"""
     
     queryset = Ressource.objects.select_related('jeu_donnees__organisation').all()
@@ -110,72 +160,11 @@ class RessourceViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def statistiques(self, request):
-        """Endpoint pour récupérer les statistiques complètes (ressources, jeux de données, organisations)"""
-        from django.db.models import Count, Sum
-        from collections import defaultdict
-        from datetime import datetime
-        
-        ressources_queryset = self.get_queryset()
-        jeux_donnees_queryset = JeuDonnees.objects.select_related('organisation').all()
-        
-        stats = {
-            # Statistiques des ressources
-            'total_ressources': ressources_queryset.count(),
-            'formats': {},
-            'types': {},
-            'taille_totale': 0,
-            # Statistiques globales
-            'stats_organisations': Organisation.objects.count(),
-            'stats_jeux_donnees': JeuDonnees.objects.count(),
-            'stats_ressources': ressources_queryset.count(),
-            # Statistiques temporelles (pour le graphique d'évolution)
-            'evolution_temporelle': {},
-            # Statistiques par organisation (pour le graphique de distribution)
-            'distribution_organisations': {},
-        }
-        
-        # Calculer les statistiques des ressources
-        for ressource in ressources_queryset:
-            # Compter les formats
-            format_fichier = ressource.format_fichier or 'Non spécifié'
-            stats['formats'][format_fichier] = stats['formats'].get(format_fichier, 0) + 1
-            
-            # Compter les types
-            type_ressource = ressource.type_ressource or 'Non spécifié'
-            stats['types'][type_ressource] = stats['types'].get(type_ressource, 0) + 1
-            
-            # Calculer la taille totale
-            if ressource.taille:
-                stats['taille_totale'] += ressource.taille
-        
-        # Calculer l'évolution temporelle (groupement par mois/année)
-        evolution = defaultdict(int)
-        for jeu in jeux_donnees_queryset:
-            if jeu.date_creation:
-                try:
-                    # date_creation est un DateTimeField Django, donc c'est déjà un objet datetime
-                    date = jeu.date_creation
-                    if hasattr(date, 'year') and hasattr(date, 'month'):
-                        month_year = f"{date.year}-{str(date.month).zfill(2)}"
-                        evolution[month_year] += 1
-                except (ValueError, AttributeError, TypeError):
-                    pass
-        
-        # Trier et prendre les 12 derniers mois
-        stats['evolution_temporelle'] = dict(
-            sorted(evolution.items())[-12:]
-        )
-        
-        # Calculer la distribution par organisation
-        distribution_org = defaultdict(int)
-        for jeu in jeux_donnees_queryset:
-            if jeu.organisation:
-                org_name = jeu.organisation.nom if hasattr(jeu.organisation, 'nom') else 'Inconnu'
-                distribution_org[org_name] += 1
-        
-        # Trier par nombre décroissant et prendre le top 10
-        stats['distribution_organisations'] = dict(
-            sorted(distribution_org.items(), key=lambda x: x[1], reverse=True)[:10]
-        )
+        """
+        Endpoint pour récupérer les statistiques complètes (ressources, jeux de données, organisations)
         
-        return Response(stats)
+        Sert l'instantané matérialisé, recalculé en fin de moissonnage et à la
+        première lecture qui suit une modification via l'API.
+        """
+        instantane = obtenir_statistiques()
+        return Response({**instantane.donnees, 'date_calcul': instantane.date_calcul})
@@ -0,0 +1,133 @@
+"""
+Synchronisation des catégories et étiquettes à partir des jeux de données.
+
+Moteur partagé par le moissonneur, l'API et la commande sync_categories:
+les champs texte ("Transport; Tourisme") restent la source saisie, les
+relations JeuDonneesCategorie / JeuDonneesEtiquette en sont la vue indexée
+utilisée pour le filtrage et les compteurs.
+"""
+from django.db.models import Count
+from .models import Categorie, Etiquette, JeuDonnees, JeuDonneesCategorie, JeuDonneesEtiquette
+
+DESCRIPTION_CATEGORIE_AUTOMATIQUE = 'Catégorie extraite automatiquement depuis les jeux de données'
+
+TAILLE_LOT = 1000
+
+
+def separer_categories(valeur):
+    """Sépare un champ de catégories ("Transport; Tourisme") en liste de noms"""
+    if not valeur:
+        return []
+    return [categorie.strip()[:200] for categorie in valeur.split(';') if categorie.strip()]
+
+
+def _obtenir_identifiants(modele, noms, **valeurs_defaut):
+    """
+    Crée en masse les lignes manquantes et retourne {nom: pk}
+
+    Returns:
+        tuple: ({nom: pk}, nombre de lignes créées)
+    """
+    if not noms:
+        return {}, 0
+
+    identifiants = dict(modele.objects.filter(nom__in=noms).values_list('nom', 'pk'))
+    # Ordre stable: deux moissonnages concurrents insèrent les mêmes noms dans le même ordre
+    manquants = [modele(nom=nom, **valeurs_defaut) for nom in sorted(noms) if nom not in identifiants]
+    if manquants:
+        modele.objects.bulk_create(manquants, batch_size=TAILLE_LOT, ignore_conflicts=True)
+        identifiants = dict(modele.objects.filter(nom__in=noms).values_list('nom', 'pk'))
+    return identifiants, len(manquants)
+
+
+def lier_categories_et_etiquettes(jeux):
+    """
+    Reconstruit les relations catégories/étiquettes d'un lot de jeux de données
+
+    Les lignes Categorie et Etiquette manquantes sont créées, puis les
+    associations du lot sont remplacées en quelques requêtes groupées.
+
+    Args:
+        jeux: Jeux de données enregistrés (avec clé primaire)
+
+    Returns:
+        int: Nombre de catégories créées
+    """
+    jeux = [jeu for jeu in jeux if jeu.pk is not None]
+    if not jeux:
+        return 0
+
+    categories_par_jeu = {jeu.pk: set(separer_categories(jeu.categories)) for jeu in jeux}
+    etiquettes_par_jeu = {jeu.pk: set(separer_categories(jeu.etiquettes)) for jeu in jeux}
+
+    categories, categories_creees = _obtenir_identifiants(
+        Categorie, set().union(*categories_par_jeu.values()),
+        description=DESCRIPTION_CATEGORIE_AUTOMATIQUE
+    )
+    etiquettes, _ = _obtenir_identifiants(Etiquette, set().union(*etiquettes_par_jeu.values()))
+
+    identifiants_jeux = list(categories_par_jeu)
+    JeuDonneesCategorie.objects.filter(jeu_donnees_id__in=identifiants_jeux).delete()
+    JeuDonneesEtiquette.objects.filter(jeu_donnees_id__in=identifiants_jeux).delete()
+
+    JeuDonneesCategorie.objects.bulk_create(
+        [
+            JeuDonneesCategorie(jeu_donnees_id=jeu_id, categorie_id=categories[nom])
+            for jeu_id, noms in categories_par_jeu.items()
+            for nom in noms
+        ],
+        batch_size=TAILLE_LOT
+    )
+    JeuDonneesEtiquette.objects.bulk_create(
+        [
+            JeuDonneesEtiquette(jeu_donnees_id=jeu_id, etiquette_id=etiquettes[nom])
+            for jeu_id, noms in etiquettes_par_jeu.items()
+            for nom in noms
+        ],
+        batch_size=TAILLE_LOT
+    )
+
+    return categories_creees
+
+
+def reconstruire_liens():
+    """
+    Reconstruit les relations de tous les jeux de données par lots
+
+    Returns:
+        int: Nombre de catégories créées
+    """
+    categories_creees = 0
+    lot = []
+    jeux = JeuDonnees.objects.only('pk', 'categories', 'etiquettes').order_by('pk')
+    for jeu in jeux.iterator(chunk_size=TAILLE_LOT):
+        lot.append(jeu)
+        if len(lot) >= TAILLE_LOT:
+            categories_creees += lier_categories_et_etiquettes(lot)
+            lot = []
+    categories_creees += lier_categories_et_etiquettes(lot)
+    return categories_creees
+
+
+def recompter_categories(identifiants=None):
+    """
+    Recalcule le nombre de jeux de données de chaque catégorie en masse
+
+    Le décompte est une jointure agrégée sur la table d'association.
+
+    Args:
+        identifiants: Clés primaires des seules catégories à recompter (toutes par défaut)
+
+    Returns:
+        int: Nombre de catégories mises à jour
+    """
+    categories = Categorie.objects.all()
+    if identifiants is not None:
+        categories = categories.filter(pk__in=identifiants)
+    a_mettre_a_jour = []
+    for categorie in categories.annotate(nombre=Count('jeux_donnees')):
+        if categorie.nombre_jeux_donnees != categorie.nombre:
+            categorie.nombre_jeux_donnees = categorie.nombre
+            a_mettre_a_jour.append(categorie)
+    Categorie.objects.bulk_update(a_mettre_a_jour, ['nombre_jeux_donnees'], batch_size=500)
+    return len(a_mettre_a_jour)
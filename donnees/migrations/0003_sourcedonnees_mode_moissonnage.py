@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donnees', '0002_configurationfiltres_sourcedonnees_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sourcedonnees',
+            name='mode_moissonnage',
+            field=models.CharField(choices=[('recherche', 'Recherche paginée (package_search)'), ('liste', 'Liste et détails (package_list + package_show)')], default='recherche', max_length=20, verbose_name='Mode de moissonnage'),
+        ),
+        migrations.AddField(
+            model_name='sourcedonnees',
+            name='taille_page',
+            field=models.PositiveIntegerField(default=100, help_text='Nombre de jeux de données demandés par appel package_search (maximum 1000 sur CKAN)', verbose_name='Taille des pages'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donnees', '0003_sourcedonnees_mode_moissonnage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sourcedonnees',
+            name='concurrence_max',
+            field=models.PositiveIntegerField(default=4, help_text="Nombre maximal d'appels CKAN de détail exécutés en parallèle (1 = séquentiel)", verbose_name='Requêtes simultanées'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donnees', '0004_sourcedonnees_concurrence_max'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jeudonnees',
+            name='ckan_id',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Identifiant CKAN'),
+        ),
+        migrations.AddField(
+            model_name='jeudonnees',
+            name='ckan_name',
+            field=models.CharField(blank=True, max_length=200, verbose_name='Nom CKAN'),
+        ),
+        migrations.AddField(
+            model_name='jeudonnees',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='donnees.sourcedonnees', verbose_name='Source de données'),
+        ),
+        migrations.AddField(
+            model_name='organisation',
+            name='ckan_id',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Identifiant CKAN'),
+        ),
+        migrations.AddField(
+            model_name='organisation',
+            name='ckan_name',
+            field=models.CharField(blank=True, max_length=200, verbose_name='Nom CKAN'),
+        ),
+        migrations.AddField(
+            model_name='organisation',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='donnees.sourcedonnees', verbose_name='Source de données'),
+        ),
+        migrations.AddField(
+            model_name='ressource',
+            name='ckan_id',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Identifiant CKAN'),
+        ),
+        migrations.AddField(
+            model_name='ressource',
+            name='source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='donnees.sourcedonnees', verbose_name='Source de données'),
+        ),
+    ]
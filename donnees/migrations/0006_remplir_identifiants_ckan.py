@@ -0,0 +1,78 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:50
+
+import re
+
+from django.db import migrations
+
+MOTIF_UUID = r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+# URL de téléchargement CKAN: .../dataset/<id ou nom du jeu>/resource/<id de la ressource>/...
+MOTIF_URL_RESSOURCE = re.compile(r'/dataset/([^/?#]+)/resource/(' + MOTIF_UUID + ')')
+
+
+def remplir_identifiants_ckan(apps, schema_editor):
+    """
+    Rattache les lignes existantes à la source de données et déduit les
+    identifiants CKAN des URL de ressources quand c'est possible.
+
+    Les lignes restantes sans identifiant sont adoptées au prochain moissonnage.
+    C'est le cas de toutes les organisations: aucune donnée enregistrée ne
+    porte leur identifiant CKAN. ServiceMoissonnage.trouver_organisation les
+    retrouve par nom CKAN puis par titre et leur attribue alors ckan_id.
+    """
+    SourceDonnees = apps.get_model('donnees', 'SourceDonnees')
+    Organisation = apps.get_model('donnees', 'Organisation')
+    JeuDonnees = apps.get_model('donnees', 'JeuDonnees')
+    Ressource = apps.get_model('donnees', 'Ressource')
+
+    source = (
+        SourceDonnees.objects.filter(active=True).order_by('pk').first()
+        or SourceDonnees.objects.order_by('pk').first()
+    )
+    if source is None:
+        return
+
+    for modele in (Organisation, JeuDonnees, Ressource):
+        modele.objects.filter(source__isnull=True).update(source=source)
+
+    ids_ressources = set()
+    cles_jeux = {}
+    ressources_a_mettre_a_jour = []
+    for ressource in Ressource.objects.filter(ckan_id__isnull=True).only('pk', 'url', 'jeu_donnees_id').iterator():
+        correspondance = MOTIF_URL_RESSOURCE.search(ressource.url or '')
+        if not correspondance:
+            continue
+        cle_jeu, id_ressource = correspondance.groups()
+        cles_jeux.setdefault(ressource.jeu_donnees_id, cle_jeu)
+        if id_ressource not in ids_ressources:
+            ids_ressources.add(id_ressource)
+            ressource.ckan_id = id_ressource
+            ressources_a_mettre_a_jour.append(ressource)
+    Ressource.objects.bulk_update(ressources_a_mettre_a_jour, ['ckan_id'], batch_size=500)
+
+    ids_jeux = set()
+    jeux_a_mettre_a_jour = []
+    for jeu in JeuDonnees.objects.filter(pk__in=list(cles_jeux)).only('pk', 'ckan_id', 'ckan_name'):
+        cle_jeu = cles_jeux[jeu.pk]
+        if re.fullmatch(MOTIF_UUID, cle_jeu):
+            if cle_jeu in ids_jeux:
+                continue
+            ids_jeux.add(cle_jeu)
+            jeu.ckan_id = cle_jeu
+        else:
+            jeu.ckan_name = cle_jeu
+        jeux_a_mettre_a_jour.append(jeu)
+    JeuDonnees.objects.bulk_update(jeux_a_mettre_a_jour, ['ckan_id', 'ckan_name'], batch_size=500)
+
+
+# Migration distincte de l'ajout des champs et des contraintes: sur PostgreSQL,
+# les mises à jour des clés étrangères laissent des vérifications différées qui
+# font échouer tout ALTER TABLE suivant dans la même transaction.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donnees', '0005_identifiants_ckan'),
+    ]
+
+    operations = [
+        migrations.RunPython(remplir_identifiants_ckan, migrations.RunPython.noop),
+    ]
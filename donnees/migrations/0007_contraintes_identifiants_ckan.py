@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donnees', '0006_remplir_identifiants_ckan'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jeudonnees',
+            index=models.Index(fields=['source', 'ckan_name'], name='jeudonnees_source_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='organisation',
+            index=models.Index(fields=['source', 'ckan_name'], name='organisation_source_name_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='jeudonnees',
+            constraint=models.UniqueConstraint(fields=('source', 'ckan_id'), name='jeudonnees_source_ckan_id_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='organisation',
+            constraint=models.UniqueConstraint(fields=('source', 'ckan_id'), name='organisation_source_ckan_id_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='ressource',
+            constraint=models.UniqueConstraint(fields=('source', 'ckan_id'), name='ressource_source_ckan_id_unique'),
+        ),
+    ]
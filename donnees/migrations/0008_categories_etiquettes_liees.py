@@ -0,0 +1,114 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+TAILLE_LOT = 1000
+
+
+def _separer(valeur):
+    return {nom.strip()[:200] for nom in (valeur or '').split(';') if nom.strip()}
+
+
+def remplir_relations(apps, schema_editor):
+    """Construit les relations catégories/étiquettes depuis les champs texte existants"""
+    Categorie = apps.get_model('donnees', 'Categorie')
+    Etiquette = apps.get_model('donnees', 'Etiquette')
+    JeuDonnees = apps.get_model('donnees', 'JeuDonnees')
+    JeuDonneesCategorie = apps.get_model('donnees', 'JeuDonneesCategorie')
+    JeuDonneesEtiquette = apps.get_model('donnees', 'JeuDonneesEtiquette')
+
+    liens_categories, liens_etiquettes = [], []
+    for jeu_id, categories, etiquettes in JeuDonnees.objects.values_list('pk', 'categories', 'etiquettes').iterator():
+        liens_categories.extend((jeu_id, nom) for nom in _separer(categories))
+        liens_etiquettes.extend((jeu_id, nom) for nom in _separer(etiquettes))
+
+    for modele_cible, modele_lien, champ, liens, defauts in (
+        (Categorie, JeuDonneesCategorie, 'categorie_id', liens_categories,
+         {'description': 'Catégorie extraite automatiquement depuis les jeux de données'}),
+        (Etiquette, JeuDonneesEtiquette, 'etiquette_id', liens_etiquettes, {}),
+    ):
+        noms = {nom for _, nom in liens}
+        existants = set(modele_cible.objects.values_list('nom', flat=True))
+        modele_cible.objects.bulk_create(
+            [modele_cible(nom=nom, **defauts) for nom in noms - existants],
+            batch_size=TAILLE_LOT, ignore_conflicts=True
+        )
+        identifiants = dict(modele_cible.objects.values_list('nom', 'pk'))
+        modele_lien.objects.bulk_create(
+            [modele_lien(jeu_donnees_id=jeu_id, **{champ: identifiants[nom]}) for jeu_id, nom in liens],
+            batch_size=TAILLE_LOT, ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donnees', '0007_contraintes_identifiants_ckan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Etiquette',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=200, unique=True, verbose_name='Nom')),
+            ],
+            options={
+                'verbose_name': 'Étiquette',
+                'verbose_name_plural': 'Étiquettes',
+                'ordering': ['nom'],
+            },
+        ),
+        migrations.CreateModel(
+            name='JeuDonneesCategorie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categorie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='donnees.categorie', verbose_name='Catégorie')),
+                ('jeu_donnees', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='donnees.jeudonnees', verbose_name='Jeu de données')),
+            ],
+            options={
+                'verbose_name': "Catégorie d'un jeu de données",
+                'verbose_name_plural': 'Catégories des jeux de données',
+            },
+        ),
+        migrations.AddField(
+            model_name='jeudonnees',
+            name='categories_liees',
+            field=models.ManyToManyField(blank=True, related_name='jeux_donnees', through='donnees.JeuDonneesCategorie', to='donnees.categorie', verbose_name='Catégories liées'),
+        ),
+        migrations.CreateModel(
+            name='JeuDonneesEtiquette',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etiquette', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='donnees.etiquette', verbose_name='Étiquette')),
+                ('jeu_donnees', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='donnees.jeudonnees', verbose_name='Jeu de données')),
+            ],
+            options={
+                'verbose_name': "Étiquette d'un jeu de données",
+                'verbose_name_plural': 'Étiquettes des jeux de données',
+            },
+        ),
+        migrations.AddField(
+            model_name='jeudonnees',
+            name='etiquettes_liees',
+            field=models.ManyToManyField(blank=True, related_name='jeux_donnees', through='donnees.JeuDonneesEtiquette', to='donnees.etiquette', verbose_name='Étiquettes liées'),
+        ),
+        migrations.AddIndex(
+            model_name='jeudonneescategorie',
+            index=models.Index(fields=['categorie', 'jeu_donnees'], name='categorie_jeudonnees_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='jeudonneescategorie',
+            constraint=models.UniqueConstraint(fields=('jeu_donnees', 'categorie'), name='jeudonnees_categorie_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='jeudonneesetiquette',
+            index=models.Index(fields=['etiquette', 'jeu_donnees'], name='etiquette_jeudonnees_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='jeudonneesetiquette',
+            constraint=models.UniqueConstraint(fields=('jeu_donnees', 'etiquette'), name='jeudonnees_etiquette_unique'),
+        ),
+        migrations.RunPython(remplir_relations, migrations.RunPython.noop),
+    ]
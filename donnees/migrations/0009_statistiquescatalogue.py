@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donnees', '0008_categories_etiquettes_liees'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiquesCatalogue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('donnees', models.JSONField(default=dict, verbose_name='Statistiques')),
+                ('date_calcul', models.DateTimeField(auto_now=True, verbose_name='Date du calcul')),
+            ],
+            options={
+                'verbose_name': 'Statistiques du catalogue',
+                'verbose_name_plural': 'Statistiques du catalogue',
+            },
+        ),
+    ]
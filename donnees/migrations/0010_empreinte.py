@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donnees', '0009_statistiquescatalogue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jeudonnees',
+            name='empreinte',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Empreinte du contenu CKAN (SHA-256)'),
+        ),
+        migrations.AddField(
+            model_name='ressource',
+            name='empreinte',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Empreinte du contenu CKAN (SHA-256)'),
+        ),
+    ]
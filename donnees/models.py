@@ -8,6 +8,9 @@ class Organisation(models.Model):
     description = models.TextField(blank=True, verbose_name="Description")
     url = models.URLField(blank=True, verbose_name="URL")
     nombre_jeux_donnees = models.IntegerField(default=0, verbose_name="Nombre de jeux de données")
+    source = models.ForeignKey('SourceDonnees', on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Source de données")
+    ckan_id = models.CharField(max_length=100, null=True, blank=True, verbose_name="Identifiant CKAN")
+    ckan_name = models.CharField(max_length=200, blank=True, verbose_name="Nom CKAN")
     date_creation = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
     date_modification = models.DateTimeField(auto_now=True, verbose_name="Date de modification")
 
@@ -15,6 +18,12 @@ class Organisation(models.Model):
         verbose_name = "Organisation"
         verbose_name_plural = "Organisations"
         ordering = ['nom']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'ckan_id'], name='organisation_source_ckan_id_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['source', 'ckan_name'], name='organisation_source_name_idx'),
+        ]
 
     def __str__(self):
         return self.nom
@@ -35,29 +44,99 @@ class Categorie(models.Model):
         return self.nom
 
 
+class Etiquette(models.Model):
+    """Modèle représentant une étiquette (mot-clé) de jeu de données"""
+    nom = models.CharField(max_length=200, unique=True, verbose_name="Nom")
+
+    class Meta:
+        verbose_name = "Étiquette"
+        verbose_name_plural = "Étiquettes"
+        ordering = ['nom']
+
+    def __str__(self):
+        return self.nom
+
+
 class JeuDonnees(models.Model):
     """Modèle représentant un jeu de données"""
     titre = models.CharField(max_length=300, verbose_name="Titre")
     description = models.TextField(verbose_name="Description")
     organisation = models.ForeignKey(Organisation, on_delete=models.CASCADE, verbose_name="Organisation")
+    # Champs texte conservés pour compatibilité; les relations ci-dessous servent au filtrage indexé
     categories = models.CharField(max_length=500, verbose_name="Catégories")  # "Transport; Tourisme"
     etiquettes = models.CharField(max_length=500, blank=True, verbose_name="Étiquettes")  # "HackQC20; Aménagement"
+    categories_liees = models.ManyToManyField(
+        Categorie,
+        through='JeuDonneesCategorie',
+        related_name='jeux_donnees',
+        blank=True,
+        verbose_name="Catégories liées"
+    )
+    etiquettes_liees = models.ManyToManyField(
+        Etiquette,
+        through='JeuDonneesEtiquette',
+        related_name='jeux_donnees',
+        blank=True,
+        verbose_name="Étiquettes liées"
+    )
     niveau_acces = models.CharField(max_length=50, default="Ouvert", verbose_name="Niveau d'accès")
     url_originale = models.URLField(blank=True, verbose_name="URL originale")
     date_creation = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
     date_modification = models.DateTimeField(auto_now=True, verbose_name="Date de modification")
     date_metadata_creation = models.DateTimeField(null=True, blank=True, verbose_name="Date de création des métadonnées")
     date_metadata_modification = models.DateTimeField(null=True, blank=True, verbose_name="Date de modification des métadonnées")
+    source = models.ForeignKey('SourceDonnees', on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Source de données")
+    ckan_id = models.CharField(max_length=100, null=True, blank=True, verbose_name="Identifiant CKAN")
+    ckan_name = models.CharField(max_length=200, blank=True, verbose_name="Nom CKAN")
+    empreinte = models.CharField(max_length=64, blank=True, verbose_name="Empreinte du contenu CKAN (SHA-256)")
 
     class Meta:
         verbose_name = "Jeu de données"
         verbose_name_plural = "Jeux de données"
         ordering = ['-date_creation']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'ckan_id'], name='jeudonnees_source_ckan_id_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['source', 'ckan_name'], name='jeudonnees_source_name_idx'),
+        ]
 
     def __str__(self):
         return self.titre
 
 
+class JeuDonneesCategorie(models.Model):
+    """Association entre un jeu de données et une catégorie"""
+    jeu_donnees = models.ForeignKey(JeuDonnees, on_delete=models.CASCADE, verbose_name="Jeu de données")
+    categorie = models.ForeignKey(Categorie, on_delete=models.CASCADE, verbose_name="Catégorie")
+
+    class Meta:
+        verbose_name = "Catégorie d'un jeu de données"
+        verbose_name_plural = "Catégories des jeux de données"
+        constraints = [
+            models.UniqueConstraint(fields=['jeu_donnees', 'categorie'], name='jeudonnees_categorie_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['categorie', 'jeu_donnees'], name='categorie_jeudonnees_idx'),
+        ]
+
+
+class JeuDonneesEtiquette(models.Model):
+    """Association entre un jeu de données et une étiquette"""
+    jeu_donnees = models.ForeignKey(JeuDonnees, on_delete=models.CASCADE, verbose_name="Jeu de données")
+    etiquette = models.ForeignKey(Etiquette, on_delete=models.CASCADE, verbose_name="Étiquette")
+
+    class Meta:
+        verbose_name = "Étiquette d'un jeu de données"
+        verbose_name_plural = "Étiquettes des jeux de données"
+        constraints = [
+            models.UniqueConstraint(fields=['jeu_donnees', 'etiquette'], name='jeudonnees_etiquette_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['etiquette', 'jeu_donnees'], name='etiquette_jeudonnees_idx'),
+        ]
+
+
 class Ressource(models.Model):
     """Modèle représentant une ressource (fichier de données)"""
     nom = models.CharField(max_length=300, verbose_name="Nom")
@@ -70,6 +149,9 @@ class Ressource(models.Model):
     methode_collecte = models.TextField(blank=True, verbose_name="Méthode de collecte")
     contexte_collecte = models.TextField(blank=True, verbose_name="Contexte de collecte")
     attributs = models.TextField(blank=True, verbose_name="Attributs")  # "objectid (integer) : type (char)"
+    source = models.ForeignKey('SourceDonnees', on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Source de données")
+    ckan_id = models.CharField(max_length=100, null=True, blank=True, verbose_name="Identifiant CKAN")
+    empreinte = models.CharField(max_length=64, blank=True, verbose_name="Empreinte du contenu CKAN (SHA-256)")
     date_creation = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
     date_modification = models.DateTimeField(auto_now=True, verbose_name="Date de modification")
 
@@ -77,6 +159,9 @@ class Ressource(models.Model):
         verbose_name = "Ressource"
         verbose_name_plural = "Ressources"
         ordering = ['nom']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'ckan_id'], name='ressource_source_ckan_id_unique'),
+        ]
 
     def __str__(self):
         return f"{self.nom} ({self.format_fichier})"
@@ -84,10 +169,31 @@ class Ressource(models.Model):
 
 class SourceDonnees(models.Model):
     """Modèle représentant une source de données pour le moissonnage"""
+    MODE_MOISSONNAGE_CHOICES = [
+        ('recherche', 'Recherche paginée (package_search)'),
+        ('liste', 'Liste et détails (package_list + package_show)'),
+    ]
+    
     nom = models.CharField(max_length=200, verbose_name="Nom de la source")
     url_base = models.URLField(verbose_name="URL de base de l'API")
     description = models.TextField(blank=True, verbose_name="Description")
     active = models.BooleanField(default=True, verbose_name="Source active")
+    mode_moissonnage = models.CharField(
+        max_length=20,
+        choices=MODE_MOISSONNAGE_CHOICES,
+        default='recherche',
+        verbose_name="Mode de moissonnage"
+    )
+    taille_page = models.PositiveIntegerField(
+        default=100,
+        verbose_name="Taille des pages",
+        help_text="Nombre de jeux de données demandés par appel package_search (maximum 1000 sur CKAN)"
+    )
+    concurrence_max = models.PositiveIntegerField(
+        default=4,
+        verbose_name="Requêtes simultanées",
+        help_text="Nombre maximal d'appels CKAN de détail exécutés en parallèle (1 = séquentiel)"
+    )
     date_creation = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
     date_modification = models.DateTimeField(auto_now=True, verbose_name="Date de modification")
     derniere_synchronisation = models.DateTimeField(null=True, blank=True, verbose_name="Dernière synchronisation")
@@ -196,3 +302,16 @@ class ConfigurationPlanification(models.Model):
     def __str__(self):
         status = "✓" if self.active else "✗"
         return f"{status} {self.nom} ({self.frequence})"
+
+
+class StatistiquesCatalogue(models.Model):
+    """Instantané des statistiques du catalogue, recalculé après chaque moissonnage"""
+    donnees = models.JSONField(default=dict, verbose_name="Statistiques")
+    date_calcul = models.DateTimeField(auto_now=True, verbose_name="Date du calcul")
+    
+    class Meta:
+        verbose_name = "Statistiques du catalogue"
+        verbose_name_plural = "Statistiques du catalogue"
+    
+    def __str__(self):
+        return f"Statistiques du {self.date_calcul:%Y-%m-%d %H:%M}"
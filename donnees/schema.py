@@ -1,7 +1,8 @@
 import graphene
 from graphene_django import DjangoObjectType
 from django.db import models
-from .models import Organisation, Categorie, JeuDonnees, Ressource
+from .models import Organisation, Categorie, Etiquette, JeuDonnees, Ressource
+from .statistiques import invalider_statistiques
 
 
 class OrganisationType(DjangoObjectType):
@@ -18,6 +19,13 @@ class CategorieType(DjangoObjectType):
         fields = "__all__"
 
 
+class EtiquetteType(DjangoObjectType):
+    """Type GraphQL pour les étiquettes"""
+    class Meta:
+        model = Etiquette
+        fields = "__all__"
+
+
 class JeuDonneesType(DjangoObjectType):
     """Type GraphQL pour les jeux de données"""
     class Meta:
@@ -130,6 +138,7 @@ class CreateOrganisationMutation(graphene.Mutation):
                 description=description,
                 url=url
             )
+            invalider_statistiques()
             return CreateOrganisationMutation(
                 organisation=organisation,
                 success=True,
@@ -167,6 +176,7 @@ class UpdateOrganisationMutation(graphene.Mutation):
                     setattr(organisation, field, value)
             
             organisation.save()
+            invalider_statistiques()
             return UpdateOrganisationMutation(
                 organisation=organisation,
                 success=True,
@@ -199,6 +209,7 @@ class DeleteOrganisationMutation(graphene.Mutation):
         try:
             organisation = Organisation.objects.get(id=id)
             organisation.delete()
+            invalider_statistiques()
             return DeleteOrganisationMutation(
                 success=True,
                 message="Organisation supprimée avec succès"
@@ -0,0 +1,91 @@
+"""
+Statistiques matérialisées du catalogue.
+
+Les statistiques sont calculées par agrégation en base (Count, Sum,
+TruncMonth) puis conservées dans une ligne StatistiquesCatalogue unique.
+L'endpoint /api/ressources/statistiques/ lit cet instantané sans parcourir
+le catalogue; il est recalculé en fin de moissonnage. Une modification faite
+via l'API ne fait que l'invalider: il est recalculé à la lecture suivante,
+une fois pour toute une série d'écritures.
+"""
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from .models import JeuDonnees, Organisation, Ressource, StatistiquesCatalogue
+
+IDENTIFIANT_INSTANTANE = 1
+NON_SPECIFIE = 'Non spécifié'
+
+
+def _repartition(queryset, champ):
+    """Compte les lignes par valeur d'un champ (valeurs vides regroupées)"""
+    repartition = {}
+    for valeur, nombre in queryset.values_list(champ).annotate(nombre=Count('pk')).order_by():
+        cle = valeur or NON_SPECIFIE
+        repartition[cle] = repartition.get(cle, 0) + nombre
+    return repartition
+
+
+def calculer_statistiques():
+    """
+    Calcule les statistiques du catalogue par requêtes agrégées
+
+    Returns:
+        dict: Statistiques au format de l'endpoint /api/ressources/statistiques/
+    """
+    nombre_ressources = Ressource.objects.count()
+
+    # Évolution temporelle: jeux créés par mois, 12 derniers mois présents
+    mois = (
+        JeuDonnees.objects.annotate(mois=TruncMonth('date_creation'))
+        .values('mois')
+        .annotate(nombre=Count('pk'))
+        .order_by('-mois')[:12]
+    )
+    evolution = {ligne['mois'].strftime('%Y-%m'): ligne['nombre'] for ligne in reversed(list(mois))}
+
+    # Distribution par organisation: top 10 des organisations par nombre de jeux
+    organisations = (
+        JeuDonnees.objects.values('organisation__nom')
+        .annotate(nombre=Count('pk'))
+        .order_by('-nombre', 'organisation__nom')[:10]
+    )
+
+    return {
+        'total_ressources': nombre_ressources,
+        'formats': _repartition(Ressource.objects.all(), 'format_fichier'),
+        'types': _repartition(Ressource.objects.all(), 'type_ressource'),
+        'taille_totale': Ressource.objects.aggregate(total=Sum('taille'))['total'] or 0,
+        'stats_organisations': Organisation.objects.count(),
+        'stats_jeux_donnees': JeuDonnees.objects.count(),
+        'stats_ressources': nombre_ressources,
+        'evolution_temporelle': evolution,
+        'distribution_organisations': {
+            ligne['organisation__nom']: ligne['nombre'] for ligne in organisations
+        },
+    }
+
+
+def rafraichir_statistiques():
+    """Recalcule et enregistre l'instantané des statistiques"""
+    instantane, _ = StatistiquesCatalogue.objects.update_or_create(
+        pk=IDENTIFIANT_INSTANTANE, defaults={'donnees': calculer_statistiques()}
+    )
+    return instantane
+
+
+def invalider_statistiques():
+    """Supprime l'instantané: il sera recalculé à la prochaine lecture"""
+    StatistiquesCatalogue.objects.filter(pk=IDENTIFIANT_INSTANTANE).delete()
+
+
+def obtenir_statistiques():
+    """
+    Retourne l'instantané des statistiques (calculé au premier appel s'il n'existe pas)
+
+    Returns:
+        StatistiquesCatalogue
+    """
+    instantane = StatistiquesCatalogue.objects.filter(pk=IDENTIFIANT_INSTANTANE).first()
+    if instantane is None:
+        instantane = rafraichir_statistiques()
+    return instantane
@@ -1,7 +1,11 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
 from django.utils import timezone
 from datetime import datetime
-from .models import Organisation, Categorie, JeuDonnees, Ressource
+from rest_framework.test import APIClient
+from .categories import lier_categories_et_etiquettes, reconstruire_liens, recompter_categories
+from .models import Organisation, Categorie, Etiquette, JeuDonnees, Ressource, StatistiquesCatalogue
+from .statistiques import calculer_statistiques, rafraichir_statistiques
 from .serializers import (
     OrganisationSerializer, CategorieSerializer, 
     JeuDonneesSerializer, RessourceSerializer
@@ -64,6 +68,171 @@ class CategorieModelTest(TestCase):
             Categorie.objects.create(nom="Transport")
 
 
+class RecompterCategoriesTest(TestCase):
+    """Tests pour les relations catégories/étiquettes et le recomptage groupé"""
+    
+    def setUp(self):
+        self.organisation = Organisation.objects.create(nom="Ville de Montréal", type_organisation="Ville")
+        for titre, categories in [('A', 'Transport; Urbanisme'), ('B', 'Transport'), ('C', 'Transports publics')]:
+            JeuDonnees.objects.create(
+                titre=titre, description='', organisation=self.organisation,
+                categories=categories, etiquettes='Mobilité; Vélo'
+            )
+        Categorie.objects.create(nom="Transport", nombre_jeux_donnees=99)
+        Categorie.objects.create(nom="Obsolète", nombre_jeux_donnees=4)
+    
+    def test_recompter_categories(self):
+        """Test de la création des relations et de la mise à jour des compteurs"""
+        creees = reconstruire_liens()
+        mises_a_jour = recompter_categories()
+        
+        self.assertEqual(creees, 2)
+        self.assertEqual(mises_a_jour, 4)
+        compteurs = dict(Categorie.objects.values_list('nom', 'nombre_jeux_donnees'))
+        # Comptage exact par nom (et non par sous-chaîne)
+        self.assertEqual(compteurs, {
+            'Transport': 2, 'Urbanisme': 1, 'Transports publics': 1, 'Obsolète': 0
+        })
+        self.assertEqual(Etiquette.objects.get(nom='Vélo').jeux_donnees.count(), 3)
+    
+    def test_lier_remplace_les_relations(self):
+        """Test que les relations suivent la modification des champs texte"""
+        reconstruire_liens()
+        jeu = JeuDonnees.objects.get(titre='A')
+        jeu.categories = 'Urbanisme'
+        jeu.etiquettes = ''
+        jeu.save()
+        
+        lier_categories_et_etiquettes([jeu])
+        
+        self.assertEqual(list(jeu.categories_liees.values_list('nom', flat=True)), ['Urbanisme'])
+        self.assertFalse(jeu.etiquettes_liees.exists())
+
+
+class JeuDonneesFiltresApiTest(TestCase):
+    """Tests des filtres par catégorie et étiquette de l'API"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        organisation = Organisation.objects.create(nom="Ville de Québec", type_organisation="Ville")
+        for titre, categories, etiquettes in [
+            ('Pistes cyclables', 'Transport', 'Vélo'),
+            ('Arrêts de bus', 'Transports publics', 'Bus'),
+        ]:
+            JeuDonnees.objects.create(
+                titre=titre, description='', organisation=organisation,
+                categories=categories, etiquettes=etiquettes
+            )
+        reconstruire_liens()
+    
+    def _titres(self, **parametres):
+        reponse = self.client.get('/api/jeux-donnees/', parametres)
+        self.assertEqual(reponse.status_code, 200)
+        donnees = reponse.json()
+        resultats = donnees['results'] if isinstance(donnees, dict) else donnees
+        return [jeu['titre'] for jeu in resultats]
+    
+    def test_filtre_categorie_exact(self):
+        """Test que le filtre par catégorie porte sur le nom exact, sans distinction de casse"""
+        self.assertEqual(self._titres(categories='transport'), ['Pistes cyclables'])
+        self.assertEqual(self._titres(categories='TRANSPORTS PUBLICS'), ['Arrêts de bus'])
+        self.assertEqual(self._titres(categories='publics'), [])
+    
+    def test_filtre_categorie_partiel(self):
+        """Test que categories_contient garde la correspondance partielle, sans doublon"""
+        self.assertEqual(sorted(self._titres(categories_contient='transport')), ['Arrêts de bus', 'Pistes cyclables'])
+        jeu = JeuDonnees.objects.get(titre='Pistes cyclables')
+        jeu.categories = 'Transport; Transport actif'
+        lier_categories_et_etiquettes([jeu])
+        self.assertEqual(len(self._titres(categories_contient='transport')), 2)
+    
+    def test_filtre_etiquette(self):
+        """Test du filtre par étiquette, exact ou partiel"""
+        self.assertEqual(self._titres(etiquettes='bus'), ['Arrêts de bus'])
+        self.assertEqual(self._titres(etiquettes='vél'), [])
+        self.assertEqual(self._titres(etiquettes_contient='vél'), ['Pistes cyclables'])
+    
+    def test_creation_lie_les_categories(self):
+        """Test que la création via l'API crée les relations"""
+        organisation = Organisation.objects.get()
+        self.client.force_authenticate(User.objects.create_user('editeur'))
+        reponse = self.client.post('/api/jeux-donnees/', {
+            'titre': 'Parcs', 'description': 'Parcs municipaux', 'organisation': organisation.pk,
+            'categories': 'Environnement; Loisirs', 'etiquettes': 'Parcs',
+            'niveau_acces': 'Ouvert', 'url_originale': 'https://example.com/parcs',
+        }, format='json')
+        
+        self.assertEqual(reponse.status_code, 201, reponse.content)
+        self.assertEqual(self._titres(categories='Loisirs'), ['Parcs'])
+        self.assertEqual(Categorie.objects.get(nom='Loisirs').nombre_jeux_donnees, 1)
+    
+    def test_modification_et_suppression_recomptent(self):
+        """Test que les compteurs des catégories suivent les modifications et suppressions via l'API"""
+        recompter_categories()
+        self.client.force_authenticate(User.objects.create_user('editeur'))
+        jeu = JeuDonnees.objects.get(titre='Pistes cyclables')
+        
+        reponse = self.client.patch(f'/api/jeux-donnees/{jeu.pk}/', {'categories': 'Transports publics'}, format='json')
+        self.assertEqual(reponse.status_code, 200, reponse.content)
+        compteurs = dict(Categorie.objects.values_list('nom', 'nombre_jeux_donnees'))
+        self.assertEqual(compteurs, {'Transport': 0, 'Transports publics': 2})
+        
+        self.assertEqual(self.client.delete(f'/api/jeux-donnees/{jeu.pk}/').status_code, 204)
+        self.assertEqual(Categorie.objects.get(nom='Transports publics').nombre_jeux_donnees, 1)
+
+
+class StatistiquesCatalogueTest(TestCase):
+    """Tests pour l'instantané des statistiques"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        montreal = Organisation.objects.create(nom="Ville de Montréal", type_organisation="Ville")
+        quebec = Organisation.objects.create(nom="Ville de Québec", type_organisation="Ville")
+        for titre, organisation in [('A', montreal), ('B', montreal), ('C', quebec)]:
+            JeuDonnees.objects.create(titre=titre, description='', organisation=organisation)
+        jeu = JeuDonnees.objects.get(titre='A')
+        for nom, format_fichier, taille in [('a.csv', 'CSV', 10), ('b.csv', 'CSV', None), ('c', '', 5)]:
+            Ressource.objects.create(
+                nom=nom, jeu_donnees=jeu, format_fichier=format_fichier,
+                type_ressource='Données', url='https://example.com/' + nom, taille=taille
+            )
+    
+    def test_calculer_statistiques(self):
+        """Test des agrégations en base"""
+        stats = calculer_statistiques()
+        
+        self.assertEqual(stats['total_ressources'], 3)
+        self.assertEqual(stats['formats'], {'CSV': 2, 'Non spécifié': 1})
+        self.assertEqual(stats['types'], {'Données': 3})
+        self.assertEqual(stats['taille_totale'], 15)
+        self.assertEqual(stats['stats_jeux_donnees'], 3)
+        self.assertEqual(stats['evolution_temporelle'], {timezone.now().strftime('%Y-%m'): 3})
+        self.assertEqual(stats['distribution_organisations'], {'Ville de Montréal': 2, 'Ville de Québec': 1})
+    
+    def test_endpoint_sert_l_instantane(self):
+        """Test que l'endpoint lit l'instantané sans parcourir le catalogue"""
+        rafraichir_statistiques()
+        Organisation.objects.create(nom="Hors instantané")
+        
+        with self.assertNumQueries(1):
+            reponse = self.client.get('/api/ressources/statistiques/')
+        
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(reponse.json()['stats_organisations'], 2)
+    
+    def test_modification_api_invalide(self):
+        """Test que les modifications via l'API invalident l'instantané, recalculé à la lecture suivante"""
+        rafraichir_statistiques()
+        self.client.force_authenticate(User.objects.create_user('editeur'))
+        
+        reponse = self.client.delete(f'/api/ressources/{Ressource.objects.get(nom="c").pk}/')
+        
+        self.assertEqual(reponse.status_code, 204)
+        self.assertFalse(StatistiquesCatalogue.objects.exists())
+        self.assertEqual(self.client.get('/api/ressources/statistiques/').json()['total_ressources'], 2)
+        self.assertEqual(StatistiquesCatalogue.objects.get().donnees['total_ressources'], 2)
+
+
 class JeuDonneesModelTest(TestCase):
     """Tests pour le modèle JeuDonnees"""
     
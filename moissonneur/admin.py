@@ -1,3 +1,54 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from donnees.models import ConfigurationPlanification
+from .models import MoissonnageExecution
+from .planification import prochaine_execution
 
-# Register your models here.
+
+@admin.register(MoissonnageExecution)
+class MoissonnageExecutionAdmin(admin.ModelAdmin):
+    list_display = ['source', 'mode', 'statut', 'travailleur', 'phase', 'progression', 'jeux_donnees', 'erreurs', 'date_debut', 'date_fin']
+    list_filter = ['statut', 'mode', 'source']
+    ordering = ['-date_creation']
+    readonly_fields = [
+        'travailleur', 'phase', 'curseur', 'cle_reprise', 'total_organisations', 'total_jeux_donnees', 'organisations', 'jeux_donnees',
+        'ressources', 'erreurs', 'erreurs_recuperation', 'jeux_nouveaux', 'jeux_modifies', 'jeux_inchanges',
+        'jeux_supprimes', 'ressources_supprimees', 'progression', 'message', 'derniere_erreur',
+        'nombre_reprises', 'date_debut', 'date_fin', 'durees', 'pipeline', 'telemetrie', 'date_creation', 'date_modification',
+    ]
+
+
+@admin.register(ConfigurationPlanification)
+class ConfigurationPlanificationAdmin(admin.ModelAdmin):
+    list_display = ['nom', 'source', 'frequence', 'active', 'prochaine_execution', 'derniere_execution']
+    list_filter = ['active', 'frequence', 'source', 'date_creation']
+    search_fields = ['nom', 'description']
+    ordering = ['-date_creation']
+    readonly_fields = ['date_creation', 'date_modification', 'prochaine_execution', 'derniere_execution']
+    
+    fieldsets = (
+        ('Informations générales', {
+            'fields': ('nom', 'source', 'configuration_filtres', 'active', 'description')
+        }),
+        ('Planification', {
+            'fields': ('frequence', 'heure_execution', 'jour_semaine', 'jour_mois', 'expression_cron'),
+            'description': 'Configurez la planification selon la fréquence choisie. Seuls les champs pertinents seront utilisés.'
+        }),
+        ('Exécution', {
+            'fields': ('prochaine_execution', 'derniere_execution',),
+            'classes': ('collapse',)
+        }),
+        ('Dates', {
+            'fields': ('date_creation', 'date_modification'),
+            'classes': ('collapse',)
+        }),
+    )
+    
+    def save_model(self, request, obj, form, change):
+        """Recalcule la prochaine exécution à chaque modification de la planification"""
+        obj.prochaine_execution = None
+        if obj.active:
+            try:
+                obj.prochaine_execution = prochaine_execution(obj)
+            except ValueError as e:
+                self.message_user(request, f"Planification non programmée: {e}", messages.WARNING)
+        super().save_model(request, obj, form, change)
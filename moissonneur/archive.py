@@ -0,0 +1,89 @@
+"""
+Archive des réponses CKAN brutes.
+
+Chaque jeu de données écrit par EcrivainLots est aussi conservé tel que
+CKAN l'a renvoyé, en JSON compressé (zlib), dans ArchiveJeuDonnees: une
+ligne par jeu et par source, réécrite seulement si l'empreinte de la réponse
+change. Une évolution de l'extraction (catégories, étiquettes, attributs)
+s'applique alors en rejouant la normalisation sur l'archive (commande
+reprocess), sans nouveau moissonnage.
+"""
+import hashlib
+import json
+import zlib
+from .models import ArchiveJeuDonnees
+
+# Niveau de compression zlib: bon compromis taille / temps pour du JSON
+NIVEAU_COMPRESSION = 6
+
+# Archives lues par requête lors d'un parcours
+TAILLE_PAGE_ARCHIVES = 500
+
+
+def compresser(donnees_jeu):
+    """
+    Sérialise et compresse une réponse CKAN
+
+    Returns:
+        tuple: (empreinte SHA-256 du JSON canonique, contenu compressé)
+    """
+    contenu = json.dumps(donnees_jeu, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(contenu).hexdigest(), zlib.compress(contenu, NIVEAU_COMPRESSION)
+
+
+def decompresser(contenu):
+    """Retourne la réponse CKAN d'une archive"""
+    return json.loads(zlib.decompress(contenu))
+
+
+def archiver(source, archives, taille_lot=500):
+    """
+    Enregistre les réponses nouvelles ou modifiées (à appeler dans une transaction)
+
+    Args:
+        source: Instance de SourceDonnees
+        archives: Liste de tuples (ckan_id, empreinte, contenu compressé)
+
+    Returns:
+        int: Nombre d'archives écrites
+    """
+    par_identifiant = {ckan_id: (empreinte, contenu) for ckan_id, empreinte, contenu in archives}
+    connues = dict(
+        ArchiveJeuDonnees.objects.filter(source=source, ckan_id__in=list(par_identifiant)).values_list('ckan_id', 'empreinte')
+    )
+    a_ecrire = [
+        ArchiveJeuDonnees(source=source, ckan_id=ckan_id, empreinte=empreinte, contenu=contenu)
+        for ckan_id, (empreinte, contenu) in par_identifiant.items()
+        if connues.get(ckan_id) != empreinte
+    ]
+    ArchiveJeuDonnees.objects.bulk_create(
+        a_ecrire,
+        batch_size=taille_lot,
+        update_conflicts=True,
+        unique_fields=['source', 'ckan_id'],
+        update_fields=['empreinte', 'contenu', 'date_archivage'],
+    )
+    return len(a_ecrire)
+
+
+def iterer_archives(source, taille_page=TAILLE_PAGE_ARCHIVES):
+    """
+    Parcourt les réponses archivées d'une source, par pages sur la clé primaire
+
+    Chaque page est lue par une requête distincte: aucun curseur ne reste
+    ouvert (et aucun verrou de lecture SQLite n'est retenu) pendant que les
+    jeux sont réécrits.
+
+    Yields:
+        dict: Réponse CKAN d'un jeu de données
+    """
+    dernier = 0
+    while True:
+        page = list(
+            ArchiveJeuDonnees.objects.filter(source=source, pk__gt=dernier)
+            .order_by('pk').values_list('pk', 'contenu')[:taille_page]
+        )
+        for dernier, contenu in page:
+            yield decompresser(contenu)
+        if len(page) < taille_page:
+            return
@@ -0,0 +1,274 @@
+"""
+Client HTTP de l'API d'action CKAN.
+
+ClientCkan encapsule les appels d'une source: délais d'expiration,
+nouvelles tentatives avec attente exponentielle aléatoire (« full jitter »)
+sur les erreurs transitoires (connexion, 429, 5xx), respect de l'en-tête
+Retry-After, et limitation de débit par seau à jetons. La concurrence
+effective s'adapte: elle est divisée par deux sur un 429 ou une latence
+excessive et remonte d'un appel à la fois tant que les réponses sont
+rapides (AIMD). Les réponses volumineuses (pages package_search) peuvent être
+lues en flux avec appeler_en_flux(). Chaque tentative est mesurée
+(latence, octets reçus, erreur) dans la Telemetrie fournie.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from django.conf import settings
+from django.utils import timezone
+from .flux_json import ErreurFluxJson, LecteurJson
+
+# Réponses transitoires pour lesquelles l'appel est retenté
+CODES_A_REESSAYER = {429, 500, 502, 503, 504}
+
+# Taille (octets) des blocs lus sur les réponses parcourues en flux
+TAILLE_BLOC = 64 * 1024
+
+
+class ErreurCkan(requests.RequestException):
+    """Appel CKAN en échec après épuisement des tentatives (ou réponse success=false)"""
+
+
+class LimiteurDebit:
+    """Seau à jetons partagé entre les fils d'une source, avec concurrence adaptative"""
+
+    def __init__(self, debit=None, concurrence=1, latence_cible=2.0):
+        """
+        Args:
+            debit: Requêtes par seconde autorisées (None ou 0: illimité)
+            concurrence: Nombre maximal d'appels simultanés
+            latence_cible: Latence (secondes) au-delà de laquelle la concurrence est réduite
+        """
+        self.debit = debit or None
+        self.capacite = max(1.0, self.debit or 1.0)
+        self.concurrence_max = max(1, concurrence)
+        self.concurrence = self.concurrence_max
+        self.latence_cible = latence_cible
+        self._jetons = self.capacite
+        self._dernier_remplissage = time.monotonic()
+        self._en_vol = 0
+        self._pause_jusqua = 0.0
+        self._condition = threading.Condition()
+
+    def acquerir(self):
+        """Attend un jeton et une place parmi les appels simultanés"""
+        with self._condition:
+            while True:
+                maintenant = time.monotonic()
+                attente = self._pause_jusqua - maintenant
+                if attente <= 0 and self._en_vol < self.concurrence:
+                    attente = self._prendre_jeton(maintenant)
+                    if attente <= 0:
+                        self._en_vol += 1
+                        return
+                self._condition.wait(timeout=attente if attente > 0 else None)
+
+    def _prendre_jeton(self, maintenant):
+        """Consomme un jeton; retourne le délai avant le prochain jeton si le seau est vide"""
+        if self.debit is None:
+            return 0
+        self._jetons = min(self.capacite, self._jetons + (maintenant - self._dernier_remplissage) * self.debit)
+        self._dernier_remplissage = maintenant
+        if self._jetons >= 1:
+            self._jetons -= 1
+            return 0
+        return (1 - self._jetons) / self.debit
+
+    def liberer(self, latence=None, sature=False):
+        """
+        Libère la place d'un appel terminé et ajuste la concurrence
+
+        Args:
+            latence: Durée (secondes) de l'appel réussi
+            sature: Le serveur a signalé une surcharge (429 ou 503)
+        """
+        with self._condition:
+            self._en_vol -= 1
+            if sature or (latence is not None and latence > self.latence_cible):
+                self.concurrence = max(1, self.concurrence // 2)
+            elif latence is not None and self.concurrence < self.concurrence_max:
+                self.concurrence += 1
+            self._condition.notify_all()
+
+    def suspendre(self, secondes):
+        """Suspend tous les appels de la source (Retry-After)"""
+        with self._condition:
+            self._pause_jusqua = max(self._pause_jusqua, time.monotonic() + secondes)
+
+
+class ClientCkan:
+    """Appels à l'API d'action CKAN d'une source, avec tentatives et limitation de débit"""
+
+    def __init__(self, url_base, session=None, concurrence=1, debit=None, tentatives=None,
+                 delai_expiration=None, delai_base=0.5, delai_max=30.0, latence_cible=None, telemetrie=None):
+        """
+        Args:
+            url_base: URL de l'API d'action (ex: https://ckan.example.com/api/3/action/)
+            session: requests.Session (pool de connexions de la source)
+            concurrence: Nombre maximal d'appels simultanés
+            debit: Requêtes par seconde (par défaut, settings.MOISSONNAGE_DEBIT_MAX; 0 = illimité)
+            tentatives: Nombre total de tentatives par appel (par défaut, settings.MOISSONNAGE_TENTATIVES_HTTP)
+            delai_expiration: Délai de lecture (secondes) par appel
+                              (par défaut, settings.MOISSONNAGE_DELAI_EXPIRATION_HTTP)
+            delai_base: Attente de base (secondes) avant la première nouvelle tentative
+            delai_max: Attente maximale (secondes) entre deux tentatives
+            latence_cible: Latence (secondes) au-delà de laquelle la concurrence est réduite
+            telemetrie: Telemetrie recevant la mesure de chaque tentative (optionnel)
+        """
+        self.url_base = url_base
+        self.session = session or requests.Session()
+        self.tentatives = max(1, tentatives or getattr(settings, 'MOISSONNAGE_TENTATIVES_HTTP', 4))
+        self.delai_expiration = (10, delai_expiration or getattr(settings, 'MOISSONNAGE_DELAI_EXPIRATION_HTTP', 60))
+        self.delai_base = delai_base
+        self.delai_max = delai_max
+        self.limiteur = LimiteurDebit(
+            debit if debit is not None else getattr(settings, 'MOISSONNAGE_DEBIT_MAX', 0),
+            concurrence=concurrence,
+            latence_cible=latence_cible or self.delai_expiration[1] / 4,
+        )
+        self.nouvelles_tentatives = 0
+        self.telemetrie = telemetrie
+
+    def appeler(self, action, params=None):
+        """
+        Appelle une action CKAN et retourne son champ 'result'
+
+        Raises:
+            ErreurCkan: Si l'appel échoue après toutes les tentatives
+            requests.HTTPError: Pour une erreur non transitoire (ex: 404)
+        """
+        return self._avec_tentatives(action, params, lambda reponse: self._resultat(action, reponse.json()))
+
+    def appeler_en_flux(self, action, params=None, champ='results'):
+        """
+        Appelle une action CKAN et lit sa réponse au fil de l'eau (voir flux_json)
+
+        L'enveloppe est lue jusqu'au tableau result[champ] (ou jusqu'à result s'il
+        s'agit lui-même d'un tableau); les éléments sont ensuite décodés un à un,
+        à mesure que le générateur est consommé. Les tentatives ne couvrent que
+        l'ouverture: une coupure pendant la lecture des éléments lève une
+        requests.RequestException depuis le générateur.
+
+        Args:
+            champ: Tableau de result à parcourir (None si result est un tableau)
+
+        Returns:
+            tuple: (dict des champs de result lus avant le tableau - ex: {'count': n},
+                    générateur des éléments du tableau)
+        """
+        return self._avec_tentatives(
+            action, params, lambda reponse: self._ouvrir_flux(action, reponse, champ), flux=True
+        )
+
+    def _avec_tentatives(self, action, params, traitement, flux=False):
+        """Effectue l'appel avec nouvelles tentatives et passe la réponse reçue au traitement"""
+        for tentative in range(1, self.tentatives + 1):
+            self.limiteur.acquerir()
+            debut = time.monotonic()
+            latence, sature, reponse = None, False, None
+            try:
+                reponse = self.session.get(
+                    f"{self.url_base}{action}", params=params, timeout=self.delai_expiration, stream=flux
+                )
+                if reponse.status_code in CODES_A_REESSAYER:
+                    sature = reponse.status_code in (429, 503)
+                    erreur = requests.HTTPError(f"{reponse.status_code} pour {action}", response=reponse)
+                    attente_serveur = self._delai_retry_after(reponse)
+                else:
+                    reponse.raise_for_status()
+                    resultat = traitement(reponse)
+                    latence = time.monotonic() - debut
+                    return resultat
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                erreur, attente_serveur = e, None
+            finally:
+                self.limiteur.liberer(latence=latence, sature=sature)
+                if self.telemetrie is not None:
+                    self.telemetrie.appel_http(
+                        action, time.monotonic() - debut,
+                        octets=0 if flux else self._taille(reponse), erreur=latence is None,
+                    )
+                if flux and reponse is not None and latence is None:
+                    reponse.close()
+
+            if tentative == self.tentatives:
+                raise ErreurCkan(f"{action}: échec après {self.tentatives} tentatives ({erreur})") from erreur
+
+            attente = random.uniform(0, min(self.delai_max, self.delai_base * 2 ** (tentative - 1)))
+            if attente_serveur is not None:
+                attente = max(attente, min(attente_serveur, self.delai_max))
+                self.limiteur.suspendre(attente)
+            self.nouvelles_tentatives += 1
+            time.sleep(attente)
+
+    @staticmethod
+    def _resultat(action, donnees):
+        if donnees.get('success') is False:
+            raise ErreurCkan(f"{action}: {donnees.get('error')}")
+        if 'result' not in donnees:
+            raise ErreurCkan(f"{action}: champ result absent de la réponse")
+        return donnees['result']
+
+    def _ouvrir_flux(self, action, reponse, champ):
+        """Lit l'enveloppe jusqu'au tableau à parcourir"""
+        lecteur = LecteurJson(self._compter_octets(action, reponse.iter_content(TAILLE_BLOC)))
+        entete = {}
+        try:
+            for cle in lecteur.cles():
+                if cle == 'success':
+                    if lecteur.valeur() is False:
+                        raise ErreurCkan(f"{action}: réponse en échec")
+                elif cle == 'error':
+                    raise ErreurCkan(f"{action}: {lecteur.valeur()}")
+                elif cle != 'result':
+                    lecteur.valeur()
+                elif champ is None:
+                    return entete, self._elements(action, lecteur, reponse)
+                else:
+                    for cle_resultat in lecteur.cles():
+                        if cle_resultat == champ:
+                            return entete, self._elements(action, lecteur, reponse)
+                        entete[cle_resultat] = lecteur.valeur()
+        except ErreurFluxJson as e:
+            raise ErreurCkan(f"{action}: {e}") from e
+        raise ErreurCkan(f"{action}: champ {champ or 'result'} absent de la réponse")
+
+    def _compter_octets(self, action, blocs):
+        """Transmet les blocs d'une réponse lue en flux en comptant les octets reçus"""
+        for bloc in blocs:
+            if self.telemetrie is not None:
+                self.telemetrie.octets_recus(action, len(bloc))
+            yield bloc
+
+    @staticmethod
+    def _taille(reponse):
+        """Octets reçus d'une réponse lue entièrement (0 sans corps)"""
+        contenu = getattr(reponse, 'content', None)
+        return len(contenu) if isinstance(contenu, bytes) else 0
+
+    @staticmethod
+    def _elements(action, lecteur, reponse):
+        """Décode les éléments du tableau à mesure qu'ils sont demandés, puis libère la connexion"""
+        try:
+            yield from lecteur.elements()
+        except ErreurFluxJson as e:
+            raise ErreurCkan(f"{action}: réponse tronquée ({e})") from e
+        finally:
+            reponse.close()
+
+    @staticmethod
+    def _delai_retry_after(reponse):
+        """Délai (secondes) demandé par l'en-tête Retry-After (nombre de secondes ou date HTTP)"""
+        valeur = (reponse.headers or {}).get('Retry-After')
+        if not valeur:
+            return None
+        try:
+            return max(0.0, float(valeur))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(valeur) - timezone.now()).total_seconds())
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,117 @@
+"""
+Moissonnage parallèle de plusieurs sources.
+
+CoordinateurMoissonnage réserve les exécutions en file et les exécute
+chacune dans son propre fil: une source par fil au plus (contrainte
+execution_active_unique_par_source), chacune avec son service, sa session
+HTTP et sa concurrence (SourceDonnees.concurrence_max). Les fils ont leur
+propre connexion à la base. Un échec reste confiné à l'exécution de sa
+source, et la durée totale tend vers celle de la source la plus lente.
+
+Le moissonnage parallèle requiert PostgreSQL: SQLite n'admet qu'un écrivain,
+et verrou_ecriture() ne sérialise que les fils d'un même processus, pas le
+serveur web ni le planificateur. Sur SQLite, le coordinateur moissonne donc
+une source à la fois, quel que soit max_paralleles.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from django.conf import settings
+from django.db import close_old_connections, connection
+from donnees.models import SourceDonnees
+from .ecriture import verrou_ecriture
+from .execution import ExecuteurMoissonnage
+from .models import MoissonnageExecution
+
+
+class CoordinateurMoissonnage:
+    """Exécute en parallèle les moissonnages en file, une source par fil"""
+
+    def __init__(self, travailleur, max_paralleles=None, doit_arreter=None):
+        """
+        Args:
+            travailleur: Identifiant du processus (hôte:pid) inscrit sur les exécutions réservées
+            max_paralleles: Nombre maximal de sources moissonnées simultanément
+                            (par défaut, settings.MOISSONNAGE_SOURCES_PARALLELES; 1 sur SQLite)
+            doit_arreter: Fonction sans argument signalant l'arrêt du processus (ex: SIGTERM)
+        """
+        self.travailleur = travailleur
+        self.max_paralleles = max(1, max_paralleles or getattr(settings, 'MOISSONNAGE_SOURCES_PARALLELES', 4))
+        if connection.vendor == 'sqlite':
+            self.max_paralleles = 1
+        self.doit_arreter = doit_arreter or (lambda: False)
+
+    @staticmethod
+    def mettre_en_file_sources(sources=None):
+        """
+        Met en file un moissonnage pour chaque source active
+
+        Args:
+            sources: Sources à moissonner (par défaut, toutes les sources actives)
+
+        Returns:
+            list: Exécutions en file (ou déjà actives) par source
+        """
+        if sources is None:
+            sources = SourceDonnees.objects.filter(active=True).order_by('pk')
+        return [
+            MoissonnageExecution.mettre_en_file(source, MoissonnageExecution.mode_pour(source))
+            for source in sources
+        ]
+
+    def executer(self, une_fois=False, intervalle=5):
+        """
+        Réserve et exécute les moissonnages en file jusqu'à l'arrêt du processus
+
+        Args:
+            une_fois: S'arrêter dès que la file est vide et les fils terminés
+            intervalle: Délai (secondes) entre deux consultations de la file vide
+
+        Yields:
+            MoissonnageExecution: Chaque exécution terminée, dans l'ordre de fin
+        """
+        en_cours = set()
+        with ThreadPoolExecutor(max_workers=self.max_paralleles, thread_name_prefix='source') as executeur:
+            while True:
+                while not self.doit_arreter() and len(en_cours) < self.max_paralleles:
+                    close_old_connections()
+                    # La réservation lit puis écrit: sur SQLite, elle ne doit pas croiser un lot en cours
+                    with verrou_ecriture():
+                        MoissonnageExecution.remettre_en_file_interrompues()
+                        execution = MoissonnageExecution.reserver_suivante(self.travailleur)
+                    if execution is None:
+                        break
+                    en_cours.add(executeur.submit(self._executer, execution))
+
+                if not en_cours:
+                    if une_fois or self.doit_arreter():
+                        return
+                    time.sleep(intervalle)
+                    continue
+
+                terminees, en_cours = wait(en_cours, timeout=intervalle, return_when=FIRST_COMPLETED)
+                for futur in terminees:
+                    yield futur.result()
+
+    def _executer(self, execution):
+        """Exécute une exécution réservée dans le fil courant, sans propager ses erreurs"""
+        try:
+            ExecuteurMoissonnage(execution, doit_arreter=self.doit_arreter).executer()
+        except Exception as e:
+            # Échec hors de l'exécuteur (ex: source invalide): seule cette source est concernée
+            execution.statut = 'echouee'
+            execution.message = f'❌ Erreur: {str(e)}'[:300]
+            MoissonnageExecution.objects.filter(pk=execution.pk).update(
+                statut=execution.statut, message=execution.message
+            )
+        finally:
+            # Chaque fil a sa propre connexion à la base
+            connection.close()
+
+        if self.doit_arreter() and execution.statut == 'arretee':
+            # Arrêt du processus et non de l'utilisateur: l'exécution reste en file pour être reprise
+            MoissonnageExecution.objects.filter(pk=execution.pk, statut='arretee').update(
+                statut='en_attente', arret_demande=False, travailleur=''
+            )
+            execution.statut = 'en_attente'
+            connection.close()
+        return execution
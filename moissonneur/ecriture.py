@@ -0,0 +1,401 @@
+"""
+Écriture en lots des jeux de données et ressources moissonnés.
+
+Les lignes normalisées sont accumulées puis écrites par lots avec
+bulk_create(update_conflicts=True) sur la clé unique (source, ckan_id),
+le tout dans une transaction. Le coût d'écriture passe ainsi de O(lignes)
+à O(lignes / taille du lot), sur SQLite comme sur PostgreSQL.
+
+Chaque jeu et chaque ressource porte l'empreinte (SHA-256) de ses champs
+normalisés; l'empreinte d'un jeu couvre aussi celles de ses ressources. Un
+jeu dont l'empreinte n'a pas changé n'est ni réécrit ni relié de nouveau à
+ses catégories: le remoissonnage d'un catalogue stable n'écrit presque rien.
+
+Les réponses CKAN brutes des jeux retenus sont archivées, compressées, avec
+chaque lot (voir archive).
+
+Sur SQLite, qui n'admet qu'un écrivain, les transactions de lots sont
+sérialisées par VERROU_ECRITURE entre les fils d'un même processus; le
+verrou ne couvre pas les autres processus (serveur web, planificateur), et
+le moissonnage de plusieurs sources en parallèle requiert donc PostgreSQL
+(voir CoordinateurMoissonnage).
+"""
+import hashlib
+import json
+import threading
+from contextlib import nullcontext
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from donnees.models import JeuDonnees, Ressource
+from .archive import archiver, compresser
+from .models import ArchiveJeuDonnees
+
+CHAMPS_JEU_DONNEES = [
+    'titre', 'ckan_name', 'description', 'organisation', 'categories', 'etiquettes',
+    'niveau_acces', 'url_originale', 'date_metadata_creation', 'date_metadata_modification', 'empreinte',
+]
+
+CHAMPS_RESSOURCE = [
+    'nom', 'jeu_donnees', 'format_fichier', 'type_ressource', 'url', 'taille',
+    'description', 'methode_collecte', 'contexte_collecte', 'attributs', 'empreinte',
+]
+
+# Sérialise les écritures de lots entre les fils d'un même processus sur SQLite
+VERROU_ECRITURE = threading.Lock()
+
+
+def calculer_empreinte(champs):
+    """Empreinte SHA-256 de champs normalisés (clés triées, dates en ISO 8601)"""
+    contenu = json.dumps(champs, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(contenu.encode('utf-8')).hexdigest()
+
+
+def verrou_ecriture():
+    """Verrou à prendre autour d'une transaction d'écriture partagée (sans effet hors SQLite)"""
+    return VERROU_ECRITURE if connection.vendor == 'sqlite' else nullcontext()
+
+
+class EcrivainLots:
+    """Accumule les jeux de données normalisés et les écrit en lots"""
+
+    def __init__(self, service, taille_lot=None, archiver=None):
+        """
+        Args:
+            service: Instance de ServiceMoissonnage (normalisation et filtres)
+            taille_lot: Nombre de jeux par lot. Par défaut, settings.MOISSONNAGE_TAILLE_LOT.
+            archiver: Archiver les réponses CKAN brutes. Par défaut, settings.MOISSONNAGE_ARCHIVE_BRUTE.
+        """
+        self.service = service
+        self.taille_lot = taille_lot or getattr(settings, 'MOISSONNAGE_TAILLE_LOT', 500)
+        self.archiver = archiver if archiver is not None else getattr(settings, 'MOISSONNAGE_ARCHIVE_BRUTE', True)
+        self.en_attente = []
+        self.archives_en_attente = []
+        self.archives_ecrites = 0
+        self.jeux_ecrits = 0
+        self.ressources_ecrites = 0
+        # Bilan des jeux écrits ou ignorés, selon leur empreinte
+        self.nouveaux = 0
+        self.modifies = 0
+        self.inchanges = 0
+        
+        # Des lignes antérieures aux identifiants CKAN restent-elles à adopter?
+        self.historique_jeux = JeuDonnees.objects.filter(ckan_id__isnull=True).exists()
+        self.historique_ressources = Ressource.objects.filter(ckan_id__isnull=True).exists()
+
+    def ajouter(self, donnees_jeu, organisation):
+        """
+        Ajoute un jeu de données CKAN au lot courant (écrit lorsque le lot est plein)
+
+        Returns:
+            int: Nombre de ressources mises en attente, ou None si le jeu est exclu ou invalide
+        """
+        prepare = self.preparer(donnees_jeu)
+        if prepare is None:
+            return None
+        return self.ajouter_prepare(prepare, organisation)
+
+    def preparer(self, donnees_jeu):
+        """
+        Filtre et normalise un jeu de données CKAN, sans accès à la base de données
+
+        Peut s'exécuter dans un autre fil que celui de l'écriture (PipelineMoissonnage).
+
+        Returns:
+            tuple: (donnees_jeu, champs du jeu, champs des ressources avec leur empreinte,
+                    archive (ckan_id, empreinte, contenu compressé) ou None),
+                   ou None si le jeu est exclu ou invalide
+        """
+        if not self.service._applique_filtres_jeu_donnees(donnees_jeu):
+            return None
+
+        try:
+            champs_jeu = self.service.normaliser_jeu_donnees(donnees_jeu)
+            champs_ressources = [
+                self.service.normaliser_ressource(ressource_data)
+                for ressource_data in donnees_jeu.get('resources', [])
+            ]
+        except Exception as e:
+            print(f"Erreur lors de la normalisation du jeu de données {donnees_jeu.get('title', 'N/A')}: {e}")
+            return None
+
+        for champs in champs_ressources:
+            champs['empreinte'] = calculer_empreinte(champs)
+        archive = None
+        if self.archiver and champs_jeu['ckan_id']:
+            archive = (champs_jeu['ckan_id'], *compresser(donnees_jeu))
+        return donnees_jeu, champs_jeu, champs_ressources, archive
+
+    def ajouter_prepare(self, prepare, organisation):
+        """
+        Ajoute au lot courant un jeu préparé par preparer(), rattaché à son organisation
+
+        Returns:
+            int: Nombre de ressources mises en attente
+        """
+        donnees_jeu, champs_jeu, champs_ressources, archive = prepare
+        # L'empreinte du jeu couvre son organisation, connue seulement au moment de l'écriture
+        champs_jeu['empreinte'] = calculer_empreinte({
+            **champs_jeu,
+            'organisation': organisation.pk,
+            'ressources': [champs['empreinte'] for champs in champs_ressources],
+        })
+        champs_jeu['organisation'] = organisation
+        self.en_attente.append((donnees_jeu, champs_jeu, champs_ressources))
+        if archive:
+            self.archives_en_attente.append(archive)
+
+        if len(self.en_attente) >= self.taille_lot:
+            self.vider()
+
+        return len(champs_ressources)
+
+    def vider(self):
+        """Écrit le lot en attente dans une seule transaction"""
+        if not self.en_attente:
+            return
+
+        lot, self.en_attente = self.en_attente, []
+        archives, self.archives_en_attente = self.archives_en_attente, []
+        telemetrie = self.service.telemetrie
+        with verrou_ecriture():
+            try:
+                with telemetrie.etape('ecriture_lots'), transaction.atomic():
+                    jeux_ecrits, ressources_ecrites, bilan = self._ecrire_lot(lot)
+            except Exception as e:
+                # Une ligne invalide ne doit pas faire perdre tout le lot: reprise ligne par ligne
+                print(f"Erreur lors de l'écriture d'un lot de {len(lot)} jeux de données, reprise unitaire: {e}")
+                jeux_ecrits, ressources_ecrites, bilan = self._ecrire_unitairement(lot)
+            with telemetrie.etape('archivage'):
+                self._archiver(archives)
+
+        self.jeux_ecrits += jeux_ecrits
+        self.ressources_ecrites += ressources_ecrites
+        telemetrie.lignes_ecrites(JeuDonnees._meta.db_table, jeux_ecrits)
+        telemetrie.lignes_ecrites(Ressource._meta.db_table, ressources_ecrites)
+        self.nouveaux += bilan.get('nouveaux', 0)
+        self.modifies += bilan.get('modifies', 0)
+        self.inchanges += bilan.get('inchanges', 0)
+
+    def _archiver(self, archives):
+        """Écrit les réponses brutes du lot (un échec n'interrompt pas le moissonnage)"""
+        if not archives:
+            return
+        try:
+            with transaction.atomic():
+                ecrites = archiver(self.service.source, archives, self.taille_lot)
+            self.archives_ecrites += ecrites
+            self.service.telemetrie.lignes_ecrites(ArchiveJeuDonnees._meta.db_table, ecrites)
+        except Exception as e:
+            print(f"Erreur lors de l'archivage de {len(archives)} réponses CKAN: {e}")
+
+    def _ecrire_lot(self, lot):
+        """
+        Upsert des jeux nouveaux ou modifiés, puis de leurs ressources modifiées
+
+        Returns:
+            tuple: (jeux écrits, ressources écrites, {'nouveaux', 'modifies', 'inchanges'})
+        """
+        source = self.service.source
+
+        # Les jeux sans identifiant CKAN ne peuvent pas être upsertés sur la clé unique
+        sans_identifiant = [entree for entree in lot if not entree[1]['ckan_id']]
+        jeux_ecrits, ressources_ecrites, bilan = self._ecrire_unitairement(sans_identifiant)
+
+        # Dédoublonnage sur l'identifiant CKAN (la dernière version l'emporte)
+        par_identifiant = {
+            champs_jeu['ckan_id']: (champs_jeu, champs_ressources)
+            for _, champs_jeu, champs_ressources in lot
+            if champs_jeu['ckan_id']
+        }
+        if not par_identifiant:
+            return jeux_ecrits, ressources_ecrites, bilan
+
+        if self.historique_jeux:
+            self._adopter_lignes_historiques(
+                JeuDonnees,
+                {ckan_id: champs_jeu['titre'] for ckan_id, (champs_jeu, _) in par_identifiant.items()},
+                {'titre__in': [champs_jeu['titre'] for champs_jeu, _ in par_identifiant.values()]},
+                lambda jeu: jeu.titre
+            )
+
+        # Les jeux dont l'empreinte n'a pas changé ne sont pas réécrits
+        empreintes = dict(
+            JeuDonnees.objects.filter(source=source, ckan_id__in=list(par_identifiant)).values_list('ckan_id', 'empreinte')
+        )
+        a_ecrire = {}
+        for ckan_id, (champs_jeu, champs_ressources) in par_identifiant.items():
+            if ckan_id not in empreintes:
+                bilan['nouveaux'] += 1
+            elif empreintes[ckan_id] == champs_jeu['empreinte']:
+                bilan['inchanges'] += 1
+                continue
+            else:
+                bilan['modifies'] += 1
+            a_ecrire[ckan_id] = (champs_jeu, champs_ressources)
+        if not a_ecrire:
+            return jeux_ecrits, ressources_ecrites, bilan
+
+        jeux = [JeuDonnees(source=source, **champs_jeu) for champs_jeu, _ in a_ecrire.values()]
+        JeuDonnees.objects.bulk_create(
+            jeux,
+            batch_size=self.taille_lot,
+            update_conflicts=True,
+            unique_fields=['source', 'ckan_id'],
+            update_fields=CHAMPS_JEU_DONNEES + ['date_modification'],
+        )
+        self._completer_cles_primaires(JeuDonnees, jeux)
+
+        # Ressources: même principe, rattachées aux jeux qui viennent d'être écrits
+        ressources = []
+        for jeu, (_, champs_ressources) in zip(jeux, a_ecrire.values()):
+            for champs in champs_ressources:
+                ressources.append(Ressource(source=source, jeu_donnees=jeu, **champs))
+
+        ressources_sans_identifiant = [ressource for ressource in ressources if not ressource.ckan_id]
+        ressources = list({ressource.ckan_id: ressource for ressource in ressources if ressource.ckan_id}.values())
+        empreintes = dict(
+            Ressource.objects.filter(
+                source=source, ckan_id__in=[ressource.ckan_id for ressource in ressources]
+            ).values_list('ckan_id', 'empreinte')
+        )
+        ressources = [ressource for ressource in ressources if empreintes.get(ressource.ckan_id) != ressource.empreinte]
+
+        if self.historique_ressources:
+            self._adopter_lignes_historiques(
+                Ressource,
+                {ressource.ckan_id: (ressource.jeu_donnees_id, ressource.nom) for ressource in ressources},
+                {'jeu_donnees__in': [jeu.pk for jeu in jeux]},
+                lambda ressource: (ressource.jeu_donnees_id, ressource.nom)
+            )
+
+        Ressource.objects.bulk_create(
+            ressources,
+            batch_size=self.taille_lot,
+            update_conflicts=True,
+            unique_fields=['source', 'ckan_id'],
+            update_fields=CHAMPS_RESSOURCE + ['date_modification'],
+        )
+
+        for ressource in ressources_sans_identifiant:
+            valeurs = {champ: getattr(ressource, champ) for champ in CHAMPS_RESSOURCE if champ not in ('nom', 'jeu_donnees')}
+            Ressource.objects.update_or_create(
+                jeu_donnees=ressource.jeu_donnees, nom=ressource.nom, ckan_id=None,
+                defaults={'source': source, **valeurs}
+            )
+
+        self.service._synchroniser_categories(jeux)
+
+        return (
+            jeux_ecrits + len(jeux),
+            ressources_ecrites + len(ressources) + len(ressources_sans_identifiant),
+            bilan,
+        )
+
+    def _adopter_lignes_historiques(self, modele, cles_historiques, filtre, cle_ligne):
+        """
+        Associe leur identifiant CKAN aux lignes antérieures (ckan_id vide)
+
+        Args:
+            modele: JeuDonnees ou Ressource
+            cles_historiques: {ckan_id: clé historique} pour les lignes du lot
+            filtre: Filtre restreignant les lignes candidates
+            cle_ligne: Fonction calculant la clé historique d'une ligne existante
+        """
+        source = self.service.source
+        deja_connus = set(
+            modele.objects.filter(source=source, ckan_id__in=list(cles_historiques)).values_list('ckan_id', flat=True)
+        )
+        a_adopter = {cle: ckan_id for ckan_id, cle in cles_historiques.items() if ckan_id not in deja_connus}
+        if not a_adopter:
+            return
+
+        adoptees = []
+        candidates = modele.objects.filter(
+            Q(source=source) | Q(source__isnull=True), ckan_id__isnull=True, **filtre
+        ).order_by('pk')
+        for ligne in candidates:
+            ckan_id = a_adopter.pop(cle_ligne(ligne), None)
+            if ckan_id:
+                ligne.ckan_id = ckan_id
+                ligne.source = source
+                adoptees.append(ligne)
+
+        modele.objects.bulk_update(adoptees, ['ckan_id', 'source'], batch_size=self.taille_lot)
+
+    def _completer_cles_primaires(self, modele, objets):
+        """Relit les clés primaires si le SGBD ne les a pas retournées après l'upsert"""
+        manquants = {objet.ckan_id: objet for objet in objets if objet.pk is None}
+        if not manquants:
+            return
+
+        existants = modele.objects.filter(
+            source=self.service.source, ckan_id__in=list(manquants)
+        ).values_list('ckan_id', 'pk')
+        for ckan_id, pk in existants:
+            manquants[ckan_id].pk = pk
+
+    def _ecrire_unitairement(self, lot):
+        """
+        Chemin de repli: écrit chaque jeu et ses ressources un à un, avec leurs empreintes
+
+        Une erreur n'annule que le jeu concerné (point de sauvegarde par jeu).
+
+        Returns:
+            tuple: (jeux écrits, ressources écrites, {'nouveaux', 'modifies', 'inchanges'})
+        """
+        jeux_ecrits, ressources_ecrites = 0, 0
+        bilan = {'nouveaux': 0, 'modifies': 0, 'inchanges': 0}
+        for _, champs_jeu, champs_ressources in lot:
+            try:
+                with transaction.atomic():
+                    etat, ressources = self._ecrire_jeu(champs_jeu, champs_ressources)
+            except Exception as e:
+                print(f"Erreur lors de la sauvegarde du jeu de données {champs_jeu.get('titre', 'N/A')}: {e}")
+                continue
+            bilan[etat] += 1
+            if etat != 'inchanges':
+                jeux_ecrits += 1
+                ressources_ecrites += ressources
+        return jeux_ecrits, ressources_ecrites, bilan
+
+    def _ecrire_jeu(self, champs_jeu, champs_ressources):
+        """
+        Écrit un jeu normalisé et ses ressources modifiées, sauf si son empreinte est inchangée
+
+        Returns:
+            tuple: ('nouveaux', 'modifies' ou 'inchanges', ressources écrites)
+        """
+        service = self.service
+        jeu = service._trouver_par_identifiant(JeuDonnees, champs_jeu['ckan_id'], titre=champs_jeu['titre'])
+        if jeu is None:
+            jeu = JeuDonnees.objects.create(source=service.source, **champs_jeu)
+            etat = 'nouveaux'
+        elif jeu.empreinte == champs_jeu['empreinte']:
+            return 'inchanges', 0
+        else:
+            for champ, valeur in champs_jeu.items():
+                setattr(jeu, champ, valeur)
+            jeu.source = service.source
+            jeu.save()
+            etat = 'modifies'
+
+        ressources_ecrites = 0
+        for champs in champs_ressources:
+            ressource = service._trouver_par_identifiant(
+                Ressource, champs['ckan_id'], jeu_donnees=jeu, nom=champs['nom']
+            )
+            if ressource is None:
+                Ressource.objects.create(source=service.source, jeu_donnees=jeu, **champs)
+            elif ressource.empreinte != champs['empreinte'] or ressource.jeu_donnees_id != jeu.pk:
+                for champ, valeur in champs.items():
+                    setattr(ressource, champ, valeur)
+                ressource.source = service.source
+                ressource.jeu_donnees = jeu
+                ressource.save()
+            else:
+                continue
+            ressources_ecrites += 1
+
+        service._synchroniser_categories([jeu])
+        return etat, ressources_ecrites
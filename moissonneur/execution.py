@@ -0,0 +1,365 @@
+"""
+Exécution d'un moissonnage avec points de reprise.
+
+ExecuteurMoissonnage enchaîne les phases (organisations, jeux de données,
+finalisation) d'une MoissonnageExecution. Le curseur n'est enregistré que
+lorsque l'écrivain par lots est vide: tout ce qui précède le curseur est
+donc écrit en base, et une exécution arrêtée ou interrompue reprend à cette
+position sans refaire les pages déjà traitées; en recherche, la position est
+la clé de tri du dernier jeu écrit (cle_reprise), insensible aux jeux ajoutés
+ou modifiés en amont entre-temps. Entre deux points de reprise,
+la progression en direct passe par RapporteurProgression (cache).
+
+Un moissonnage complet, sans filtre, dont les jeux de données ont tous été
+parcourus dans la même tentative supprime ensuite les lignes retirées en
+amont (identifiants CKAN non vus); une reprise ne connaît pas les
+identifiants vus avant l'interruption et n'élague donc pas.
+
+La télémétrie du service (voir telemetrie) est enregistrée avec chaque point
+de reprise; les requêtes SQL mesurées sont celles du fil de l'exécuteur, qui
+porte toutes les écritures.
+"""
+import time
+import traceback
+from django.utils import timezone
+from coeur.tableau_bord import invalider_tableau_bord
+from donnees.statistiques import rafraichir_statistiques
+from .ecriture import EcrivainLots, verrou_ecriture
+from .models import MoissonnageExecution
+from .pipeline import PipelineMoissonnage
+from .progression import RapporteurProgression
+from .services import ServiceMoissonnage, cle_tri
+from .suppression import elaguer_source
+
+# Intervalle (secondes) entre deux points de reprise et deux lectures de la demande d'arrêt
+INTERVALLE_POINT_REPRISE = 5
+
+# Champs écrits par l'exécuteur (arret_demande n'est écrit que par les vues)
+CHAMPS_SUIVIS = [
+    'statut', 'phase', 'curseur', 'cle_reprise', 'total_organisations', 'total_jeux_donnees', 'organisations',
+    'jeux_donnees', 'ressources', 'erreurs', 'erreurs_recuperation', 'jeux_nouveaux', 'jeux_modifies',
+    'jeux_inchanges', 'jeux_supprimes', 'ressources_supprimees', 'progression', 'message',
+    'derniere_erreur', 'nombre_reprises', 'date_debut', 'date_fin', 'durees', 'pipeline', 'telemetrie',
+    'date_modification',
+]
+
+
+class ArretDemande(Exception):
+    """Levée lorsque l'arrêt de l'exécution a été demandé"""
+
+
+class ExecuteurMoissonnage:
+    """Exécute une MoissonnageExecution phase par phase, depuis son point de reprise"""
+
+    def __init__(self, execution, service=None, doit_arreter=None):
+        """
+        Args:
+            execution: Instance de MoissonnageExecution à exécuter ou reprendre
+            service: Instance de ServiceMoissonnage. Par défaut, un service sur la source
+                     de l'exécution, avec sa configuration de filtres.
+            doit_arreter: Fonction sans argument signalant un arrêt demandé par le processus
+                          (ex: travailleur recevant SIGTERM), en plus de arret_demande
+        """
+        self.execution = execution
+        self.doit_arreter = doit_arreter or (lambda: False)
+        self.service = service or ServiceMoissonnage(
+            source=execution.source, configuration_filtres=execution.configuration_filtres
+        )
+        # Les échecs des tentatives précédentes empêchent toujours d'avancer le filigrane
+        self.service.erreurs_recuperation = execution.erreurs_recuperation
+        # Les mesures des tentatives précédentes sont cumulées
+        self.telemetrie = self.service.telemetrie
+        self.telemetrie.charger(execution.telemetrie)
+        self.ecrivain = None
+        self.pipeline = None
+        self._bilan_initial = None
+        self._cle_courante = None
+        # Identifiants CKAN vus pendant le parcours des jeux de données de cette tentative
+        self.jeux_vus = set()
+        self.ressources_vues = set()
+        self.parcours_complet = False
+        self.elagage_annule = False
+        self.rapporteur = RapporteurProgression(execution, complements=self._mesures_pipeline)
+        self._dernier_point = time.monotonic()
+        self._debut_phase = time.monotonic()
+
+    def executer(self):
+        """
+        Exécute (ou reprend) le moissonnage
+
+        Returns:
+            MoissonnageExecution: L'exécution, avec son statut final
+        """
+        execution = self.execution
+        if execution.date_debut is None:
+            execution.date_debut = timezone.now()
+        else:
+            execution.nombre_reprises += 1
+        execution.statut = 'en_cours'
+        execution.date_fin = None
+        execution.derniere_erreur = ''
+        execution.save(update_fields=CHAMPS_SUIVIS)
+
+        with self.telemetrie.requetes_bd():
+            self._executer_phases()
+
+        self._cumuler_duree()
+        execution.date_fin = timezone.now()
+        execution.erreurs_recuperation = self.service.erreurs_recuperation
+        self._reporter_bilan_ecriture()
+        self._mesures_pipeline()
+        execution.telemetrie = self.telemetrie.instantane()
+        execution.save(update_fields=CHAMPS_SUIVIS)
+        self.rapporteur.publier()
+        return execution
+
+    def _executer_phases(self):
+        """Enchaîne les phases depuis le point de reprise et fixe le statut final de l'exécution"""
+        execution = self.execution
+        try:
+            if execution.phase == 'organisations':
+                if not execution.incremental:
+                    self._moissonner_organisations()
+                self._changer_phase('jeux_donnees')
+
+            if execution.phase == 'jeux_donnees':
+                self._moissonner_jeux_donnees()
+                self._changer_phase('finalisation')
+
+            self._finaliser()
+            execution.statut = 'terminee'
+            execution.progression = 100
+            execution.message = (
+                f'✅ Terminé ! Organisations: {execution.organisations}, '
+                f'Jeux: {execution.jeux_donnees} ({execution.jeux_nouveaux} nouveaux, '
+                f'{execution.jeux_modifies} modifiés, {execution.jeux_inchanges} inchangés), '
+                f'Ressources: {execution.ressources}'
+            )
+            if execution.jeux_supprimes or execution.ressources_supprimees:
+                execution.message += (
+                    f', Supprimés: {execution.jeux_supprimes} jeux, {execution.ressources_supprimees} ressources'
+                )
+            if self.elagage_annule:
+                execution.message += ' ⚠️ Élagage annulé (seuil de suppression dépassé)'
+            execution.message = execution.message[:300]
+
+        except ArretDemande:
+            self._publier()
+            execution.statut = 'arretee'
+            execution.message = '⚠️ Moissonnage arrêté'
+
+        except Exception as e:
+            execution.statut = 'echouee'
+            execution.message = f'❌ Erreur: {str(e)}'[:300]
+            execution.derniere_erreur = traceback.format_exc()
+
+    def _moissonner_organisations(self):
+        """Phase 1: organisations (les appels organization_show sont parallélisés)"""
+        execution = self.execution
+        execution.message = 'Récupération des organisations...'
+        execution.progression = 5
+        self._point_de_reprise(force=True)
+
+        noms_organisations = self.service.recuperer_organisations()
+        execution.total_organisations = len(noms_organisations)
+        details_organisations = self.service.recuperer_en_parallele(
+            self.service.recuperer_details_organisation, noms_organisations[execution.curseur:]
+        )
+        for idx, (nom_org, details_org) in enumerate(details_organisations, start=execution.curseur):
+            if details_org and self.service.sauvegarder_organisation(details_org):
+                execution.organisations += 1
+
+            # Chaque organisation est écrite immédiatement: le curseur est toujours durable
+            execution.curseur = idx + 1
+            execution.progression = 5 + int((idx + 1) / len(noms_organisations) * 20)
+            self._point_de_reprise()
+            if self.rapporteur.signaler():
+                self._point_de_reprise(force=True, arret=True)
+
+    def _moissonner_jeux_donnees(self):
+        """Phase 2: jeux de données et ressources, écrits par lots"""
+        execution = self.execution
+        execution.message = 'Récupération des jeux de données...'
+        execution.progression = 25
+        self._point_de_reprise(force=True)
+
+        self.ecrivain = EcrivainLots(self.service)
+        parcours_depuis_le_debut = execution.curseur == 0
+        jeux_manquants = 0
+        # Les compteurs de l'exécution cumulent toutes les tentatives; ceux de l'écrivain, la tentative courante
+        self._bilan_initial = (execution.jeux_nouveaux, execution.jeux_modifies, execution.jeux_inchanges)
+        ecrits_au_dernier_point = 0
+        position = 0
+        # Clé de tri du dernier jeu reçu: le curseur de reprise de package_search
+        self._cle_courante = execution.cle_reprise or None
+        # Récupération et normalisation tournent dans leurs fils; l'écriture et les points de reprise restent ici
+        self.pipeline = PipelineMoissonnage(self.service, self.ecrivain)
+        jeux_donnees = self.pipeline.executer(
+            self.service.iterer_jeux_donnees(
+                incremental=execution.incremental, debut=execution.curseur, apres=execution.cle_reprise or None
+            )
+        )
+        try:
+            for idx, total_jeux, details_jeu, nombre_ressources in jeux_donnees:
+                position = idx + 1
+                self._cle_courante = cle_tri(details_jeu) or self._cle_courante
+                if details_jeu:
+                    self.jeux_vus.add(details_jeu.get('id'))
+                    self.ressources_vues.update(ressource.get('id') for ressource in details_jeu.get('resources') or [])
+                else:
+                    jeux_manquants += 1
+                if nombre_ressources is None:
+                    execution.erreurs += 1
+                else:
+                    execution.jeux_donnees += 1
+                    execution.ressources += nombre_ressources
+
+                execution.total_jeux_donnees = total_jeux
+                execution.progression = 25 + int(position / total_jeux * 70)
+                execution.message = f'Traitement des jeux de données ({position}/{total_jeux})...'
+
+                # Point de reprise seulement quand tout ce qui précède est écrit en base
+                if not self.ecrivain.en_attente:
+                    self._noter_curseur(position)
+                    lot_ecrit = self.ecrivain.jeux_ecrits != ecrits_au_dernier_point
+                    ecrits_au_dernier_point = self.ecrivain.jeux_ecrits
+                    self._point_de_reprise(force=lot_ecrit)
+                else:
+                    self._signaler_activite(position)
+
+                if self.rapporteur.signaler():
+                    self._arreter(position)
+        finally:
+            # Arrêt demandé ou erreur d'écriture: les fils du pipeline cessent leurs appels HTTP
+            jeux_donnees.close()
+
+        self.ecrivain.vider()
+        if position:
+            self._noter_curseur(position)
+        # Un jeu dont le détail manque (package_show en échec) serait pris pour un jeu retiré
+        self.parcours_complet = parcours_depuis_le_debut and not jeux_manquants
+        self._point_de_reprise(force=True)
+
+    def _finaliser(self):
+        """Phase 3: catégories, filigrane de synchronisation et statistiques"""
+        self.execution.message = 'Finalisation...'
+        self._point_de_reprise(force=True)
+
+        with self.telemetrie.etape('elagage'):
+            self._elaguer()
+        self.service.finaliser_categories()
+        self.service.finaliser_synchronisation(self.execution.date_debut)
+        with self.telemetrie.etape('statistiques'):
+            with verrou_ecriture():
+                rafraichir_statistiques()
+            invalider_tableau_bord()
+
+    def _elaguer(self):
+        """Supprime les jeux et ressources retirés en amont, si le parcours couvre toute la source"""
+        execution = self.execution
+        if (
+            execution.incremental
+            or self.service.filtres.actifs
+            or self.service.erreurs_recuperation
+            or not self.parcours_complet
+        ):
+            return
+
+        self.jeux_vus.discard(None)
+        self.ressources_vues.discard(None)
+        bilan = elaguer_source(execution.source, self.jeux_vus, self.ressources_vues)
+        execution.jeux_supprimes += bilan['jeux']
+        execution.ressources_supprimees += bilan['ressources']
+        self.elagage_annule = bilan['annule']
+        self._point_de_reprise(force=True)
+
+    def _publier(self):
+        """Écrit le lot en cours et publie les données déjà moissonnées (arrêt demandé)"""
+        if self.ecrivain is not None:
+            self.ecrivain.vider()
+        self.service.finaliser_categories()
+        with verrou_ecriture():
+            rafraichir_statistiques()
+        invalider_tableau_bord()
+
+    def _changer_phase(self, phase):
+        """Passe à la phase suivante en remettant le curseur à zéro"""
+        self._cumuler_duree()
+        self.execution.phase = phase
+        self.execution.curseur = 0
+        self.execution.cle_reprise = []
+        self._point_de_reprise(force=True)
+
+    def _cumuler_duree(self):
+        """Ajoute le temps passé dans la phase courante aux durées de l'exécution"""
+        maintenant = time.monotonic()
+        durees = self.execution.durees
+        phase = self.execution.phase
+        durees[phase] = round(durees.get(phase, 0) + maintenant - self._debut_phase, 3)
+        self._debut_phase = maintenant
+
+    def _point_de_reprise(self, force=False, arret=False):
+        """
+        Enregistre la phase, le curseur et les compteurs (au plus une fois par intervalle)
+
+        Args:
+            force: Enregistrer même si l'intervalle n'est pas écoulé
+            arret: L'arrêt est déjà connu (signal du cache): lever ArretDemande après l'enregistrement
+
+        Raises:
+            ArretDemande: Si l'arrêt a été demandé depuis le dernier point de reprise
+        """
+        if not force and time.monotonic() - self._dernier_point < INTERVALLE_POINT_REPRISE:
+            return
+        self._dernier_point = time.monotonic()
+
+        execution = self.execution
+        execution.erreurs_recuperation = self.service.erreurs_recuperation
+        self._reporter_bilan_ecriture()
+        self._mesures_pipeline()
+        execution.telemetrie = self.telemetrie.instantane()
+        execution.save(update_fields=CHAMPS_SUIVIS)
+        if force:
+            self.rapporteur.publier()
+        if arret or self.doit_arreter() or MoissonnageExecution.objects.filter(pk=execution.pk, arret_demande=True).exists():
+            raise ArretDemande()
+
+    def _reporter_bilan_ecriture(self):
+        """Reporte sur l'exécution les jeux nouveaux, modifiés et inchangés comptés par l'écrivain"""
+        if self.ecrivain is None:
+            return
+        nouveaux, modifies, inchanges = self._bilan_initial
+        self.execution.jeux_nouveaux = nouveaux + self.ecrivain.nouveaux
+        self.execution.jeux_modifies = modifies + self.ecrivain.modifies
+        self.execution.jeux_inchanges = inchanges + self.ecrivain.inchanges
+
+    def _mesures_pipeline(self):
+        """Reporte sur l'exécution le débit des étapes et la profondeur des files du pipeline"""
+        if self.pipeline is not None:
+            self.execution.pipeline = self.pipeline.statistiques()
+        return {'pipeline': self.execution.pipeline}
+
+    def _signaler_activite(self, position):
+        """
+        Signale que l'exécution est active et lit la demande d'arrêt en base pendant
+        qu'un lot est en attente d'écriture (une seule requête par intervalle)
+        """
+        if time.monotonic() - self._dernier_point < INTERVALLE_POINT_REPRISE:
+            return
+        active = MoissonnageExecution.objects.filter(pk=self.execution.pk, arret_demande=False).update(
+            date_modification=timezone.now()
+        )
+        self._dernier_point = time.monotonic()
+        if not active or self.doit_arreter():
+            self._arreter(position)
+
+    def _arreter(self, position):
+        """Écrit le lot en cours pour que le curseur couvre les jeux déjà traités, puis s'arrête"""
+        self.ecrivain.vider()
+        self._noter_curseur(position)
+        self._point_de_reprise(force=True, arret=True)
+
+    def _noter_curseur(self, position):
+        """Reporte la position et la clé de tri du dernier jeu écrit sur l'exécution"""
+        self.execution.curseur = position
+        self.execution.cle_reprise = self._cle_courante or []
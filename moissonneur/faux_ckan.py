@@ -0,0 +1,243 @@
+"""
+Serveur CKAN factice pour les tests et les mesures de performance.
+
+CatalogueSynthetique génère un catalogue déterministe (organisations,
+groupes, jeux de données, ressources); ServeurCkanFactice le sert en HTTP
+sur 127.0.0.1 (ThreadingHTTPServer, dans un fil d'arrière-plan) avec les
+actions utilisées par le moissonneur: organization_list, organization_show,
+group_list, package_list, package_show et package_search. Une latence et un
+taux d'erreurs (réponses 503) peuvent être simulés.
+
+Usage:
+    with ServeurCkanFactice(CatalogueSynthetique(jeux=1000)) as serveur:
+        source.url_base = serveur.url_base
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FORMATS = ['CSV', 'JSON', 'GeoJSON', 'SHP', 'XLSX', 'PDF']
+
+# Filtre fq incrémental produit par ServiceMoissonnage.filtre_incremental()
+MOTIF_METADATA_MODIFIED = re.compile(r'metadata_modified:\[(\S+) TO \*\]')
+# Clause de reprise sur la clé de tri (voir ServiceMoissonnage.clause_apres)
+MOTIF_APRES = re.compile(r'metadata_modified:\{(\S+) TO \*\] OR \(metadata_modified:"\S+" AND name:\{"([^"]+)" TO \*\]\)')
+
+
+class CatalogueSynthetique:
+    """Catalogue CKAN déterministe de taille configurable"""
+
+    def __init__(self, organisations=10, jeux=100, ressources_par_jeu=3, groupes=8, graine=0):
+        """
+        Args:
+            organisations: Nombre d'organisations
+            jeux: Nombre de jeux de données
+            ressources_par_jeu: Nombre de ressources par jeu de données
+            groupes: Nombre de groupes (catégories)
+            graine: Graine du générateur (même graine, même catalogue)
+        """
+        aleatoire = random.Random(graine)
+        debut = datetime(2020, 1, 1)
+
+        self.groupes = [
+            {'id': f'groupe-{i}', 'name': f'groupe-{i}', 'title': f'Catégorie {i}'}
+            for i in range(groupes)
+        ]
+        types = ['Ville de', 'Ministère de', 'Agence de', 'Université de', 'Société de']
+        self.organisations = [
+            {
+                'id': f'org-{i}', 'name': f'organisation-{i}',
+                'title': f'{types[i % len(types)]} Test {i}',
+                'description': f'Organisation synthétique {i}',
+                'package_count': 0,
+            }
+            for i in range(organisations)
+        ]
+
+        self.jeux = []
+        for i in range(jeux):
+            organisation = self.organisations[i % organisations] if organisations else None
+            if organisation:
+                organisation['package_count'] += 1
+            date = debut + timedelta(minutes=i)
+            self.jeux.append({
+                'id': f'jeu-{i}',
+                'name': f'jeu-donnees-{i}',
+                'title': f'Jeu de données {i}',
+                'notes': f'Description du jeu de données synthétique {i}. ' * 3,
+                'private': False,
+                'url': f'https://exemple.test/jeux/{i}',
+                'metadata_created': date.isoformat(),
+                'metadata_modified': date.isoformat(),
+                'organization': dict(organisation) if organisation else None,
+                'groups': aleatoire.sample(self.groupes, min(len(self.groupes), aleatoire.randint(1, 2))),
+                'tags': [{'name': f'etiquette-{aleatoire.randint(0, 49)}'} for _ in range(3)],
+                'resources': [
+                    {
+                        'id': f'jeu-{i}-ressource-{j}',
+                        'name': f'ressource-{j}',
+                        'format': aleatoire.choice(FORMATS),
+                        'url': f'https://exemple.test/jeux/{i}/{j}',
+                        'size': aleatoire.randint(1_000, 10_000_000),
+                        'description': f'Ressource {j} du jeu {i}',
+                    }
+                    for j in range(ressources_par_jeu)
+                ],
+            })
+        self._jeux_par_cle = {jeu['id']: jeu for jeu in self.jeux}
+        self._jeux_par_cle.update({jeu['name']: jeu for jeu in self.jeux})
+        self._organisations_par_cle = {org['id']: org for org in self.organisations}
+        self._organisations_par_cle.update({org['name']: org for org in self.organisations})
+
+    def jeu(self, cle):
+        return self._jeux_par_cle.get(cle)
+
+    def organisation(self, cle):
+        return self._organisations_par_cle.get(cle)
+
+
+class _Gestionnaire(BaseHTTPRequestHandler):
+    """Répond aux appels /api/3/action/<action> à partir du catalogue du serveur"""
+
+    def do_GET(self):
+        serveur = self.server.faux_ckan
+        url = urlparse(self.path)
+        action = url.path.rstrip('/').rsplit('/', 1)[-1]
+        params = {cle: valeurs[-1] for cle, valeurs in parse_qs(url.query).items()}
+        serveur.compter(action)
+
+        if serveur.latence:
+            time.sleep(serveur.latence)
+        if serveur.tirer_erreur():
+            return self._repondre(503, {'success': False, 'error': {'message': 'Service indisponible'}})
+
+        traitement = getattr(serveur, f'_action_{action}', None)
+        if traitement is None:
+            return self._repondre(400, {'success': False, 'error': {'message': f'Action inconnue: {action}'}})
+
+        resultat = traitement(params)
+        if resultat is None:
+            return self._repondre(404, {'success': False, 'error': {'message': 'Introuvable'}})
+        return self._repondre(200, {'success': True, 'result': resultat})
+
+    def _repondre(self, statut, contenu):
+        corps = json.dumps(contenu).encode('utf-8')
+        self.send_response(statut)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+        self.server.faux_ckan.compter_octets(len(corps))
+
+    def log_message(self, format, *args):
+        """Journal d'accès désactivé"""
+
+
+class ServeurCkanFactice:
+    """Serveur HTTP local exposant un CatalogueSynthetique avec l'API d'action CKAN"""
+
+    def __init__(self, catalogue=None, latence=0.0, taux_erreur=0.0, graine=0):
+        """
+        Args:
+            catalogue: CatalogueSynthetique servi (par défaut, un petit catalogue)
+            latence: Délai (secondes) ajouté à chaque réponse
+            taux_erreur: Probabilité (0-1) qu'un appel réponde 503
+            graine: Graine du tirage des erreurs
+        """
+        self.catalogue = catalogue or CatalogueSynthetique()
+        self.latence = latence
+        self.taux_erreur = taux_erreur
+        self.appels = Counter()
+        self.octets = 0
+        self._aleatoire = random.Random(graine)
+        self._verrou = threading.Lock()
+        self._serveur = None
+        self._fil = None
+
+    @property
+    def url_base(self):
+        hote, port = self._serveur.server_address[:2]
+        return f'http://{hote}:{port}/api/3/action/'
+
+    def demarrer(self):
+        self._serveur = ThreadingHTTPServer(('127.0.0.1', 0), _Gestionnaire)
+        self._serveur.daemon_threads = True
+        self._serveur.faux_ckan = self
+        self._fil = threading.Thread(target=self._serveur.serve_forever, name='faux-ckan', daemon=True)
+        self._fil.start()
+        return self
+
+    def arreter(self):
+        if self._serveur is not None:
+            self._serveur.shutdown()
+            self._serveur.server_close()
+            self._serveur = None
+
+    def __enter__(self):
+        return self.demarrer()
+
+    def __exit__(self, *exc):
+        self.arreter()
+
+    def compter(self, action):
+        with self._verrou:
+            self.appels[action] += 1
+
+    def compter_octets(self, octets):
+        with self._verrou:
+            self.octets += octets
+
+    def tirer_erreur(self):
+        if not self.taux_erreur:
+            return False
+        with self._verrou:
+            return self._aleatoire.random() < self.taux_erreur
+
+    @staticmethod
+    def _tranche(elements, params, limite_defaut=None):
+        debut = int(params.get('offset') or params.get('start') or 0)
+        limite = params.get('limit', params.get('rows', limite_defaut))
+        return elements[debut:debut + int(limite)] if limite is not None else elements[debut:]
+
+    # Actions CKAN
+
+    def _action_organization_list(self, params):
+        organisations = self.catalogue.organisations
+        if params.get('all_fields') == 'true':
+            return self._tranche(organisations, params, 25)
+        return [org['name'] for org in self._tranche(organisations, params)]
+
+    def _action_organization_show(self, params):
+        return self.catalogue.organisation(params.get('id'))
+
+    def _action_group_list(self, params):
+        groupes = self.catalogue.groupes
+        if params.get('all_fields') == 'true':
+            return self._tranche(groupes, params, 25)
+        return [groupe['name'] for groupe in self._tranche(groupes, params)]
+
+    def _action_package_list(self, params):
+        return [jeu['name'] for jeu in self._tranche(self.catalogue.jeux, params)]
+
+    def _action_package_show(self, params):
+        return self.catalogue.jeu(params.get('id'))
+
+    def _action_package_search(self, params):
+        """Recherche paginée triée par (metadata_modified, name); seuls les filtres fq incrémental et de reprise sont interprétés"""
+        jeux = sorted(self.catalogue.jeux, key=lambda jeu: (jeu['metadata_modified'], jeu['name']))
+        correspondance = MOTIF_METADATA_MODIFIED.search(params.get('fq', ''))
+        if correspondance:
+            depuis = correspondance.group(1).rstrip('Z')
+            jeux = [jeu for jeu in jeux if jeu['metadata_modified'] >= depuis]
+        correspondance = MOTIF_APRES.search(params.get('fq', ''))
+        if correspondance:
+            cle = (correspondance.group(1).rstrip('Z'), correspondance.group(2))
+            jeux = [jeu for jeu in jeux if (jeu['metadata_modified'][:23], jeu['name']) > cle]
+        params = {'start': params.get('start', 0), 'rows': min(int(params.get('rows', 10)), 1000)}
+        return {'count': len(jeux), 'results': self._tranche(jeux, params)}
@@ -0,0 +1,160 @@
+"""
+Filtres de moissonnage compilés.
+
+FiltresCompiles convertit une ConfigurationFiltres, une fois par exécution,
+en ensembles et bornes de dates: les prédicats appliqués à chaque jeu de
+données ne relisent plus les champs texte. Les critères que package_search
+sait évaluer (organisation, groupes, formats, date de création, accès) sont
+aussi traduits en clause fq, pour que CKAN ne renvoie que les jeux retenus;
+les prédicats locaux restent appliqués en complément.
+"""
+from datetime import timezone as dt_timezone
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+def _separer(valeur, normaliser=str.lower):
+    """Sépare un champ « a; b » en ensemble de valeurs normalisées"""
+    return frozenset(normaliser(element.strip()) for element in (valeur or '').split(';') if element.strip())
+
+
+def _terme_solr(valeur):
+    """Valeur entre guillemets pour une clause fq Solr"""
+    return '"' + valeur.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _date_solr(date):
+    return date.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class FiltresCompiles:
+    """Prédicats et clause fq compilés depuis une ConfigurationFiltres"""
+
+    def __init__(self, configuration=None):
+        """
+        Args:
+            configuration: Instance de ConfigurationFiltres (None ou inactive: aucun filtre)
+        """
+        self.actifs = bool(configuration and configuration.actif)
+        configuration = configuration if self.actifs else None
+
+        self.organisations = _separer(configuration and configuration.organisations_filtres)
+        self.categories = _separer(configuration and configuration.categories_filtres)
+        self.formats = _separer(configuration and configuration.formats_fichiers, str.upper)
+        self.date_debut = configuration.date_debut if configuration else None
+        self.date_fin = configuration.date_fin if configuration else None
+        self.prive = {'Privé': True, 'Ouvert': False}.get(configuration.niveau_acces) if configuration else None
+
+        # Noms CKAN (identifiants de l'index) correspondant aux titres configurés, si résolus
+        self.noms_organisations = None
+        self.noms_groupes = None
+
+    def accepte_organisation(self, titre, nom=''):
+        """Vérifie si une organisation (titre ou nom CKAN) passe le filtre"""
+        if not self.organisations:
+            return True
+        return (titre or '').lower() in self.organisations or (nom or '').lower() in self.organisations
+
+    def accepte_jeu(self, donnees_jeu):
+        """Vérifie si un jeu de données CKAN passe tous les filtres"""
+        if not self.actifs:
+            return True
+
+        if self.organisations:
+            organisation = donnees_jeu.get('organization') or {}
+            if not self.accepte_organisation(organisation.get('title'), organisation.get('name')):
+                return False
+
+        if self.categories:
+            groupes = donnees_jeu.get('groups') or []
+            if not any((groupe.get('title') or '').lower() in self.categories for groupe in groupes):
+                return False
+
+        if self.formats:
+            ressources = donnees_jeu.get('resources') or []
+            if not any((ressource.get('format') or '').upper() in self.formats for ressource in ressources):
+                return False
+
+        if self.date_debut or self.date_fin:
+            date_creation = self._date_creation(donnees_jeu)
+            if date_creation:
+                if self.date_debut and date_creation < self.date_debut:
+                    return False
+                if self.date_fin and date_creation > self.date_fin:
+                    return False
+
+        if self.prive is not None and bool(donnees_jeu.get('private', False)) != self.prive:
+            return False
+
+        return True
+
+    @staticmethod
+    def _date_creation(donnees_jeu):
+        date = parse_datetime(donnees_jeu.get('metadata_created') or '')
+        if date and timezone.is_naive(date):
+            # CKAN exprime les dates en UTC sans fuseau
+            date = timezone.make_aware(date, dt_timezone.utc)
+        return date
+
+    def resoudre_noms(self, organisations=None, groupes=None):
+        """
+        Associe les titres configurés aux noms CKAN, nécessaires aux clauses fq
+
+        Un critère n'est transmis à CKAN que si toutes ses valeurs sont résolues;
+        sinon il reste évalué localement seulement.
+
+        Args:
+            organisations: Liste de dicts CKAN {'name', 'title'} (organization_list all_fields)
+            groupes: Liste de dicts CKAN {'name', 'title'} (group_list all_fields)
+        """
+        self.noms_organisations = self._resoudre(self.organisations, organisations)
+        self.noms_groupes = self._resoudre(self.categories, groupes)
+
+    @staticmethod
+    def _resoudre(valeurs, elements):
+        if not valeurs or elements is None:
+            return None
+        noms = {}
+        for element in elements:
+            for cle in (element.get('title'), element.get('name')):
+                if cle and cle.lower() in valeurs:
+                    noms.setdefault(cle.lower(), set()).add(element['name'])
+        if set(noms) != set(valeurs):
+            return None
+        return frozenset().union(*noms.values())
+
+    def restreindre_organisations(self, noms):
+        """Limite une liste de noms d'organisations CKAN à celles retenues par le filtre"""
+        if self.noms_organisations is None:
+            return noms
+        return [nom for nom in noms if nom in self.noms_organisations]
+
+    def clause_fq(self):
+        """
+        Clause fq de package_search équivalente aux filtres transmissibles à CKAN
+
+        Returns:
+            str: Clauses jointes par AND, ou None si aucun critère n'est transmissible
+        """
+        if not self.actifs:
+            return None
+
+        clauses = []
+        if self.noms_organisations:
+            clauses.append(self._clause('organization', self.noms_organisations))
+        if self.noms_groupes:
+            clauses.append(self._clause('groups', self.noms_groupes))
+        if self.formats:
+            # res_format est indexé tel que déclaré: on accepte aussi la casse minuscule
+            clauses.append(self._clause('res_format', self.formats | {fmt.lower() for fmt in self.formats}))
+        if self.date_debut or self.date_fin:
+            debut = _date_solr(self.date_debut) if self.date_debut else '*'
+            fin = _date_solr(self.date_fin) if self.date_fin else '*'
+            clauses.append(f'metadata_created:[{debut} TO {fin}]')
+        if self.prive is not None:
+            clauses.append(f'private:{str(self.prive).lower()}')
+        return ' AND '.join(clauses) or None
+
+    @staticmethod
+    def _clause(champ, valeurs):
+        return f"{champ}:({' OR '.join(_terme_solr(valeur) for valeur in sorted(valeurs))})"
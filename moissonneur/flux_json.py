@@ -0,0 +1,130 @@
+"""
+Lecture incrémentale des réponses JSON de CKAN.
+
+Une page package_search de 1000 jeux de données pèse facilement des dizaines
+de mégaoctets: reponse.json() garde en mémoire le corps complet, son texte
+décodé et l'arbre Python, soit plusieurs fois la taille de la page.
+LecteurJson consomme la réponse par blocs et décode une valeur à la fois avec
+json.JSONDecoder.raw_decode; seuls le bloc courant et la valeur en cours de
+lecture restent en mémoire. Les objets et tableaux englobants (l'enveloppe
+CKAN) sont parcourus clé par clé, sans être construits.
+"""
+import codecs
+import json
+
+DECODEUR = json.JSONDecoder()
+
+ESPACES = ' \t\n\r'
+
+
+class ErreurFluxJson(ValueError):
+    """Document JSON invalide ou tronqué"""
+
+
+class LecteurJson:
+    """Parcourt un document JSON lu par blocs d'octets UTF-8"""
+
+    def __init__(self, blocs):
+        """
+        Args:
+            blocs: Itérable d'octets (ex: reponse.iter_content(65536))
+        """
+        self._blocs = iter(blocs)
+        self._decodeur = codecs.getincrementaldecoder('utf-8')()
+        self._tampon = ''
+        self._position = 0
+        self._termine = False
+
+    def _lire(self):
+        """
+        Ajoute le bloc suivant au tampon (la partie déjà lue est abandonnée)
+
+        Returns:
+            bool: False si le document est entièrement lu
+        """
+        if self._termine:
+            return False
+        bloc = next(self._blocs, None)
+        if bloc is None:
+            self._termine = True
+            texte = self._decodeur.decode(b'', final=True)
+        else:
+            texte = self._decodeur.decode(bloc)
+        self._tampon = self._tampon[self._position:] + texte
+        self._position = 0
+        return True
+
+    def _suivant(self):
+        """Retourne le prochain caractère significatif sans le consommer (None en fin de document)"""
+        while True:
+            while self._position < len(self._tampon) and self._tampon[self._position] in ESPACES:
+                self._position += 1
+            if self._position < len(self._tampon):
+                return self._tampon[self._position]
+            if not self._lire():
+                return None
+
+    def _attendre(self, *attendus):
+        """Consomme le prochain caractère significatif, qui doit faire partie des attendus"""
+        caractere = self._suivant()
+        if caractere not in attendus:
+            raise ErreurFluxJson(f"{' ou '.join(attendus)} attendu, {caractere or 'fin du document'} trouvé")
+        self._position += 1
+        return caractere
+
+    def valeur(self):
+        """Décode la valeur JSON suivante (objet, tableau, chaîne, nombre...)"""
+        self._suivant()
+        while True:
+            try:
+                valeur, fin = DECODEUR.raw_decode(self._tampon, self._position)
+                # Une valeur qui s'arrête en fin de tampon peut être tronquée (ex: un nombre)
+                if fin < len(self._tampon) or self._termine:
+                    self._position = fin
+                    return valeur
+            except json.JSONDecodeError as e:
+                if self._termine:
+                    raise ErreurFluxJson(f"JSON invalide: {e}") from e
+            # Valeur incomplète: on double au moins la partie lue avant de réessayer (coût linéaire)
+            besoin = 2 * (len(self._tampon) - self._position)
+            while self._lire() and len(self._tampon) - self._position < besoin:
+                pass
+
+    def cles(self):
+        """
+        Parcourt un objet clé par clé
+
+        L'appelant doit lire la valeur de chaque clé produite (valeur(), cles()
+        ou elements()) avant de demander la clé suivante.
+
+        Yields:
+            str: Clés de l'objet, dans l'ordre du document
+        """
+        self._attendre('{')
+        if self._suivant() == '}':
+            self._position += 1
+            return
+        while True:
+            cle = self.valeur()
+            if not isinstance(cle, str):
+                raise ErreurFluxJson("Clé d'objet attendue")
+            self._attendre(':')
+            yield cle
+            if self._attendre(',', '}') == '}':
+                return
+
+    def elements(self):
+        """
+        Parcourt un tableau élément par élément
+
+        Yields:
+            Valeur décodée de chaque élément
+        """
+        self._attendre('[')
+        if self._suivant() == ']':
+            self._position += 1
+            return
+        while True:
+            yield self.valeur()
+            if self._attendre(',', ']') == ']':
+                return
@@ -0,0 +1,126 @@
+"""
+Import hors ligne de jeux de données CKAN.
+
+importer_jeux() fait passer des jeux de données CKAN déjà récupérés (dump
+JSON lines, archive des réponses brutes) par la même chaîne que le
+moissonnage: filtres et normalisation de ServiceMoissonnage,
+PipelineMoissonnage, écriture en lots par EcrivainLots. Aucun appel réseau n'est émis tant que les jeux incluent le
+détail de leur organisation, comme ceux de package_show, de package_search
+ou de « ckanapi dump datasets ».
+
+L'import n'avance pas le filigrane de synchronisation de la source et
+n'élague rien: un dump peut être plus ancien que le portail.
+"""
+import gzip
+import json
+import sys
+import time
+from coeur.tableau_bord import invalider_tableau_bord
+from donnees.statistiques import rafraichir_statistiques
+from .ecriture import EcrivainLots
+from .pipeline import PipelineMoissonnage
+
+# Premiers octets d'un fichier gzip
+SIGNATURE_GZIP = b'\x1f\x8b'
+
+
+def ouvrir_dump(chemin):
+    """
+    Ouvre un dump en lecture binaire, décompressé à la volée s'il est au format gzip
+
+    Args:
+        chemin: Chemin du fichier, ou '-' pour l'entrée standard
+
+    Returns:
+        Fichier binaire à fermer par l'appelant
+    """
+    if chemin == '-':
+        # Fermer le décompresseur laisse l'entrée standard ouverte
+        fichier = sys.stdin.buffer
+        if fichier.peek(2)[:2] == SIGNATURE_GZIP:
+            return gzip.GzipFile(fileobj=fichier, mode='rb')
+        return fichier
+
+    with open(chemin, 'rb') as fichier:
+        compresse = fichier.read(2) == SIGNATURE_GZIP
+    # gzip.open() ferme le fichier sous-jacent avec le décompresseur
+    return gzip.open(chemin, 'rb') if compresse else open(chemin, 'rb')
+
+
+def lire_dump(fichier):
+    """
+    Parcourt un dump JSON lines ligne par ligne (un jeu de données CKAN par ligne)
+
+    Yields:
+        dict: Jeu de données CKAN, ou None pour une ligne illisible
+    """
+    for numero, ligne in enumerate(fichier, start=1):
+        ligne = ligne.strip()
+        if not ligne:
+            continue
+        try:
+            jeu = json.loads(ligne)
+        except ValueError as e:
+            print(f"Ligne {numero} ignorée (JSON invalide): {e}")
+            yield None
+            continue
+        if not isinstance(jeu, dict):
+            print(f"Ligne {numero} ignorée: un objet JSON est attendu")
+            yield None
+            continue
+        yield jeu
+
+
+def importer_jeux(service, jeux, taille_lot=None, rapporter=None, intervalle=5, archiver=None):
+    """
+    Écrit des jeux de données CKAN pour la source du service
+
+    Args:
+        service: ServiceMoissonnage de la source cible (filtres et normalisation)
+        jeux: Itérable de jeux de données CKAN (None pour un élément illisible); parcouru
+              dans le fil de récupération du pipeline
+        taille_lot: Nombre de jeux par lot (par défaut, settings.MOISSONNAGE_TAILLE_LOT)
+        rapporter: Fonction appelée avec le bilan en cours, au plus une fois par intervalle
+        intervalle: Secondes entre deux appels de rapporter
+        archiver: Archiver les jeux lus (par défaut, settings.MOISSONNAGE_ARCHIVE_BRUTE)
+
+    Returns:
+        dict: Bilan {'lus', 'jeux', 'ressources', 'ignores', 'nouveaux', 'modifies',
+              'inchanges', 'duree', 'jeux_par_seconde', 'lignes_par_seconde'}
+    """
+    ecrivain = EcrivainLots(service, taille_lot=taille_lot, archiver=archiver)
+    pipeline = PipelineMoissonnage(service, ecrivain)
+    bilan = {'lus': 0, 'jeux': 0, 'ressources': 0, 'ignores': 0}
+    debut = dernier_rapport = time.monotonic()
+
+    elements = ((idx, None, jeu) for idx, jeu in enumerate(jeux))
+    for _, _, _, nombre_ressources in pipeline.executer(elements):
+        bilan['lus'] += 1
+        if nombre_ressources is None:
+            bilan['ignores'] += 1
+        else:
+            bilan['jeux'] += 1
+            bilan['ressources'] += nombre_ressources
+
+        if rapporter and time.monotonic() - dernier_rapport >= intervalle:
+            dernier_rapport = time.monotonic()
+            rapporter(_mesurer(bilan, ecrivain, dernier_rapport - debut))
+
+    ecrivain.vider()
+    service.finaliser_categories()
+    rafraichir_statistiques()
+    invalider_tableau_bord()
+    return _mesurer(bilan, ecrivain, time.monotonic() - debut)
+
+
+def _mesurer(bilan, ecrivain, duree):
+    """Complète le bilan avec le bilan d'écriture et les débits"""
+    return {
+        **bilan,
+        'nouveaux': ecrivain.nouveaux,
+        'modifies': ecrivain.modifies,
+        'inchanges': ecrivain.inchanges,
+        'duree': round(duree, 3),
+        'jeux_par_seconde': round(bilan['jeux'] / duree, 1) if duree > 0 else None,
+        'lignes_par_seconde': round((bilan['jeux'] + bilan['ressources']) / duree, 1) if duree > 0 else None,
+    }
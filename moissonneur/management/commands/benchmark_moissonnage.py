@@ -0,0 +1,131 @@
+"""
+Commande Django mesurant le débit du moissonnage contre un serveur CKAN factice.
+Usage: python manage.py benchmark_moissonnage [--jeux 2000] [--organisations 20] [--ressources 3]
+       [--latence 0] [--taux-erreur 0] [--taille-page 100] [--concurrence 4] [--mode recherche]
+       [--passes 2] [--json] [--conserver]
+
+Chaque passe exécute un moissonnage complet (ExecuteurMoissonnage) et
+rapporte sa durée, les jeux de données par seconde, les appels HTTP, les
+requêtes SQL et le pic de mémoire Python. La deuxième passe mesure le
+remoissonnage d'un catalogue inchangé. Les données écrites sont annulées en
+fin de mesure, sauf avec --conserver.
+"""
+import json
+import os
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from donnees.models import SourceDonnees
+from moissonneur.execution import ExecuteurMoissonnage
+from moissonneur.faux_ckan import CatalogueSynthetique, ServeurCkanFactice
+from moissonneur.models import MoissonnageExecution
+
+
+class Command(BaseCommand):
+    help = 'Mesure le débit du moissonnage contre un serveur CKAN factice local'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jeux', type=int, default=2000, help='Nombre de jeux de données (défaut: 2000)')
+        parser.add_argument('--organisations', type=int, default=20, help='Nombre d\'organisations (défaut: 20)')
+        parser.add_argument('--ressources', type=int, default=3, help='Ressources par jeu de données (défaut: 3)')
+        parser.add_argument('--latence', type=float, default=0, help='Latence simulée par appel, en millisecondes (défaut: 0)')
+        parser.add_argument('--taux-erreur', type=float, default=0, help='Part des appels répondant 503 (défaut: 0)')
+        parser.add_argument('--taille-page', type=int, default=100, help='Jeux par appel package_search (défaut: 100)')
+        parser.add_argument('--concurrence', type=int, default=4, help='Appels CKAN simultanés (défaut: 4)')
+        parser.add_argument(
+            '--mode', choices=['recherche', 'liste'], default='recherche',
+            help='Mode de moissonnage de la source (défaut: recherche)'
+        )
+        parser.add_argument('--passes', type=int, default=2, help='Nombre de moissonnages successifs (défaut: 2)')
+        parser.add_argument('--json', action='store_true', help='Afficher les résultats en JSON')
+        parser.add_argument('--conserver', action='store_true', help='Conserver les données moissonnées')
+
+    def handle(self, *args, **options):
+        catalogue = CatalogueSynthetique(
+            organisations=options['organisations'], jeux=options['jeux'], ressources_par_jeu=options['ressources']
+        )
+        serveur = ServeurCkanFactice(catalogue, latence=options['latence'] / 1000, taux_erreur=options['taux_erreur'])
+
+        resultats = []
+        with serveur, transaction.atomic():
+            source = SourceDonnees.objects.create(
+                nom=f'Banc d\'essai CKAN ({os.getpid()})',
+                url_base=serveur.url_base,
+                mode_moissonnage=options['mode'],
+                taille_page=options['taille_page'],
+                concurrence_max=options['concurrence'],
+            )
+            for numero in range(1, options['passes'] + 1):
+                resultats.append(self._mesurer(source, serveur, numero, options['verbosity']))
+            if not options['conserver']:
+                transaction.set_rollback(True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultats, indent=2))
+        else:
+            self._afficher(resultats)
+
+    def _mesurer(self, source, serveur, numero, verbosite):
+        """Exécute un moissonnage complet et mesure ses coûts"""
+        serveur.appels.clear()
+        serveur.octets = 0
+        requetes = 0
+
+        def compter_requete(execute, sql, params, many, context):
+            nonlocal requetes
+            requetes += 1
+            return execute(sql, params, many, context)
+
+        execution = MoissonnageExecution.objects.create(source=source, mode='complet')
+        tracemalloc.start()
+        debut = time.perf_counter()
+        with connection.execute_wrapper(compter_requete):
+            if verbosite > 1:
+                ExecuteurMoissonnage(execution).executer()
+            else:
+                # Les messages du service ne sont affichés qu'en mode verbeux
+                with open(os.devnull, 'w') as silence, redirect_stdout(silence):
+                    ExecuteurMoissonnage(execution).executer()
+        duree = time.perf_counter() - debut
+        _, pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'passe': numero,
+            'statut': execution.statut,
+            'duree': round(duree, 3),
+            'jeux_donnees': execution.jeux_donnees,
+            'ressources': execution.ressources,
+            'jeux_par_seconde': round(execution.jeux_donnees / duree, 1) if duree else None,
+            'nouveaux': execution.jeux_nouveaux,
+            'modifies': execution.jeux_modifies,
+            'inchanges': execution.jeux_inchanges,
+            'erreurs': execution.erreurs,
+            'appels_http': sum(serveur.appels.values()),
+            'appels_par_action': dict(serveur.appels),
+            'octets_recus': serveur.octets,
+            'requetes_sql': requetes,
+            'pic_memoire_mo': round(pic / (1024 * 1024), 1),
+        }
+
+    def _afficher(self, resultats):
+        for resultat in resultats:
+            style = self.style.SUCCESS if resultat['statut'] == 'terminee' else self.style.ERROR
+            self.stdout.write(style(f"Passe {resultat['passe']} ({resultat['statut']})"))
+            self.stdout.write(
+                f"  Durée: {resultat['duree']} s - {resultat['jeux_par_seconde']} jeux/s "
+                f"({resultat['jeux_donnees']} jeux, {resultat['ressources']} ressources, {resultat['erreurs']} erreurs)"
+            )
+            self.stdout.write(
+                f"  Écritures: {resultat['nouveaux']} nouveaux, {resultat['modifies']} modifiés, "
+                f"{resultat['inchanges']} inchangés"
+            )
+            appels = ', '.join(f'{action}: {nombre}' for action, nombre in sorted(resultat['appels_par_action'].items()))
+            self.stdout.write(
+                f"  HTTP: {resultat['appels_http']} appels ({appels}), {resultat['octets_recus'] / 1024:.0f} Kio"
+            )
+            self.stdout.write(
+                f"  SQL: {resultat['requetes_sql']} requêtes - Pic mémoire Python: {resultat['pic_memoire_mo']} Mio"
+            )
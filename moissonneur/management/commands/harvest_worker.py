@@ -0,0 +1,72 @@
+"""
+Commande Django exécutant les moissonnages mis en file par l'interface web.
+Usage: python manage.py harvest_worker [--une-fois] [--intervalle 5] [--paralleles 4] [--toutes-sources]
+
+À lancer comme processus séparé du serveur web (un ou plusieurs travailleurs).
+Chaque travailleur moissonne plusieurs sources en parallèle, une par fil
+(PostgreSQL seulement: sur SQLite, une source à la fois).
+"""
+import os
+import signal
+import socket
+from django.core.management.base import BaseCommand
+from moissonneur.coordination import CoordinateurMoissonnage
+
+
+class Command(BaseCommand):
+    help = 'Exécute les moissonnages en file d\'attente'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--une-fois', action='store_true',
+            help='Traiter les exécutions en attente puis s\'arrêter'
+        )
+        parser.add_argument(
+            '--intervalle', type=float, default=5,
+            help='Délai (secondes) entre deux consultations de la file vide (défaut: 5)'
+        )
+        parser.add_argument(
+            '--paralleles', type=int, default=None,
+            help='Nombre maximal de sources moissonnées simultanément '
+                 '(défaut: settings.MOISSONNAGE_SOURCES_PARALLELES; 1 sur SQLite)'
+        )
+        parser.add_argument(
+            '--toutes-sources', action='store_true',
+            help='Mettre en file un moissonnage de chaque source active avant de démarrer'
+        )
+
+    def handle(self, *args, **options):
+        self.travailleur = f'{socket.gethostname()}:{os.getpid()}'
+        self.arret = False
+        signal.signal(signal.SIGTERM, self._demander_arret)
+        signal.signal(signal.SIGINT, self._demander_arret)
+
+        coordinateur = CoordinateurMoissonnage(
+            self.travailleur, max_paralleles=options['paralleles'], doit_arreter=lambda: self.arret
+        )
+        if options['toutes_sources']:
+            for execution in coordinateur.mettre_en_file_sources():
+                self.stdout.write(f'Moissonnage #{execution.pk} ({execution}) en file')
+
+        self.stdout.write(
+            f'Travailleur {self.travailleur} en attente de moissonnages '
+            f'({coordinateur.max_paralleles} source(s) en parallèle)...'
+        )
+
+        for execution in coordinateur.executer(une_fois=options['une_fois'], intervalle=options['intervalle']):
+            self._afficher_bilan(execution)
+
+        self.stdout.write('Travailleur arrêté')
+
+    def _afficher_bilan(self, execution):
+        """Affiche le bilan d'une exécution terminée, arrêtée ou remise en file"""
+        if execution.statut == 'en_attente':
+            self.stdout.write(self.style.WARNING(f'Moissonnage #{execution.pk} remis en file'))
+            return
+
+        style = self.style.SUCCESS if execution.statut == 'terminee' else self.style.ERROR
+        self.stdout.write(style(f'Moissonnage #{execution.pk} ({execution.source.nom}): {execution.message}'))
+
+    def _demander_arret(self, signum, frame):
+        """Arrêt propre: les exécutions en cours s'arrêtent à leur prochain point de reprise"""
+        self.arret = True
@@ -0,0 +1,72 @@
+"""
+Commande Django important un dump CKAN au format JSON lines, sans accès au portail.
+Usage: python manage.py import_ckan_dump <fichier> [--source NOM] [--filtres ID] [--taille-lot 500]
+
+Le fichier contient un jeu de données CKAN par ligne (ex: sortie de
+« ckanapi dump datasets »), compressé ou non avec gzip; '-' lit l'entrée
+standard. Les jeux passent par les mêmes filtres, la même normalisation et la
+même écriture par lots que le moissonnage.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from donnees.models import ConfigurationFiltres, SourceDonnees
+from moissonneur.importation import importer_jeux, lire_dump, ouvrir_dump
+from moissonneur.services import ServiceMoissonnage
+
+
+class Command(BaseCommand):
+    help = 'Importe un dump CKAN (JSON lines, éventuellement gzip) sans accès réseau'
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help='Dump JSON lines (.jsonl ou .jsonl.gz), ou - pour l\'entrée standard')
+        parser.add_argument(
+            '--source', default=None,
+            help='Nom ou identifiant de la source de données cible (défaut: la source active par défaut)'
+        )
+        parser.add_argument('--filtres', type=int, default=None, help='Identifiant de la configuration de filtres à appliquer')
+        parser.add_argument('--taille-lot', type=int, default=None, help='Jeux de données par lot écrit (défaut: settings)')
+
+    def handle(self, *args, **options):
+        source = self._source(options['source'])
+        configuration_filtres = None
+        if options['filtres'] is not None:
+            try:
+                configuration_filtres = ConfigurationFiltres.objects.get(pk=options['filtres'])
+            except ConfigurationFiltres.DoesNotExist:
+                raise CommandError(f"Configuration de filtres introuvable: {options['filtres']}")
+
+        try:
+            fichier = ouvrir_dump(options['fichier'])
+        except OSError as e:
+            raise CommandError(f"Impossible d'ouvrir le dump: {e}")
+
+        self.stdout.write(f"Import de {options['fichier']} dans la source {source.nom}...")
+        service = ServiceMoissonnage(source=source, configuration_filtres=configuration_filtres)
+        with fichier:
+            bilan = importer_jeux(
+                service, lire_dump(fichier), taille_lot=options['taille_lot'], rapporter=self._afficher_progression
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Import terminé en {bilan['duree']} s: {bilan['jeux']} jeux de données, "
+            f"{bilan['ressources']} ressources, {bilan['ignores']} ignorés"
+        ))
+        self.stdout.write(
+            f"  Écritures: {bilan['nouveaux']} nouveaux, {bilan['modifies']} modifiés, {bilan['inchanges']} inchangés"
+        )
+        self.stdout.write(f"  Débit: {bilan['jeux_par_seconde']} jeux/s, {bilan['lignes_par_seconde']} lignes/s")
+
+    def _source(self, identifiant):
+        if identifiant is None:
+            return ServiceMoissonnage.source_par_defaut()
+        source = SourceDonnees.objects.filter(nom=identifiant).first()
+        if source is None and identifiant.isdigit():
+            source = SourceDonnees.objects.filter(pk=int(identifiant)).first()
+        if source is None:
+            raise CommandError(f"Source de données introuvable: {identifiant}")
+        return source
+
+    def _afficher_progression(self, bilan):
+        self.stdout.write(
+            f"  {bilan['lus']} jeux lus ({bilan['jeux']} écrits, {bilan['ignores']} ignorés) - "
+            f"{bilan['jeux_par_seconde']} jeux/s"
+        )
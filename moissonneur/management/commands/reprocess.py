@@ -0,0 +1,61 @@
+"""
+Commande Django rejouant la normalisation sur les réponses CKAN archivées.
+Usage: python manage.py reprocess [--source NOM] [--filtres ID] [--taille-lot 500]
+
+Après une évolution de l'extraction (catégories, étiquettes, attributs des
+ressources), les champs dérivés sont reconstruits à partir de l'archive
+(ArchiveJeuDonnees), lue en flux, sans nouveau moissonnage. Seuls les jeux
+dont les champs normalisés changent sont réécrits.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from donnees.models import ConfigurationFiltres, SourceDonnees
+from moissonneur.archive import iterer_archives
+from moissonneur.importation import importer_jeux
+from moissonneur.models import ArchiveJeuDonnees
+from moissonneur.services import ServiceMoissonnage
+
+
+class Command(BaseCommand):
+    help = 'Rejoue la normalisation des jeux de données à partir des réponses CKAN archivées'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', default=None,
+            help='Nom ou identifiant de la source à retraiter (défaut: toutes les sources archivées)'
+        )
+        parser.add_argument('--filtres', type=int, default=None, help='Identifiant de la configuration de filtres à appliquer')
+        parser.add_argument('--taille-lot', type=int, default=None, help='Jeux de données par lot écrit (défaut: settings)')
+
+    def handle(self, *args, **options):
+        sources = SourceDonnees.objects.filter(pk__in=ArchiveJeuDonnees.objects.values('source'))
+        if options['source'] is not None:
+            identifiant = options['source']
+            sources = sources.filter(nom=identifiant) or (
+                sources.filter(pk=int(identifiant)) if identifiant.isdigit() else sources.none()
+            )
+            if not sources:
+                raise CommandError(f"Aucune archive pour la source: {identifiant}")
+
+        configuration_filtres = None
+        if options['filtres'] is not None:
+            try:
+                configuration_filtres = ConfigurationFiltres.objects.get(pk=options['filtres'])
+            except ConfigurationFiltres.DoesNotExist:
+                raise CommandError(f"Configuration de filtres introuvable: {options['filtres']}")
+
+        for source in sources:
+            self.stdout.write(f"Retraitement de la source {source.nom}...")
+            service = ServiceMoissonnage(source=source, configuration_filtres=configuration_filtres)
+            # Les réponses viennent de l'archive: elles ne sont pas réarchivées
+            bilan = importer_jeux(
+                service, iterer_archives(source), taille_lot=options['taille_lot'],
+                rapporter=self._afficher_progression, archiver=False
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {source.nom}: {bilan['lus']} jeux relus en {bilan['duree']} s "
+                f"({bilan['modifies'] + bilan['nouveaux']} réécrits, {bilan['inchanges']} inchangés, "
+                f"{bilan['ignores']} ignorés) - {bilan['jeux_par_seconde']} jeux/s"
+            ))
+
+    def _afficher_progression(self, bilan):
+        self.stdout.write(f"  {bilan['lus']} jeux relus - {bilan['jeux_par_seconde']} jeux/s")
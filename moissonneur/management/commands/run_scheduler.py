@@ -0,0 +1,69 @@
+"""
+Commande Django déclenchant les moissonnages planifiés (ConfigurationPlanification).
+Usage: python manage.py run_scheduler [--une-fois] [--intervalle 30] [--max-concurrence 1]
+
+Le planificateur ne fait que mettre les moissonnages en file: ils sont
+exécutés par harvest_worker. Un seul planificateur suffit par déploiement.
+"""
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from moissonneur.planification import declencher_planifications_dues, initialiser_prochaines_executions
+
+
+class Command(BaseCommand):
+    help = 'Met en file les moissonnages planifiés arrivés à échéance'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--une-fois', action='store_true',
+            help='Déclencher les planifications dues puis s\'arrêter'
+        )
+        parser.add_argument(
+            '--intervalle', type=float, default=30,
+            help='Délai (secondes) entre deux vérifications des planifications (défaut: 30)'
+        )
+        parser.add_argument(
+            '--max-concurrence', type=int, default=None,
+            help='Nombre maximal de moissonnages en file ou en cours '
+                 '(défaut: settings.MOISSONNAGE_MAX_PLANIFIES)'
+        )
+
+    def handle(self, *args, **options):
+        self.arret = False
+        signal.signal(signal.SIGTERM, self._demander_arret)
+        signal.signal(signal.SIGINT, self._demander_arret)
+
+        max_concurrence = options['max_concurrence']
+        if max_concurrence is None:
+            max_concurrence = getattr(settings, 'MOISSONNAGE_MAX_PLANIFIES', 1)
+        self.stdout.write(f'Planificateur démarré (au plus {max_concurrence} moissonnage(s) simultané(s))')
+
+        while not self.arret:
+            close_old_connections()
+            initialiser_prochaines_executions()
+            bilan = declencher_planifications_dues(max_concurrence=max_concurrence)
+
+            for execution in bilan['declenchees']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Moissonnage #{execution.pk} mis en file ({execution.planification})'
+                ))
+            if bilan['ignorees']:
+                self.stdout.write(self.style.WARNING(
+                    f'{bilan["ignorees"]} planification(s) ignorée(s): moissonnage déjà en cours'
+                ))
+            if bilan['differees']:
+                self.stdout.write(self.style.WARNING(
+                    f'{bilan["differees"]} planification(s) différée(s): plafond de concurrence atteint'
+                ))
+
+            if options['une_fois']:
+                break
+            time.sleep(options['intervalle'])
+
+        self.stdout.write('Planificateur arrêté')
+
+    def _demander_arret(self, signum, frame):
+        self.arret = True
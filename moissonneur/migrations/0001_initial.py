@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('donnees', '0009_statistiquescatalogue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MoissonnageExecution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(choices=[('complet', 'Complet'), ('incremental', 'Incrémental')], default='complet', max_length=20, verbose_name='Mode')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('terminee', 'Terminée'), ('arretee', 'Arrêtée'), ('echouee', 'Échouée')], default='en_attente', max_length=20, verbose_name='Statut')),
+                ('phase', models.CharField(choices=[('organisations', 'Organisations'), ('jeux_donnees', 'Jeux de données'), ('finalisation', 'Finalisation')], default='organisations', max_length=20, verbose_name='Phase')),
+                ('curseur', models.PositiveIntegerField(default=0, verbose_name='Curseur (éléments traités dans la phase)')),
+                ('arret_demande', models.BooleanField(default=False, verbose_name='Arrêt demandé')),
+                ('total_organisations', models.PositiveIntegerField(default=0, verbose_name='Organisations à traiter')),
+                ('total_jeux_donnees', models.PositiveIntegerField(default=0, verbose_name='Jeux de données à traiter')),
+                ('organisations', models.PositiveIntegerField(default=0, verbose_name='Organisations sauvegardées')),
+                ('jeux_donnees', models.PositiveIntegerField(default=0, verbose_name='Jeux de données sauvegardés')),
+                ('ressources', models.PositiveIntegerField(default=0, verbose_name='Ressources sauvegardées')),
+                ('erreurs', models.PositiveIntegerField(default=0, verbose_name='Jeux de données en erreur')),
+                ('erreurs_recuperation', models.PositiveIntegerField(default=0, verbose_name='Appels de liste en erreur')),
+                ('progression', models.PositiveSmallIntegerField(default=0, verbose_name='Progression (%)')),
+                ('message', models.CharField(blank=True, max_length=300, verbose_name='Message')),
+                ('derniere_erreur', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('nombre_reprises', models.PositiveIntegerField(default=0, verbose_name='Nombre de reprises')),
+                ('date_debut', models.DateTimeField(blank=True, null=True, verbose_name='Début de la première tentative')),
+                ('date_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('durees', models.JSONField(blank=True, default=dict, verbose_name='Durées par phase (secondes)')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('date_modification', models.DateTimeField(auto_now=True, verbose_name='Dernier point de reprise')),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='donnees.sourcedonnees', verbose_name='Source de données')),
+            ],
+            options={
+                'verbose_name': 'Exécution de moissonnage',
+                'verbose_name_plural': 'Exécutions de moissonnage',
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(fields=['source', 'statut'], name='execution_source_statut_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donnees', '0009_statistiquescatalogue'),
+        ('moissonneur', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moissonnageexecution',
+            name='travailleur',
+            field=models.CharField(blank=True, max_length=200, verbose_name='Travailleur (hôte:pid)'),
+        ),
+        migrations.AddIndex(
+            model_name='moissonnageexecution',
+            index=models.Index(fields=['statut', 'date_creation'], name='execution_file_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='moissonnageexecution',
+            constraint=models.UniqueConstraint(condition=models.Q(('statut__in', ['en_attente', 'en_cours'])), fields=('source',), name='execution_active_unique_par_source'),
+        ),
+    ]
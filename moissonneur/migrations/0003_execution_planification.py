@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donnees', '0009_statistiquescatalogue'),
+        ('moissonneur', '0002_file_attente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moissonnageexecution',
+            name='configuration_filtres',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='donnees.configurationfiltres', verbose_name='Configuration de filtres appliquée'),
+        ),
+        migrations.AddField(
+            model_name='moissonnageexecution',
+            name='planification',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='executions', to='donnees.configurationplanification', verbose_name="Planification à l'origine de l'exécution"),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moissonneur', '0003_execution_planification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moissonnageexecution',
+            name='jeux_inchanges',
+            field=models.PositiveIntegerField(default=0, verbose_name='Jeux de données inchangés (non réécrits)'),
+        ),
+        migrations.AddField(
+            model_name='moissonnageexecution',
+            name='jeux_modifies',
+            field=models.PositiveIntegerField(default=0, verbose_name='Jeux de données modifiés'),
+        ),
+        migrations.AddField(
+            model_name='moissonnageexecution',
+            name='jeux_nouveaux',
+            field=models.PositiveIntegerField(default=0, verbose_name='Jeux de données nouveaux'),
+        ),
+    ]
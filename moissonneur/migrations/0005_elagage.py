@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moissonneur', '0004_bilan_empreintes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moissonnageexecution',
+            name='jeux_supprimes',
+            field=models.PositiveIntegerField(default=0, verbose_name='Jeux de données retirés en amont et supprimés'),
+        ),
+        migrations.AddField(
+            model_name='moissonnageexecution',
+            name='ressources_supprimees',
+            field=models.PositiveIntegerField(default=0, verbose_name='Ressources retirées en amont et supprimées'),
+        ),
+    ]
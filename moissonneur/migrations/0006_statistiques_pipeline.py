@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moissonneur', '0005_elagage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moissonnageexecution',
+            name='pipeline',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Pipeline des jeux de données (débit par étape, profondeur des files)'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donnees', '0010_empreinte'),
+        ('moissonneur', '0006_statistiques_pipeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveJeuDonnees',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ckan_id', models.CharField(max_length=100, verbose_name='Identifiant CKAN')),
+                ('empreinte', models.CharField(max_length=64, verbose_name='Empreinte de la réponse brute (SHA-256)')),
+                ('contenu', models.BinaryField(verbose_name='Réponse CKAN (JSON compressé zlib)')),
+                ('date_archivage', models.DateTimeField(auto_now=True, verbose_name="Date d'archivage")),
+                ('source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='donnees.sourcedonnees', verbose_name='Source de données')),
+            ],
+            options={
+                'verbose_name': 'Archive de jeu de données',
+                'verbose_name_plural': 'Archives de jeux de données',
+                'constraints': [models.UniqueConstraint(fields=('source', 'ckan_id'), name='archive_source_ckan_id_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moissonneur', '0007_archive_jeux_donnees'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moissonnageexecution',
+            name='telemetrie',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Télémétrie (étapes, appels HTTP, requêtes SQL, lignes écrites)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moissonneur', '0008_telemetrie_execution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moissonnageexecution',
+            name='cle_reprise',
+            field=models.JSONField(blank=True, default=list, verbose_name='Clé de reprise ([metadata_modified, name] du dernier jeu traité)'),
+        ),
+    ]
@@ -1,3 +1,251 @@
-from django.db import models
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, models, transaction
+from django.utils import timezone
+from donnees.models import ConfigurationFiltres, ConfigurationPlanification, SourceDonnees
+from .progression import cle_arret, cle_progression
 
-# Create your models here.
+
+class MoissonnageExecution(models.Model):
+    """
+    Exécution d'un moissonnage, avec son point de reprise
+
+    La phase, le curseur (position dans la liste des organisations ou des jeux
+    de données) et les compteurs sont enregistrés à chaque lot écrit: une
+    exécution arrêtée ou interrompue reprend depuis son dernier point de reprise.
+    En recherche, la reprise suit la clé de tri du dernier jeu traité
+    (cle_reprise) plutôt que la position, que les modifications en amont décalent.
+    Les exécutions en attente forment la file consommée par harvest_worker.
+    """
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('en_cours', 'En cours'),
+        ('terminee', 'Terminée'),
+        ('arretee', 'Arrêtée'),
+        ('echouee', 'Échouée'),
+    ]
+    MODE_CHOICES = [
+        ('complet', 'Complet'),
+        ('incremental', 'Incrémental'),
+    ]
+    PHASE_CHOICES = [
+        ('organisations', 'Organisations'),
+        ('jeux_donnees', 'Jeux de données'),
+        ('finalisation', 'Finalisation'),
+    ]
+    STATUTS_ACTIFS = ('en_attente', 'en_cours')
+    STATUTS_REPRENABLES = ('arretee', 'echouee')
+    
+    source = models.ForeignKey(SourceDonnees, on_delete=models.CASCADE, verbose_name="Source de données")
+    configuration_filtres = models.ForeignKey(
+        ConfigurationFiltres,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Configuration de filtres appliquée"
+    )
+    planification = models.ForeignKey(
+        ConfigurationPlanification,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='executions',
+        verbose_name="Planification à l'origine de l'exécution"
+    )
+    mode = models.CharField(max_length=20, choices=MODE_CHOICES, default='complet', verbose_name="Mode")
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='en_attente', verbose_name="Statut")
+    phase = models.CharField(max_length=20, choices=PHASE_CHOICES, default='organisations', verbose_name="Phase")
+    curseur = models.PositiveIntegerField(default=0, verbose_name="Curseur (éléments traités dans la phase)")
+    cle_reprise = models.JSONField(
+        default=list, blank=True, verbose_name="Clé de reprise ([metadata_modified, name] du dernier jeu traité)"
+    )
+    arret_demande = models.BooleanField(default=False, verbose_name="Arrêt demandé")
+    travailleur = models.CharField(max_length=200, blank=True, verbose_name="Travailleur (hôte:pid)")
+    
+    # Compteurs
+    total_organisations = models.PositiveIntegerField(default=0, verbose_name="Organisations à traiter")
+    total_jeux_donnees = models.PositiveIntegerField(default=0, verbose_name="Jeux de données à traiter")
+    organisations = models.PositiveIntegerField(default=0, verbose_name="Organisations sauvegardées")
+    jeux_donnees = models.PositiveIntegerField(default=0, verbose_name="Jeux de données sauvegardés")
+    ressources = models.PositiveIntegerField(default=0, verbose_name="Ressources sauvegardées")
+    erreurs = models.PositiveIntegerField(default=0, verbose_name="Jeux de données en erreur")
+    jeux_nouveaux = models.PositiveIntegerField(default=0, verbose_name="Jeux de données nouveaux")
+    jeux_modifies = models.PositiveIntegerField(default=0, verbose_name="Jeux de données modifiés")
+    jeux_inchanges = models.PositiveIntegerField(default=0, verbose_name="Jeux de données inchangés (non réécrits)")
+    jeux_supprimes = models.PositiveIntegerField(default=0, verbose_name="Jeux de données retirés en amont et supprimés")
+    ressources_supprimees = models.PositiveIntegerField(default=0, verbose_name="Ressources retirées en amont et supprimées")
+    erreurs_recuperation = models.PositiveIntegerField(default=0, verbose_name="Appels de liste en erreur")
+    progression = models.PositiveSmallIntegerField(default=0, verbose_name="Progression (%)")
+    message = models.CharField(max_length=300, blank=True, verbose_name="Message")
+    derniere_erreur = models.TextField(blank=True, verbose_name="Dernière erreur")
+    
+    # Durées
+    nombre_reprises = models.PositiveIntegerField(default=0, verbose_name="Nombre de reprises")
+    date_debut = models.DateTimeField(null=True, blank=True, verbose_name="Début de la première tentative")
+    date_fin = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+    durees = models.JSONField(default=dict, blank=True, verbose_name="Durées par phase (secondes)")
+    pipeline = models.JSONField(
+        default=dict, blank=True, verbose_name="Pipeline des jeux de données (débit par étape, profondeur des files)"
+    )
+    telemetrie = models.JSONField(
+        default=dict, blank=True, verbose_name="Télémétrie (étapes, appels HTTP, requêtes SQL, lignes écrites)"
+    )
+    date_creation = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
+    date_modification = models.DateTimeField(auto_now=True, verbose_name="Dernier point de reprise")
+    
+    class Meta:
+        verbose_name = "Exécution de moissonnage"
+        verbose_name_plural = "Exécutions de moissonnage"
+        ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['source', 'statut'], name='execution_source_statut_idx'),
+            models.Index(fields=['statut', 'date_creation'], name='execution_file_idx'),
+        ]
+        constraints = [
+            # Au plus une exécution en file ou en cours par source
+            models.UniqueConstraint(
+                fields=['source'],
+                condition=models.Q(statut__in=['en_attente', 'en_cours']),
+                name='execution_active_unique_par_source',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.source.nom} - {self.get_mode_display()} ({self.get_statut_display()})"
+    
+    @property
+    def incremental(self):
+        return self.mode == 'incremental'
+    
+    @property
+    def en_cours(self):
+        return self.statut in self.STATUTS_ACTIFS
+    
+    @staticmethod
+    def mode_pour(source):
+        """Mode d'un moissonnage automatique: incrémental dès qu'une synchronisation a réussi"""
+        return 'incremental' if source.derniere_synchronisation else 'complet'
+    
+    @classmethod
+    def remettre_en_file_interrompues(cls, **filtres):
+        """
+        Remet en attente les exécutions restées « en cours » sans point de reprise
+        depuis plus de settings.MOISSONNAGE_DELAI_INACTIVITE secondes (processus
+        interrompu); un travailleur les reprendra depuis leur curseur
+
+        Returns:
+            int: Nombre d'exécutions remises en file
+        """
+        delai = timedelta(seconds=getattr(settings, 'MOISSONNAGE_DELAI_INACTIVITE', 600))
+        return cls.objects.filter(
+            statut='en_cours', date_modification__lt=timezone.now() - delai, **filtres
+        ).update(statut='en_attente', travailleur='')
+    
+    @classmethod
+    def mettre_en_file(cls, source, mode='complet', configuration_filtres=None, planification=None):
+        """
+        Met un moissonnage de la source en file d'attente
+
+        Un double déclenchement retourne l'exécution déjà en file ou en cours;
+        une exécution arrêtée ou échouée du même mode et des mêmes filtres est reprise.
+
+        Args:
+            source: Instance de SourceDonnees
+            mode: 'complet' ou 'incremental'
+            configuration_filtres: ConfigurationFiltres à appliquer (optionnel)
+            planification: ConfigurationPlanification à l'origine du déclenchement (optionnel)
+
+        Returns:
+            MoissonnageExecution
+        """
+        cls.remettre_en_file_interrompues(source=source)
+        active = cls.objects.filter(source=source, statut__in=cls.STATUTS_ACTIFS).first()
+        if active:
+            return active
+        
+        try:
+            with transaction.atomic():
+                return cls._reprendre_ou_creer(source, mode, configuration_filtres, planification)
+        except IntegrityError:
+            # Déclenchement concurrent: l'autre requête a créé l'exécution active
+            return cls.objects.get(source=source, statut__in=cls.STATUTS_ACTIFS)
+    
+    @classmethod
+    def _reprendre_ou_creer(cls, source, mode, configuration_filtres=None, planification=None):
+        """Remet en attente la dernière exécution arrêtée ou échouée de ce mode, sinon en crée une"""
+        precedente = cls.objects.filter(source=source).order_by('-date_creation').first()
+        if (
+            precedente
+            and precedente.mode == mode
+            and precedente.configuration_filtres_id == getattr(configuration_filtres, 'pk', None)
+            and precedente.statut in cls.STATUTS_REPRENABLES
+        ):
+            precedente.statut = 'en_attente'
+            precedente.arret_demande = False
+            precedente.planification = planification or precedente.planification
+            precedente.save(update_fields=['statut', 'arret_demande', 'planification', 'date_modification'])
+            execution = precedente
+        else:
+            execution = cls.objects.create(
+                source=source, mode=mode,
+                configuration_filtres=configuration_filtres, planification=planification
+            )
+        # La progression publiée par une tentative précédente n'est plus à jour
+        cache.delete_many([cle_progression(execution.pk), cle_arret(execution.pk)])
+        return execution
+    
+    @classmethod
+    def reserver_suivante(cls, travailleur):
+        """
+        Réserve la plus ancienne exécution en attente pour un travailleur
+
+        Les lignes sont verrouillées avec SELECT ... FOR UPDATE SKIP LOCKED
+        lorsque la base le permet; la mise à jour conditionnelle sur le statut
+        garantit dans tous les cas qu'un seul travailleur obtient l'exécution.
+
+        Returns:
+            MoissonnageExecution ou None si la file est vide
+        """
+        with transaction.atomic():
+            candidates = cls.objects.filter(statut='en_attente').order_by('date_creation')
+            if connection.features.has_select_for_update_skip_locked:
+                candidates = candidates.select_for_update(skip_locked=True)
+            execution = candidates.select_related('source').first()
+            if execution is None:
+                return None
+            
+            reservee = cls.objects.filter(pk=execution.pk, statut='en_attente').update(
+                statut='en_cours', travailleur=travailleur, date_modification=timezone.now()
+            )
+            if not reservee:
+                return None
+        
+        execution.statut = 'en_cours'
+        execution.travailleur = travailleur
+        return execution
+
+
+class ArchiveJeuDonnees(models.Model):
+    """
+    Dernière réponse CKAN brute d'un jeu de données, compressée (zlib)
+
+    Une ligne par jeu de données et par source, réécrite seulement lorsque la
+    réponse change. La commande reprocess rejoue la normalisation à partir de
+    ces archives, sans nouveau moissonnage.
+    """
+    source = models.ForeignKey(SourceDonnees, on_delete=models.CASCADE, verbose_name="Source de données")
+    ckan_id = models.CharField(max_length=100, verbose_name="Identifiant CKAN")
+    empreinte = models.CharField(max_length=64, verbose_name="Empreinte de la réponse brute (SHA-256)")
+    contenu = models.BinaryField(verbose_name="Réponse CKAN (JSON compressé zlib)")
+    date_archivage = models.DateTimeField(auto_now=True, verbose_name="Date d'archivage")
+    
+    class Meta:
+        verbose_name = "Archive de jeu de données"
+        verbose_name_plural = "Archives de jeux de données"
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'ckan_id'], name='archive_source_ckan_id_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.source.nom} - {self.ckan_id}"
@@ -0,0 +1,243 @@
+"""
+Pipeline de moissonnage des jeux de données.
+
+Le parcours d'une source est découpé en trois étapes reliées par des files
+bornées, pour que le réseau, la normalisation et la base travaillent en même
+temps:
+
+- récupération (fil dédié): pages package_search ou package_show parallèles;
+- normalisation (fil dédié): filtres, normalisation et empreintes, sans accès
+  à la base de données;
+- écriture (fil appelant): organisation, mise en lot et écriture par
+  EcrivainLots. Le consommateur du pipeline reste l'unique écrivain et garde
+  la main sur les points de reprise et la demande d'arrêt.
+
+Une étape plus rapide que la suivante se bloque dès que sa file est pleine
+(contre-pression): la mémoire reste bornée par la taille des files et du lot.
+Le débit et le taux d'occupation de chaque étape, ainsi que la profondeur des
+files, sont mesurés pour repérer le goulot d'étranglement.
+"""
+import queue
+import threading
+import time
+from django.conf import settings
+from django.db import connection
+
+# Marque la fin du parcours dans une file
+FIN = object()
+
+# Délai (secondes) entre deux vérifications de l'arrêt par un fil bloqué sur une file
+ATTENTE_FILE = 0.1
+
+
+class _Echec:
+    """Exception d'une étape, transmise à l'étape suivante par la file"""
+
+    def __init__(self, erreur):
+        self.erreur = erreur
+
+
+class StatistiquesEtape:
+    """Éléments traités et temps actif d'une étape"""
+
+    def __init__(self):
+        self.elements = 0
+        self.duree_active = 0.0
+        self.attente_aval = 0.0
+
+    def mesurer(self, debut):
+        """Comptabilise un élément traité depuis l'instant debut (time.monotonic)"""
+        self.elements += 1
+        self.duree_active += time.monotonic() - debut
+
+    def en_dict(self, duree):
+        return {
+            'elements': self.elements,
+            'debit': round(self.elements / duree, 1) if duree > 0 else None,
+            'occupation': round(min(self.duree_active / duree, 1), 3) if duree > 0 else None,
+            'attente_aval': round(self.attente_aval, 3),
+        }
+
+
+class FileBornee(queue.Queue):
+    """File bornée qui retient sa profondeur maximale"""
+
+    def __init__(self, capacite):
+        super().__init__(maxsize=capacite)
+        self.profondeur_max = 0
+
+    def _put(self, element):
+        super()._put(element)
+        self.profondeur_max = max(self.profondeur_max, len(self.queue))
+
+    def en_dict(self):
+        return {'profondeur': self.qsize(), 'profondeur_max': self.profondeur_max, 'capacite': self.maxsize}
+
+
+class PipelineMoissonnage:
+    """Récupération, normalisation et écriture des jeux de données en étapes concurrentes"""
+
+    ETAPES = ('recuperation', 'normalisation', 'ecriture')
+
+    def __init__(self, service, ecrivain, taille_file=None):
+        """
+        Args:
+            service: Instance de ServiceMoissonnage (organisations)
+            ecrivain: EcrivainLots recevant les jeux normalisés
+            taille_file: Capacité de chaque file, en jeux de données
+                         (par défaut, settings.MOISSONNAGE_TAILLE_FILE)
+        """
+        self.service = service
+        self.ecrivain = ecrivain
+        capacite = taille_file or getattr(settings, 'MOISSONNAGE_TAILLE_FILE', 1000)
+        self.jeux_recuperes = FileBornee(capacite)
+        self.jeux_normalises = FileBornee(capacite)
+        self.etapes = {nom: StatistiquesEtape() for nom in self.ETAPES}
+        self._arret = threading.Event()
+        self._fils = []
+        self._debut = None
+        self._fin = None
+
+    def executer(self, elements):
+        """
+        Fait passer les jeux de données dans le pipeline
+
+        Args:
+            elements: Itérable de tuples (index, total, details_jeu), tel que
+                      ServiceMoissonnage.iterer_jeux_donnees; parcouru dans un fil dédié
+
+        Yields:
+            tuple: (index, total, details_jeu, nombre_ressources) dans l'ordre du parcours;
+                   nombre_ressources vaut None si le jeu n'a pas été retenu. Le jeu est mis
+                   en lot (EcrivainLots.en_attente) ou déjà écrit.
+        """
+        self._debut = time.monotonic()
+        # Les fils des étapes portent le nom du fil consommateur (une source par fil du coordinateur)
+        prefixe = threading.current_thread().name
+        self._fils = [
+            threading.Thread(target=self._recuperer, args=(elements,), name=f'{prefixe}-recuperation', daemon=True),
+            threading.Thread(target=self._normaliser, name=f'{prefixe}-normalisation', daemon=True),
+        ]
+        for fil in self._fils:
+            fil.start()
+
+        ecriture = self.etapes['ecriture']
+        try:
+            while True:
+                element = self._prendre(self.jeux_normalises)
+                if element is FIN:
+                    return
+                if isinstance(element, _Echec):
+                    raise element.erreur
+
+                idx, total, details_jeu, prepare = element
+                debut = time.monotonic()
+                nombre_ressources = self._ecrire(details_jeu, prepare)
+                ecriture.mesurer(debut)
+                yield idx, total, details_jeu, nombre_ressources
+        finally:
+            self._arreter()
+
+    def statistiques(self):
+        """
+        Débit et occupation par étape, profondeur des files
+
+        Returns:
+            dict: {'duree', 'etapes': {nom: {...}}, 'files': {nom: {...}}}
+        """
+        duree = (self._fin or time.monotonic()) - self._debut if self._debut else 0
+        return {
+            'duree': round(duree, 3),
+            'etapes': {nom: etape.en_dict(duree) for nom, etape in self.etapes.items()},
+            'files': {
+                'jeux_recuperes': self.jeux_recuperes.en_dict(),
+                'jeux_normalises': self.jeux_normalises.en_dict(),
+            },
+        }
+
+    def _ecrire(self, details_jeu, prepare):
+        """Étape d'écriture: résout l'organisation et met le jeu normalisé en lot"""
+        if prepare is None:
+            return None
+        organisation = self.service.trouver_organisation(details_jeu)
+        if not organisation:
+            return None
+        return self.ecrivain.ajouter_prepare(prepare, organisation)
+
+    def _recuperer(self, elements):
+        """Étape de récupération: parcourt la source et alimente la file des jeux récupérés"""
+        etape = self.etapes['recuperation']
+        iterateur = iter(elements)
+        try:
+            while not self._arret.is_set():
+                debut = time.monotonic()
+                try:
+                    element = next(iterateur)
+                except StopIteration:
+                    break
+                etape.mesurer(debut)
+                self._deposer(self.jeux_recuperes, element, etape)
+            self._deposer(self.jeux_recuperes, FIN)
+        except Exception as e:
+            self._deposer(self.jeux_recuperes, _Echec(e))
+        finally:
+            # Arrête aussi les appels parallèles du parcours (mode 'liste')
+            if hasattr(iterateur, 'close'):
+                iterateur.close()
+            connection.close()
+
+    def _normaliser(self):
+        """Étape de normalisation: filtres, champs normalisés et empreintes des ressources"""
+        etape = self.etapes['normalisation']
+        try:
+            while True:
+                element = self._prendre(self.jeux_recuperes)
+                if element is None:
+                    return
+                if element is FIN or isinstance(element, _Echec):
+                    self._deposer(self.jeux_normalises, element)
+                    return
+
+                idx, total, details_jeu = element
+                debut = time.monotonic()
+                prepare = self.ecrivain.preparer(details_jeu) if details_jeu else None
+                etape.mesurer(debut)
+                self._deposer(self.jeux_normalises, (idx, total, details_jeu, prepare), etape)
+        except Exception as e:
+            self._deposer(self.jeux_normalises, _Echec(e))
+        finally:
+            connection.close()
+
+    def _deposer(self, file, element, etape=None):
+        """
+        Dépose un élément, en attendant une place tant que le pipeline n'est pas arrêté
+
+        Returns:
+            bool: False si le pipeline a été arrêté avant le dépôt
+        """
+        debut = time.monotonic()
+        while not self._arret.is_set():
+            try:
+                file.put(element, timeout=ATTENTE_FILE)
+                break
+            except queue.Full:
+                continue
+        if etape is not None:
+            etape.attente_aval += time.monotonic() - debut
+        return not self._arret.is_set()
+
+    def _prendre(self, file):
+        """Prend l'élément suivant, ou None si le pipeline a été arrêté"""
+        while not self._arret.is_set():
+            try:
+                return file.get(timeout=ATTENTE_FILE)
+            except queue.Empty:
+                continue
+        return None
+
+    def _arreter(self):
+        """Arrête les étapes amont (fin du parcours, arrêt demandé ou erreur d'écriture)"""
+        self._arret.set()
+        for fil in self._fils:
+            fil.join()
+        self._fin = time.monotonic()
@@ -0,0 +1,275 @@
+"""
+Planification des moissonnages.
+
+ExpressionCron interprète les expressions cron à cinq champs
+(minute heure jour mois jour_semaine) et calcule leur prochaine occurrence;
+prochaine_execution() applique la fréquence d'une ConfigurationPlanification
+(quotidien, hebdomadaire, mensuel ou expression personnalisée). Les heures
+sont exprimées dans le fuseau du projet (settings.TIME_ZONE).
+declencher_planifications_dues() met en file les moissonnages arrivés à
+échéance; la commande run_scheduler l'appelle en boucle.
+"""
+import calendar
+from datetime import datetime, time as dt_time, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from donnees.models import ConfigurationPlanification
+from .models import MoissonnageExecution
+
+NOMS_MOIS = {nom: numero for numero, nom in enumerate(
+    ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC'], start=1
+)}
+NOMS_JOURS = {nom: numero for numero, nom in enumerate(['SUN', 'MON', 'TUE', 'WED', 'THU', 'FRI', 'SAT'])}
+
+# Horizon de recherche de la prochaine occurrence (couvre les 29 février)
+HORIZON_JOURS = 366 * 5
+
+
+class ExpressionCron:
+    """Expression cron à cinq champs: minute heure jour_du_mois mois jour_de_la_semaine"""
+
+    CHAMPS = [
+        ('minute', 0, 59, {}),
+        ('heure', 0, 23, {}),
+        ('jour', 1, 31, {}),
+        ('mois', 1, 12, NOMS_MOIS),
+        ('jour_semaine', 0, 7, NOMS_JOURS),
+    ]
+
+    def __init__(self, expression):
+        """
+        Args:
+            expression: Expression cron (ex: "0 3 * * *", "*/15 8-18 * * MON-FRI")
+
+        Raises:
+            ValueError: Si l'expression est invalide
+        """
+        self.expression = expression
+        parties = (expression or '').split()
+        if len(parties) != 5:
+            raise ValueError(f"Expression cron invalide (5 champs attendus): {expression!r}")
+
+        valeurs = {}
+        for partie, (nom, minimum, maximum, noms) in zip(parties, self.CHAMPS):
+            valeurs[nom] = self._analyser_champ(partie.upper(), minimum, maximum, noms)
+
+        self.minutes = valeurs['minute']
+        self.heures = valeurs['heure']
+        self.jours = valeurs['jour']
+        self.mois = valeurs['mois']
+        # 0 et 7 désignent tous deux le dimanche
+        self.jours_semaine = {jour % 7 for jour in valeurs['jour_semaine']}
+        # En cron, jour du mois et jour de la semaine restreints se combinent par OU
+        self.jour_restreint = parties[2] != '*'
+        self.jour_semaine_restreint = parties[4] != '*'
+
+    def __str__(self):
+        return self.expression
+
+    @staticmethod
+    def _analyser_champ(partie, minimum, maximum, noms):
+        """Convertit un champ cron (*, */n, a-b, a-b/n, listes, noms) en ensemble de valeurs"""
+        def entier(texte):
+            if texte in noms:
+                return noms[texte]
+            if not texte.isdigit():
+                raise ValueError(f"Champ cron invalide: {partie}")
+            return int(texte)
+
+        resultat = set()
+        for element in partie.split(','):
+            plage, _, pas = element.partition('/')
+            pas = entier(pas) if pas else 1
+            if plage == '*':
+                debut, fin = minimum, maximum
+            elif '-' in plage:
+                debut, fin = (entier(borne) for borne in plage.split('-', 1))
+            else:
+                debut = entier(plage)
+                fin = maximum if '/' in element else debut
+
+            if pas < 1 or debut < minimum or fin > maximum or debut > fin:
+                raise ValueError(f"Champ cron invalide ({minimum}-{maximum}): {element}")
+            resultat.update(range(debut, fin + 1, pas))
+        return resultat
+
+    def correspond_au_jour(self, date):
+        """Indique si l'expression autorise ce jour (jour du mois / de la semaine, mois)"""
+        if date.month not in self.mois:
+            return False
+        # isoweekday: lundi=1 ... dimanche=7 -> convention cron dimanche=0
+        jour_ok = date.day in self.jours
+        jour_semaine_ok = date.isoweekday() % 7 in self.jours_semaine
+        if self.jour_restreint and self.jour_semaine_restreint:
+            return jour_ok or jour_semaine_ok
+        return jour_ok and jour_semaine_ok
+
+    def prochaine(self, apres):
+        """
+        Calcule la première occurrence strictement postérieure à une date
+
+        Args:
+            apres: datetime (aware) de référence
+
+        Returns:
+            datetime: Prochaine occurrence, dans le fuseau courant
+
+        Raises:
+            ValueError: Si aucune occurrence n'existe dans l'horizon de recherche
+        """
+        locale = timezone.localtime(apres).replace(second=0, microsecond=0, tzinfo=None) + timedelta(minutes=1)
+        heures = sorted(self.heures)
+        minutes = sorted(self.minutes)
+
+        jour = locale.date()
+        for decalage in range(HORIZON_JOURS):
+            if decalage:
+                jour = locale.date() + timedelta(days=decalage)
+            if not self.correspond_au_jour(jour):
+                continue
+            for heure in heures:
+                for minute in minutes:
+                    candidat = datetime.combine(jour, dt_time(heure, minute))
+                    if candidat >= locale:
+                        return timezone.make_aware(candidat)
+        raise ValueError(f"Aucune occurrence pour l'expression cron {self.expression!r}")
+
+
+def prochaine_execution(planification, apres=None):
+    """
+    Calcule la prochaine exécution d'une ConfigurationPlanification
+
+    Args:
+        planification: Instance de ConfigurationPlanification
+        apres: Date de référence (par défaut, maintenant)
+
+    Returns:
+        datetime: Prochaine exécution
+
+    Raises:
+        ValueError: Si la planification est incomplète ou son expression cron invalide
+    """
+    apres = apres or timezone.now()
+    heure = planification.heure_execution
+    if isinstance(heure, str):
+        heure = dt_time.fromisoformat(heure)
+
+    if planification.frequence == 'quotidien':
+        return ExpressionCron(f'{heure.minute} {heure.hour} * * *').prochaine(apres)
+
+    if planification.frequence == 'hebdomadaire':
+        if planification.jour_semaine is None:
+            raise ValueError("Jour de la semaine requis pour une planification hebdomadaire")
+        # Modèle: lundi=0 ... dimanche=6; cron: dimanche=0
+        return ExpressionCron(
+            f'{heure.minute} {heure.hour} * * {(planification.jour_semaine + 1) % 7}'
+        ).prochaine(apres)
+
+    if planification.frequence == 'mensuel':
+        if not planification.jour_mois or not 1 <= planification.jour_mois <= 31:
+            raise ValueError("Jour du mois (1-31) requis pour une planification mensuelle")
+        return _prochaine_mensuelle(planification.jour_mois, heure, apres)
+
+    return ExpressionCron(planification.expression_cron).prochaine(apres)
+
+
+def _prochaine_mensuelle(jour_mois, heure, apres):
+    """Prochaine occurrence mensuelle; un jour absent du mois (ex: 31) devient le dernier jour"""
+    locale = timezone.localtime(apres).replace(tzinfo=None)
+    annee, mois = locale.year, locale.month
+    for _ in range(13):
+        jour = min(jour_mois, calendar.monthrange(annee, mois)[1])
+        candidat = datetime(annee, mois, jour, heure.hour, heure.minute)
+        if candidat > locale:
+            return timezone.make_aware(candidat)
+        annee, mois = (annee + 1, 1) if mois == 12 else (annee, mois + 1)
+    raise ValueError("Aucune occurrence mensuelle trouvée")
+
+
+def initialiser_prochaines_executions(maintenant=None):
+    """
+    Calcule prochaine_execution des planifications actives qui n'en ont pas
+
+    Returns:
+        int: Nombre de planifications initialisées
+    """
+    maintenant = maintenant or timezone.now()
+    initialisees = 0
+    for planification in ConfigurationPlanification.objects.filter(active=True, prochaine_execution__isnull=True):
+        try:
+            planification.prochaine_execution = prochaine_execution(planification, maintenant)
+        except ValueError as e:
+            print(f"Planification {planification.pk} ignorée: {e}")
+            continue
+        planification.save(update_fields=['prochaine_execution', 'date_modification'])
+        initialisees += 1
+    return initialisees
+
+
+def declencher_planifications_dues(maintenant=None, max_concurrence=None):
+    """
+    Met en file les moissonnages des planifications arrivées à échéance
+
+    Chaque planification est verrouillée (SELECT ... FOR UPDATE) pendant sa
+    mise en file: derniere_execution et prochaine_execution sont écrites dans
+    la même transaction que l'exécution. Une source déjà en cours de moissonnage
+    saute l'occurrence; lorsque le plafond global d'exécutions actives est
+    atteint, les planifications restantes restent dues et seront reprises au
+    tour suivant.
+
+    Args:
+        maintenant: Date de référence (par défaut, maintenant)
+        max_concurrence: Nombre maximal d'exécutions en file ou en cours
+                         (par défaut, settings.MOISSONNAGE_MAX_PLANIFIES)
+
+    Returns:
+        dict: {'declenchees': [...], 'ignorees': n, 'differees': n}
+    """
+    maintenant = maintenant or timezone.now()
+    if max_concurrence is None:
+        max_concurrence = getattr(settings, 'MOISSONNAGE_MAX_PLANIFIES', 1)
+    bilan = {'declenchees': [], 'ignorees': 0, 'differees': 0}
+
+    dues = ConfigurationPlanification.objects.filter(
+        active=True, prochaine_execution__lte=maintenant
+    ).order_by('prochaine_execution').values_list('pk', flat=True)
+
+    for pk in list(dues):
+        with transaction.atomic():
+            planification = ConfigurationPlanification.objects.select_for_update().select_related(
+                'source', 'configuration_filtres'
+            ).filter(pk=pk, active=True, prochaine_execution__lte=maintenant).first()
+            if planification is None:
+                # Déjà traitée par un autre planificateur
+                continue
+
+            try:
+                suivante = prochaine_execution(planification, maintenant)
+            except ValueError as e:
+                print(f"Planification {planification.pk} désactivée: {e}")
+                planification.active = False
+                planification.save(update_fields=['active', 'date_modification'])
+                continue
+
+            actives = MoissonnageExecution.objects.filter(statut__in=MoissonnageExecution.STATUTS_ACTIFS)
+            if actives.filter(source=planification.source).exists():
+                bilan['ignorees'] += 1
+                planification.prochaine_execution = suivante
+                planification.save(update_fields=['prochaine_execution', 'date_modification'])
+                continue
+            if actives.count() >= max_concurrence:
+                bilan['differees'] += 1
+                continue
+
+            execution = MoissonnageExecution.mettre_en_file(
+                planification.source, MoissonnageExecution.mode_pour(planification.source),
+                configuration_filtres=planification.configuration_filtres,
+                planification=planification,
+            )
+            planification.derniere_execution = maintenant
+            planification.prochaine_execution = suivante
+            planification.save(update_fields=['derniere_execution', 'prochaine_execution', 'date_modification'])
+            bilan['declenchees'].append(execution)
+
+    return bilan
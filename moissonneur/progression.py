@@ -0,0 +1,230 @@
+"""
+Canal de progression des moissonnages.
+
+Les compteurs vivent en mémoire sur l'exécution; RapporteurProgression en
+publie un instantané dans le cache Django au plus une fois par intervalle
+(ou tous les N éléments) et y lit la demande d'arrêt. La ligne
+MoissonnageExecution n'est écrite qu'aux points de reprise: le cache sert le
+suivi en direct, la base reste la référence durable (et le repli du suivi
+lorsque le cache n'est pas partagé entre le serveur web et le travailleur).
+"""
+import asyncio
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+# Durée de conservation (secondes) de l'instantané après la dernière publication
+DUREE_CACHE = 24 * 60 * 60
+
+# Délai de reconnexion (millisecondes) demandé à EventSource en fin de flux
+RETRY_SSE = 'retry: 2000\n\n'
+
+CHAMPS_PROGRESSION = [
+    'statut', 'phase', 'progression', 'message', 'total_organisations', 'total_jeux_donnees',
+    'organisations', 'jeux_donnees', 'ressources', 'erreurs', 'jeux_nouveaux', 'jeux_modifies', 'jeux_inchanges',
+]
+
+
+def cle_progression(execution_id):
+    return f'moissonnage:{execution_id}:progression'
+
+
+def cle_arret(execution_id):
+    return f'moissonnage:{execution_id}:arret'
+
+
+def instantane_execution(execution, debit=None, eta=None):
+    """
+    Instantané de progression d'une exécution (compteurs en mémoire)
+
+    Args:
+        debit: Jeux de données traités par seconde depuis le début de la tentative
+        eta: Estimation du temps restant (secondes) pour la phase des jeux de données
+    """
+    instantane = {champ: getattr(execution, champ) for champ in CHAMPS_PROGRESSION}
+    instantane.update({'execution': execution.pk, 'debit': debit, 'eta': eta})
+    return instantane
+
+
+def lire_progression(execution):
+    """
+    Retourne la progression la plus récente d'une exécution
+
+    Returns:
+        dict: Instantané publié dans le cache, à défaut celui de la ligne en base
+    """
+    return cache.get(cle_progression(execution.pk)) or instantane_execution(execution)
+
+
+def demander_arret(execution):
+    """Demande l'arrêt d'une exécution (ligne en base et signal dans le cache)"""
+    execution.__class__.objects.filter(
+        pk=execution.pk, statut__in=execution.STATUTS_ACTIFS
+    ).update(arret_demande=True)
+    cache.set(cle_arret(execution.pk), True, DUREE_CACHE)
+
+
+class RapporteurProgression:
+    """Publie la progression d'une exécution dans le cache, par intervalle de temps ou de volume"""
+
+    def __init__(self, execution, intervalle=None, pas=None, complements=None):
+        """
+        Args:
+            execution: Instance de MoissonnageExecution dont les compteurs sont suivis
+            intervalle: Secondes minimales entre deux publications
+                        (par défaut, settings.MOISSONNAGE_INTERVALLE_PROGRESSION)
+            pas: Nombre d'éléments traités déclenchant une publication anticipée
+            complements: Fonction sans argument retournant un dict ajouté à chaque instantané
+                         (ex: statistiques du pipeline)
+        """
+        self.execution = execution
+        self.complements = complements
+        self.intervalle = intervalle if intervalle is not None else getattr(
+            settings, 'MOISSONNAGE_INTERVALLE_PROGRESSION', 1.0
+        )
+        self.pas = pas or 500
+        self.publications = 0
+        self._debut = time.monotonic()
+        self._traites_au_debut = self._traites()
+        self._elements = 0
+        self._derniere_publication = 0.0
+        self._arret = False
+        cache.delete(cle_arret(execution.pk))
+
+    def signaler(self, force=False):
+        """
+        Comptabilise un élément traité et publie la progression si l'intervalle est écoulé
+
+        Returns:
+            bool: True si l'arrêt a été demandé
+        """
+        self._elements += 1
+        maintenant = time.monotonic()
+        if force or self._elements >= self.pas or maintenant - self._derniere_publication >= self.intervalle:
+            self.publier(maintenant)
+        return self._arret
+
+    def _traites(self):
+        """Jeux de données traités (sauvegardés ou en erreur), toutes tentatives confondues"""
+        return self.execution.jeux_donnees + self.execution.erreurs
+
+    def mesurer(self, maintenant=None):
+        """
+        Calcule le débit de la tentative courante et le temps restant estimé
+
+        Returns:
+            tuple: (jeux de données par seconde, secondes restantes) - None si inconnus
+        """
+        duree = (maintenant or time.monotonic()) - self._debut
+        traites = self._traites()
+        if duree <= 0 or traites <= self._traites_au_debut:
+            return None, None
+
+        debit = (traites - self._traites_au_debut) / duree
+        eta = None
+        if self.execution.phase == 'jeux_donnees' and self.execution.total_jeux_donnees:
+            eta = round(max(self.execution.total_jeux_donnees - traites, 0) / debit)
+        return round(debit, 2), eta
+
+    def publier(self, maintenant=None):
+        """Publie l'instantané et relit la demande d'arrêt (deux accès au cache)"""
+        debit, eta = self.mesurer(maintenant)
+        instantane = instantane_execution(self.execution, debit=debit, eta=eta)
+        if self.complements:
+            instantane.update(self.complements())
+        cache.set(cle_progression(self.execution.pk), instantane, DUREE_CACHE)
+        self._arret = bool(cache.get(cle_arret(self.execution.pk)))
+        self._elements = 0
+        self._derniere_publication = maintenant or time.monotonic()
+        self.publications += 1
+
+
+class _FluxProgression:
+    """État d'un flux SSE: événements à émettre pour chaque instantané lu"""
+
+    def __init__(self, execution, duree_max, intervalle_repli, battement):
+        self.execution = execution
+        self.duree_max = duree_max
+        self.intervalle_repli = intervalle_repli
+        self.battement = battement
+        self.debut = self.dernier_envoi = time.monotonic()
+        self.derniere_lecture_base = float('-inf')
+        self.dernier = None
+        self.termine = False
+
+    def actif(self):
+        return not self.termine and time.monotonic() - self.debut < self.duree_max
+
+    def relire_base(self):
+        """Indique si la ligne en base doit être relue (rien n'est publié dans le cache)"""
+        maintenant = time.monotonic()
+        if maintenant - self.derniere_lecture_base < self.intervalle_repli:
+            return False
+        self.derniere_lecture_base = maintenant
+        return True
+
+    def evenements(self, progression):
+        """Événements à émettre pour l'instantané lu (aucun s'il n'a pas changé)"""
+        maintenant = time.monotonic()
+        if progression != self.dernier:
+            self.dernier = progression
+            self.dernier_envoi = maintenant
+            yield f'event: progression\ndata: {json.dumps(progression)}\n\n'
+            if progression['statut'] not in self.execution.STATUTS_ACTIFS:
+                self.termine = True
+                yield f'event: fin\ndata: {json.dumps({"statut": progression["statut"]})}\n\n'
+        elif maintenant - self.dernier_envoi >= self.battement:
+            # Commentaire SSE: garde la connexion ouverte à travers les proxys
+            self.dernier_envoi = maintenant
+            yield ': battement\n\n'
+
+
+def evenements_progression(execution, intervalle=0.5, duree_max=300, intervalle_repli=5, battement=15):
+    """
+    Flux Server-Sent Events de la progression d'une exécution
+
+    Chaque observateur relit l'instantané publié dans le cache (aucune requête
+    SQL); la ligne en base n'est relue, au plus une fois par intervalle_repli,
+    que si rien n'est encore publié. Le flux se termine à la fin de l'exécution
+    ou après duree_max secondes (EventSource se reconnecte alors de lui-même).
+    Version synchrone: le fil qui sert le flux est occupé jusqu'à la fin, voir
+    aevenements_progression pour un serveur ASGI.
+
+    Yields:
+        str: Événements 'progression' et 'fin' au format text/event-stream
+    """
+    flux = _FluxProgression(execution, duree_max, intervalle_repli, battement)
+    yield RETRY_SSE
+    while flux.actif():
+        progression = cache.get(cle_progression(execution.pk))
+        if progression is None:
+            if flux.relire_base():
+                execution.refresh_from_db()
+            progression = instantane_execution(execution)
+        yield from flux.evenements(progression)
+        if flux.termine:
+            return
+        time.sleep(intervalle)
+
+
+async def aevenements_progression(execution, intervalle=0.5, duree_max=300, intervalle_repli=5, battement=15):
+    """
+    Version asynchrone de evenements_progression (serveur ASGI)
+
+    Les attentes ne bloquent aucun fil: un flux ouvert ne coûte qu'une tâche
+    de la boucle d'événements.
+    """
+    flux = _FluxProgression(execution, duree_max, intervalle_repli, battement)
+    yield RETRY_SSE
+    while flux.actif():
+        progression = await cache.aget(cle_progression(execution.pk))
+        if progression is None:
+            if flux.relire_base():
+                await execution.arefresh_from_db()
+            progression = instantane_execution(execution)
+        for evenement in flux.evenements(progression):
+            yield evenement
+        if flux.termine:
+            return
+        await asyncio.sleep(intervalle)
@@ -1,8 +1,40 @@
 import requests
-import json
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
-from donnees.models import Organisation, JeuDonnees, Ressource, Categorie, SourceDonnees, ConfigurationFiltres
+from donnees.categories import lier_categories_et_etiquettes, recompter_categories
+from donnees.models import Organisation, JeuDonnees, Ressource, SourceDonnees, ConfigurationFiltres
+from .client_ckan import ClientCkan
+from .ecriture import verrou_ecriture
+from .filtres import FiltresCompiles
+from .telemetrie import Telemetrie
+
+# Chevauchement appliqué au filtre incrémental pour absorber les écarts d'horloge avec CKAN
+MARGE_INCREMENTALE = timedelta(minutes=5)
+
+# Noms de jeux de données demandés par appel package_list
+TAILLE_PAGE_LISTE = 1000
+
+
+def cle_tri(details_jeu):
+    """
+    Clé de tri package_search d'un jeu: [metadata_modified, name]
+
+    metadata_modified est tronqué à la milliseconde, précision des dates indexées
+    par Solr: la clé suit donc exactement l'ordre 'metadata_modified asc, name asc'.
+
+    Returns:
+        list: [metadata_modified, name], ou None si l'un des deux manque
+    """
+    modifie = (details_jeu or {}).get('metadata_modified')
+    nom = (details_jeu or {}).get('name')
+    if not (modifie and nom):
+        return None
+    return [modifie.rstrip('Z')[:23], nom]
+
 
 class ServiceMoissonnage:
     """Service pour moissonner les données depuis différentes sources"""
@@ -16,37 +48,63 @@ class ServiceMoissonnage:
             configuration_filtres: Instance de ConfigurationFiltres pour filtrer les données.
         """
         if source is None:
-            # Utiliser la source active par défaut ou créer Données Québec
-            source = SourceDonnees.objects.filter(active=True).first()
-            if source is None:
-                # Créer la source Données Québec par défaut si elle n'existe pas
-                source, _ = SourceDonnees.objects.get_or_create(
-                    nom="Données Québec",
-                    defaults={
-                        'url_base': "https://www.donneesquebec.ca/api/3/action/",
-                        'description': "Portail des données ouvertes du Québec",
-                        'active': True
-                    }
-                )
+            source = self.source_par_defaut()
         
         self.source = source
         self.configuration_filtres = configuration_filtres
+        # Filtres compilés une fois par exécution (noms CKAN résolus au premier besoin)
+        self.filtres = FiltresCompiles(configuration_filtres)
+        self._filtres_resolus = False
         self.url_base = source.url_base.rstrip('/') + '/' if not source.url_base.endswith('/') else source.url_base
         
+        self.concurrence = max(1, source.concurrence_max or 1)
+        
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'DataQC-Moissonneur/1.0'
         })
+        # Pool de connexions dimensionné pour les appels parallèles
+        adaptateur = requests.adapters.HTTPAdapter(
+            pool_connections=self.concurrence,
+            pool_maxsize=self.concurrence
+        )
+        self.session.mount('http://', adaptateur)
+        self.session.mount('https://', adaptateur)
+        # Mesures de l'exécution (étapes, appels HTTP, requêtes SQL), voir telemetrie
+        self.telemetrie = Telemetrie()
+        # Délais d'expiration, nouvelles tentatives et débit propres à la source
+        self.client = ClientCkan(
+            self.url_base, session=self.session, concurrence=self.concurrence, telemetrie=self.telemetrie
+        )
+        
+        # Échecs des appels de liste/recherche: un moissonnage incomplet ne doit pas avancer le filigrane
+        self.erreurs_recuperation = 0
+        
+        # Organisations déjà résolues pendant l'exécution, par identifiant et nom CKAN
+        self._organisations = {}
+    
+    @staticmethod
+    def source_par_defaut():
+        """Retourne la source active par défaut (Données Québec est créée si aucune n'existe)"""
+        source = SourceDonnees.objects.filter(active=True).first()
+        if source is None:
+            # Créer la source Données Québec par défaut si elle n'existe pas
+            source, _ = SourceDonnees.objects.get_or_create(
+                nom="Données Québec",
+                defaults={
+                    'url_base': "https://www.donneesquebec.ca/api/3/action/",
+                    'description': "Portail des données ouvertes du Québec",
+                    'active': True
+                }
+            )
+        return source
     
     def recuperer_organisations(self):
         """Récupère toutes les organisations depuis l'API CKAN"""
+        self._resoudre_filtres()
         try:
             print("Récupération des organisations...")
-            reponse = self.session.get(f"{self.url_base}organization_list")
-            reponse.raise_for_status()
-            
-            donnees = reponse.json()
-            organisations = donnees['result']
+            organisations = self.filtres.restreindre_organisations(self.client.appeler('organization_list'))
             
             print(f"Trouvé {len(organisations)} organisations")
             return organisations
@@ -55,17 +113,53 @@ class ServiceMoissonnage:
             print(f"Erreur lors de la récupération des organisations: {e}")
             return []
     
+    def recuperer_liste_detaillee(self, action):
+        """
+        Récupère les noms et titres de toutes les organisations ou de tous les groupes
+
+        Le parcours s'arrête sur une page incomplète. Un portail qui ignore la
+        pagination renvoie la liste complète au premier appel, ou la même page
+        à chaque appel: elle n'est alors lue qu'une fois.
+
+        Args:
+            action: 'organization_list' ou 'group_list' (appelée avec all_fields, par pages)
+
+        Returns:
+            list: Dicts CKAN {'name', 'title', ...}, ou None en cas d'erreur
+        """
+        elements = []
+        premier_precedent = None
+        try:
+            while True:
+                page = self.client.appeler(
+                    action, {'all_fields': 'true', 'offset': len(elements), 'limit': TAILLE_PAGE_LISTE}
+                )
+                if not page or page[0] == premier_precedent:
+                    return elements
+                if len(page) > TAILLE_PAGE_LISTE:
+                    return page
+                elements.extend(page)
+                if len(page) < TAILLE_PAGE_LISTE:
+                    return elements
+                premier_precedent = page[0]
+        except requests.RequestException as e:
+            print(f"Erreur lors de la récupération de {action}: {e}")
+            return None
+
+    def _resoudre_filtres(self):
+        """Résout une fois par exécution les noms CKAN des organisations et groupes filtrés"""
+        if self._filtres_resolus or not self.filtres.actifs:
+            return
+        self._filtres_resolus = True
+        self.filtres.resoudre_noms(
+            organisations=self.recuperer_liste_detaillee('organization_list') if self.filtres.organisations else None,
+            groupes=self.recuperer_liste_detaillee('group_list') if self.filtres.categories else None,
+        )
+
     def recuperer_details_organisation(self, nom_organisation):
         """Récupère les détails d'une organisation spécifique"""
         try:
-            reponse = self.session.get(
-                f"{self.url_base}organization_show",
-                params={'id': nom_organisation}
-            )
-            reponse.raise_for_status()
-            
-            donnees = reponse.json()
-            return donnees['result']
+            return self.client.appeler('organization_show', {'id': nom_organisation})
             
         except requests.RequestException as e:
             print(f"Erreur pour l'organisation {nom_organisation}: {e}")
@@ -75,137 +169,489 @@ class ServiceMoissonnage:
         """Récupère tous les jeux de données depuis l'API CKAN"""
         try:
             print("Récupération des jeux de données...")
-            reponse = self.session.get(f"{self.url_base}package_list")
-            reponse.raise_for_status()
-            
-            donnees = reponse.json()
-            jeux_donnees = donnees['result']
+            jeux_donnees = self.client.appeler('package_list')
             
             print(f"Trouvé {len(jeux_donnees)} jeux de données")
             return jeux_donnees
             
         except requests.RequestException as e:
             print(f"Erreur lors de la récupération des jeux de données: {e}")
+            self.erreurs_recuperation += 1
             return []
     
+    def iterer_noms_jeux_donnees(self, debut=0):
+        """
+        Parcourt les noms des jeux de données par pages de package_list (limit/offset)
+
+        Seule une page de noms est en mémoire à la fois. Un portail qui ignore
+        la pagination renvoie la liste complète au premier appel.
+
+        Args:
+            debut: Position du premier nom à produire
+
+        Yields:
+            str: Noms des jeux de données
+        """
+        position = debut
+        while True:
+            try:
+                noms = self.client.appeler('package_list', {'limit': TAILLE_PAGE_LISTE, 'offset': position})
+            except requests.RequestException as e:
+                print(f"Erreur lors de la récupération des jeux de données (offset={position}): {e}")
+                self.erreurs_recuperation += 1
+                return
+
+            if len(noms) > TAILLE_PAGE_LISTE:
+                yield from noms[debut:]
+                return
+            yield from noms
+            if len(noms) < TAILLE_PAGE_LISTE:
+                return
+            position += len(noms)
+
+    def compter_jeux_donnees(self, fq=None):
+        """
+        Nombre de jeux de données du catalogue (package_search sans résultat)
+
+        Returns:
+            int: Nombre de jeux, ou None si le portail ne répond pas
+        """
+        params = {'rows': 0}
+        if fq:
+            params['fq'] = fq
+        try:
+            return self.client.appeler('package_search', params).get('count')
+        except (requests.RequestException, AttributeError) as e:
+            print(f"Nombre de jeux de données indisponible: {e}")
+            return None
+    
     def recuperer_details_jeu_donnees(self, nom_jeu):
         """Récupère les détails d'un jeu de données spécifique"""
         try:
-            reponse = self.session.get(
-                f"{self.url_base}package_show",
-                params={'id': nom_jeu}
-            )
-            reponse.raise_for_status()
-            
-            donnees = reponse.json()
-            return donnees['result']
+            return self.client.appeler('package_show', {'id': nom_jeu})
             
         except requests.RequestException as e:
             print(f"Erreur pour le jeu de données {nom_jeu}: {e}")
             return None
-    
-    def _applique_filtres_organisation(self, nom_org):
-        """Vérifie si une organisation passe les filtres configurés"""
-        if not self.configuration_filtres or not self.configuration_filtres.actif:
-            return True
-        
-        if self.configuration_filtres.organisations_filtres:
-            organisations_autorisees = [
-                org.strip() 
-                for org in self.configuration_filtres.organisations_filtres.split(';') 
-                if org.strip()
-            ]
-            return nom_org in organisations_autorisees
-        
+
+    def recuperer_en_parallele(self, fonction, elements):
+        """
+        Exécute des appels CKAN en parallèle avec une concurrence bornée
+
+        Les résultats sont produits dans l'ordre des éléments. Seuls les
+        appels HTTP s'exécutent dans le pool: le consommateur du générateur
+        reste l'unique écrivain en base de données.
+
+        Args:
+            fonction: Fonction de récupération (ex: recuperer_details_jeu_donnees)
+            elements: Itérable des identifiants à récupérer
+
+        Yields:
+            tuple: (element, resultat)
+        """
+        if self.concurrence == 1:
+            for element in elements:
+                yield element, fonction(element)
+            return
+
+        executeur = ThreadPoolExecutor(max_workers=self.concurrence, thread_name_prefix='moissonnage')
+        en_vol = deque()
+        try:
+            for element in elements:
+                en_vol.append((element, executeur.submit(fonction, element)))
+                # Fenêtre bornée: on ne soumet pas plus de deux appels d'avance par fil
+                if len(en_vol) >= self.concurrence * 2:
+                    element_pret, futur = en_vol.popleft()
+                    yield element_pret, futur.result()
+
+            while en_vol:
+                element_pret, futur = en_vol.popleft()
+                yield element_pret, futur.result()
+        finally:
+            executeur.shutdown(wait=True, cancel_futures=True)
+
+    def recuperer_page_jeux_donnees(self, debut=0, taille_page=None, fq=None):
+        """
+        Ouvre une page de jeux de données complets via package_search
+
+        Chaque jeu retourné contient déjà son organisation, ses groupes,
+        ses étiquettes et ses ressources (aucun package_show requis). Les jeux
+        sont décodés au fil de la lecture de la réponse: seul le jeu courant
+        est en mémoire, pas la page entière.
+
+        Returns:
+            dict: {'count': total, 'results': itérateur des jeux} ou None en cas d'erreur.
+                  L'itérateur ne se parcourt qu'une fois et peut lever une
+                  requests.RequestException si la réponse est interrompue.
+        """
+        params = {
+            'rows': taille_page or self.source.taille_page,
+            'start': debut,
+            # Tri stable pour que la pagination par start soit déterministe
+            'sort': 'metadata_modified asc, name asc',
+        }
+        if fq:
+            params['fq'] = fq
+        if self.filtres.prive:
+            # Les jeux privés ne sont renvoyés qu'à la demande (et selon les droits du client)
+            params['include_private'] = 'true'
+
+        try:
+            entete, jeux_donnees = self.client.appeler_en_flux('package_search', params)
+            return {'count': entete.get('count'), 'results': jeux_donnees}
+
+        except requests.RequestException as e:
+            print(f"Erreur lors de la recherche des jeux de données (start={debut}): {e}")
+            self.erreurs_recuperation += 1
+            return None
+
+    def iterer_recherche(self, fq=None, debut=0, apres=None):
+        """
+        Parcourt le catalogue page par page via package_search
+
+        La pagination suit la clé de tri du dernier jeu lu (voir cle_tri et
+        clause_apres) plutôt qu'un start croissant: un jeu ajouté, modifié ou
+        retiré en amont pendant le parcours ne décale pas les pages suivantes.
+        Tant que les jeux n'exposent pas leur clé, start avance comme avant.
+        Une réponse interrompue en cours de page est reprise après le dernier jeu
+        lu, sans relire les jeux déjà produits.
+
+        Args:
+            fq: Clause fq des filtres
+            debut: Jeux déjà traités (start de reprise si apres n'est pas fourni)
+            apres: Clé de tri du dernier jeu traité, point de reprise prioritaire
+
+        Yields:
+            tuple: (total, details_jeu) - total vaut None si le portail ne le donne pas
+                   avant les résultats
+        """
+        taille_page = self.source.taille_page
+        cle = apres or None
+        # Jeux sautés par start dans la requête courante, et jeux produits depuis le début
+        decalage = 0 if cle else debut
+        produits = debut
+        while True:
+            clauses = [fq, self.clause_apres(cle) if cle else None]
+            resultat = self.recuperer_page_jeux_donnees(
+                decalage, fq=' AND '.join(clause for clause in clauses if clause) or None
+            )
+            if not resultat:
+                return
+
+            # count porte sur la requête courante: jeux restants après la clé, sautés compris
+            restants = resultat.get('count')
+            total = None if restants is None else produits - decalage + restants
+            demandes = decalage
+            lus = 0
+            try:
+                for details_jeu in resultat.get('results', []):
+                    lus += 1
+                    produits += 1
+                    cle_jeu = cle_tri(details_jeu)
+                    if cle_jeu:
+                        cle, decalage = cle_jeu, 0
+                    else:
+                        decalage += 1
+                    yield total, details_jeu
+            except requests.RequestException as e:
+                if not lus:
+                    print(f"Erreur lors de la lecture des jeux de données (start={demandes}): {e}")
+                    self.erreurs_recuperation += 1
+                    return
+                print(f"Lecture interrompue (start={demandes}) après {lus} jeux, reprise: {e}")
+                continue
+
+            if not lus or (restants is not None and demandes + lus >= restants) or (restants is None and lus < taille_page):
+                return
+
+    @staticmethod
+    def clause_apres(cle):
+        """
+        Clause fq limitant package_search aux jeux qui suivent une clé de tri
+
+        Args:
+            cle: [metadata_modified, name] du dernier jeu lu (voir cle_tri)
+
+        Returns:
+            str: Clause fq stricte sur (metadata_modified, name)
+        """
+        modifie, nom = cle
+        date = f'{modifie}Z'
+        return (
+            f'(metadata_modified:{{{date} TO *] OR '
+            f'(metadata_modified:"{date}" AND name:{{"{nom}" TO *]))'
+        )
+
+    def filtre_incremental(self):
+        """
+        Construit le filtre fq limitant package_search aux jeux modifiés depuis
+        la dernière synchronisation réussie de la source
+
+        Returns:
+            str: Clause fq sur metadata_modified, ou None si aucune synchronisation antérieure
+        """
+        if not self.source.derniere_synchronisation:
+            return None
+
+        depuis = (self.source.derniere_synchronisation - MARGE_INCREMENTALE).astimezone(dt_timezone.utc)
+        return f"metadata_modified:[{depuis.strftime('%Y-%m-%dT%H:%M:%SZ')} TO *]"
+
+    def clause_filtres(self):
+        """
+        Clause fq des filtres configurés transmissibles à package_search
+
+        Returns:
+            str: Clause fq, ou None si aucun filtre n'est transmissible
+        """
+        self._resoudre_filtres()
+        return self.filtres.clause_fq()
+
+    def iterer_jeux_donnees(self, incremental=False, debut=0, apres=None):
+        """
+        Parcourt les détails de tous les jeux de données selon le mode de la source
+
+        En mode 'recherche', les pages de package_search sont lues au fil de
+        l'eau; en mode 'liste', les pages de package_list sont suivies d'un
+        package_show par jeu de données. Aucun des deux modes ne garde le
+        catalogue en mémoire. En incrémental, seule la recherche filtrée sur
+        metadata_modified est utilisée, quel que soit le mode de la source; de
+        même lorsque des filtres configurés peuvent être transmis à CKAN.
+
+        Args:
+            incremental: Limiter aux jeux modifiés depuis la dernière synchronisation
+            debut: Position de reprise (jeux déjà traités lors d'une exécution précédente)
+            apres: Clé de tri du dernier jeu traité (recherche seulement, voir iterer_recherche)
+
+        Yields:
+            tuple: (index, total, details_jeu) - details_jeu vaut None si indisponible
+        """
+        clauses = [self.filtre_incremental() if incremental else None, self.clause_filtres()]
+        fq = ' AND '.join(clause for clause in clauses if clause) or None
+
+        if fq is None and self.source.mode_moissonnage == 'liste':
+            total = self.compter_jeux_donnees()
+            details = self.recuperer_en_parallele(
+                self.recuperer_details_jeu_donnees, self.iterer_noms_jeux_donnees(debut)
+            )
+            for idx, (nom_jeu, details_jeu) in enumerate(details, start=debut):
+                yield idx, max(total or 0, idx + 1), details_jeu
+            return
+
+        print("Récupération des jeux de données par pages...")
+        recherche = self.iterer_recherche(fq=fq, debut=debut, apres=apres)
+        for idx, (total, details_jeu) in enumerate(recherche, start=debut):
+            yield idx, max(total or 0, idx + 1), details_jeu
+
+    def trouver_organisation(self, details_jeu):
+        """Trouve (ou crée) l'organisation associée à un jeu de données"""
+        org_data = details_jeu.get('organization') or {}
+        ckan_id = org_data.get('id')
+        ckan_name = org_data.get('name')
+        titre = org_data.get('title')
+
+        if not (ckan_id or ckan_name or titre):
+            return None
+
+        for cle in (ckan_id, ckan_name):
+            if cle and cle in self._organisations:
+                return self._organisations[cle]
+
+        organisation = self._trouver_organisation_existante(ckan_id, ckan_name, titre)
+        if organisation is None:
+            # package_search et package_show incluent déjà le détail de l'organisation
+            if not titre:
+                org_data = self.recuperer_details_organisation(ckan_name or ckan_id)
+            if org_data:
+                organisation = self.sauvegarder_organisation(org_data)
+        elif not organisation.ckan_id and ckan_id:
+            # Organisation antérieure aux identifiants CKAN: on l'adopte
+            organisation.source = self.source
+            organisation.ckan_id = ckan_id
+            organisation.ckan_name = ckan_name or ''
+            organisation.save(update_fields=['source', 'ckan_id', 'ckan_name'])
+
+        if organisation:
+            self._memoriser_organisation(organisation)
+        return organisation
+
+    def _memoriser_organisation(self, organisation):
+        """Met en cache une organisation par son identifiant et son nom CKAN"""
+        for cle in (organisation.ckan_id, organisation.ckan_name):
+            if cle:
+                self._organisations[cle] = organisation
+
+    def _trouver_par_identifiant(self, modele, ckan_id, **cle_historique):
+        """
+        Retrouve une ligne de la source par son identifiant CKAN
+
+        À défaut, retourne une ligne antérieure aux identifiants CKAN
+        (ckan_id vide) correspondant à la clé historique, pour l'adopter.
+        """
+        if ckan_id:
+            existante = modele.objects.filter(source=self.source, ckan_id=ckan_id).first()
+            if existante:
+                return existante
+
+        return modele.objects.filter(
+            Q(source=self.source) | Q(source__isnull=True),
+            ckan_id__isnull=True,
+            **cle_historique
+        ).order_by('pk').first()
+
+    def _trouver_organisation_existante(self, ckan_id, ckan_name, titre):
+        """Retrouve une organisation par identifiant CKAN, nom CKAN puis titre historique"""
+        if ckan_id:
+            organisation = Organisation.objects.filter(source=self.source, ckan_id=ckan_id).first()
+            if organisation:
+                return organisation
+
+        if ckan_name:
+            organisation = Organisation.objects.filter(source=self.source, ckan_name=ckan_name).first()
+            if organisation:
+                return organisation
+
+        if titre:
+            return self._trouver_par_identifiant(Organisation, None, nom=titre)
+        return None
+
+    def finaliser_synchronisation(self, date_debut):
+        """
+        Avance la date de dernière synchronisation de la source après un moissonnage réussi
+
+        Le filigrane correspond au début de l'exécution, pour que les jeux
+        modifiés pendant le moissonnage soient repris au prochain passage.
+        La mise à jour est atomique et ne recule jamais.
+
+        Un moissonnage filtré ne couvre qu'une partie du catalogue: il n'avance
+        pas le filigrane, sans quoi les jeux exclus ne seraient jamais repris.
+
+        Returns:
+            bool: False si une page n'a pas pu être récupérée ou si des filtres
+                  sont appliqués (filigrane inchangé)
+        """
+        if self.filtres.actifs:
+            return False
+        if self.erreurs_recuperation:
+            print(f"Synchronisation incomplète ({self.erreurs_recuperation} erreurs): filigrane conservé")
+            return False
+
+        with verrou_ecriture(), transaction.atomic():
+            SourceDonnees.objects.select_for_update().filter(
+                Q(derniere_synchronisation__isnull=True) | Q(derniere_synchronisation__lt=date_debut),
+                pk=self.source.pk
+            ).update(derniere_synchronisation=date_debut)
+        self.source.refresh_from_db(fields=['derniere_synchronisation'])
         return True
+
+    def moissonner_jeu_donnees(self, details_jeu, ecrivain=None):
+        """
+        Sauvegarde un jeu de données moissonné avec son organisation et ses ressources
+
+        Args:
+            details_jeu: Jeu de données CKAN complet
+            ecrivain: EcrivainLots optionnel; le jeu est alors mis en attente et écrit par lot
+
+        Returns:
+            int: Nombre de ressources sauvegardées, ou None si le jeu n'a pas été sauvegardé
+        """
+        if not details_jeu:
+            return None
+
+        organisation = self.trouver_organisation(details_jeu)
+        if not organisation:
+            return None
+
+        if ecrivain is not None:
+            return ecrivain.ajouter(details_jeu, organisation)
+
+        jeu_donnees = self.sauvegarder_jeu_donnees(details_jeu, organisation)
+        if not jeu_donnees:
+            return None
+
+        return self.sauvegarder_ressources(details_jeu, jeu_donnees)
+
+    def _applique_filtres_organisation(self, nom_org, ckan_name=''):
+        """Vérifie si une organisation passe les filtres configurés"""
+        return self.filtres.accepte_organisation(nom_org, ckan_name)
     
     def _applique_filtres_jeu_donnees(self, donnees_jeu):
         """Vérifie si un jeu de données passe les filtres configurés"""
-        if not self.configuration_filtres or not self.configuration_filtres.actif:
-            return True
-        
-        # Filtre par catégories
-        if self.configuration_filtres.categories_filtres:
-            categories_autorisees = [
-                cat.strip().lower() 
-                for cat in self.configuration_filtres.categories_filtres.split(';') 
-                if cat.strip()
-            ]
-            # Extraire les catégories du jeu
-            categories_jeu = []
-            for groupe in donnees_jeu.get('groups', []):
-                categories_jeu.append(groupe.get('title', '').lower())
-            
-            # Vérifier si au moins une catégorie correspond
-            if categories_autorisees and not any(cat in categories_autorisees for cat in categories_jeu):
-                return False
-        
-        # Filtre par format
-        if self.configuration_filtres.formats_fichiers:
-            formats_autorises = [
-                fmt.strip().upper() 
-                for fmt in self.configuration_filtres.formats_fichiers.split(';') 
-                if fmt.strip()
-            ]
-            # Extraire les formats des ressources
-            formats_ressources = [
-                res.get('format', '').upper() 
-                for res in donnees_jeu.get('resources', [])
-            ]
-            # Vérifier si au moins un format correspond
-            if formats_autorises and not any(fmt in formats_autorises for fmt in formats_ressources):
-                return False
-        
-        # Filtre temporel
-        if self.configuration_filtres.date_debut or self.configuration_filtres.date_fin:
-            date_creation = self._parser_date(donnees_jeu.get('metadata_created'))
-            if date_creation:
-                if self.configuration_filtres.date_debut and date_creation < self.configuration_filtres.date_debut:
-                    return False
-                if self.configuration_filtres.date_fin and date_creation > self.configuration_filtres.date_fin:
-                    return False
-        
-        # Filtre par niveau d'accès
-        if self.configuration_filtres.niveau_acces:
-            niveau_jeu = 'Privé' if donnees_jeu.get('private', False) else 'Ouvert'
-            if niveau_jeu != self.configuration_filtres.niveau_acces:
-                return False
-        
-        return True
+        return self.filtres.accepte_jeu(donnees_jeu)
     
     def sauvegarder_organisation(self, donnees_org):
         """Sauvegarde une organisation en base de données"""
         # Vérifier les filtres
-        if not self._applique_filtres_organisation(donnees_org.get('title', '')):
+        if not self._applique_filtres_organisation(donnees_org.get('title', ''), donnees_org.get('name', '')):
             return None
         
         try:
-            organisation, creee = Organisation.objects.get_or_create(
-                nom=donnees_org['title'],
-                defaults={
-                    'nom_complet': donnees_org.get('title', ''),
-                    'type_organisation': self._determiner_type_organisation(donnees_org['title']),
-                    'description': donnees_org.get('description', ''),
-                    'url': donnees_org.get('url', ''),
-                    'nombre_jeux_donnees': donnees_org.get('package_count', 0)
-                }
+            champs = {
+                'nom': donnees_org['title'],
+                'nom_complet': donnees_org.get('title', ''),
+                'description': donnees_org.get('description') or '',
+                'url': donnees_org.get('url') or '',
+                'nombre_jeux_donnees': donnees_org.get('package_count', 0),
+                'source': self.source,
+                'ckan_id': donnees_org.get('id') or None,
+                'ckan_name': donnees_org.get('name') or '',
+            }
+            
+            organisation = self._trouver_organisation_existante(
+                champs['ckan_id'], champs['ckan_name'], champs['nom']
             )
             
-            if not creee:
+            if organisation is None:
+                organisation = Organisation.objects.create(
+                    type_organisation=self._determiner_type_organisation(donnees_org['title']),
+                    **champs
+                )
+            else:
                 # Mettre à jour les données existantes
-                organisation.nom_complet = donnees_org.get('title', '')
-                organisation.description = donnees_org.get('description', '')
-                organisation.url = donnees_org.get('url', '')
-                organisation.nombre_jeux_donnees = donnees_org.get('package_count', 0)
+                for champ, valeur in champs.items():
+                    setattr(organisation, champ, valeur)
                 organisation.date_modification = timezone.now()
                 organisation.save()
             
+            self._memoriser_organisation(organisation)
             return organisation
             
         except Exception as e:
             print(f"Erreur lors de la sauvegarde de l'organisation {donnees_org.get('title', 'N/A')}: {e}")
             return None
     
+    def normaliser_jeu_donnees(self, donnees_jeu):
+        """Convertit un jeu de données CKAN en valeurs de champs du modèle JeuDonnees"""
+        return {
+            'ckan_id': donnees_jeu.get('id') or None,
+            'ckan_name': donnees_jeu.get('name') or '',
+            'titre': donnees_jeu['title'],
+            'description': donnees_jeu.get('notes') or '',
+            'categories': self._extraire_categories(donnees_jeu),
+            'etiquettes': self._extraire_etiquettes(donnees_jeu),
+            'niveau_acces': donnees_jeu.get('private', False) and 'Privé' or 'Ouvert',
+            'url_originale': donnees_jeu.get('url') or '',
+            'date_metadata_creation': self._parser_date(donnees_jeu.get('metadata_created')),
+            'date_metadata_modification': self._parser_date(donnees_jeu.get('metadata_modified'))
+        }
+    
+    def normaliser_ressource(self, ressource_data):
+        """Convertit une ressource CKAN en valeurs de champs du modèle Ressource"""
+        # Utiliser 'name' ou 'id' ou générer un nom par défaut
+        nom_ressource = ressource_data.get('name') or ressource_data.get('id') or f"Ressource-{(ressource_data.get('url') or 'inconnue')[:50]}"
+        
+        return {
+            'ckan_id': ressource_data.get('id') or None,
+            'nom': nom_ressource,
+            'format_fichier': ressource_data.get('format') or '',
+            'type_ressource': ressource_data.get('resource_type') or 'Données',
+            'url': ressource_data.get('url') or '',
+            'taille': ressource_data.get('size'),
+            'description': ressource_data.get('description') or '',
+            'methode_collecte': ressource_data.get('methodology') or '',
+            'contexte_collecte': ressource_data.get('context') or '',
+            'attributs': str(ressource_data.get('attributes', '')) if ressource_data.get('attributes') else ''
+        }
+    
     def sauvegarder_jeu_donnees(self, donnees_jeu, organisation):
         """Sauvegarde un jeu de données en base de données"""
         # Vérifier les filtres
@@ -213,34 +659,23 @@ class ServiceMoissonnage:
             return None
         
         try:
-            jeu_donnees, creee = JeuDonnees.objects.get_or_create(
-                titre=donnees_jeu['title'],
-                defaults={
-                    'description': donnees_jeu.get('notes', ''),
-                    'organisation': organisation,
-                    'categories': self._extraire_categories(donnees_jeu),
-                    'etiquettes': self._extraire_etiquettes(donnees_jeu),
-                    'niveau_acces': donnees_jeu.get('private', False) and 'Privé' or 'Ouvert',
-                    'url_originale': donnees_jeu.get('url', ''),
-                    'date_metadata_creation': self._parser_date(donnees_jeu.get('metadata_created')),
-                    'date_metadata_modification': self._parser_date(donnees_jeu.get('metadata_modified'))
-                }
-            )
+            champs = self.normaliser_jeu_donnees(donnees_jeu)
+            champs['organisation'] = organisation
+            champs['source'] = self.source
+            
+            jeu_donnees = self._trouver_par_identifiant(JeuDonnees, champs['ckan_id'], titre=champs['titre'])
             
-            if not creee:
+            if jeu_donnees is None:
+                jeu_donnees = JeuDonnees.objects.create(**champs)
+            else:
                 # Mettre à jour les données existantes
-                jeu_donnees.description = donnees_jeu.get('notes', '')
-                jeu_donnees.categories = self._extraire_categories(donnees_jeu)
-                jeu_donnees.etiquettes = self._extraire_etiquettes(donnees_jeu)
-                jeu_donnees.niveau_acces = donnees_jeu.get('private', False) and 'Privé' or 'Ouvert'
-                jeu_donnees.url_originale = donnees_jeu.get('url', '')
-                jeu_donnees.date_metadata_creation = self._parser_date(donnees_jeu.get('metadata_created'))
-                jeu_donnees.date_metadata_modification = self._parser_date(donnees_jeu.get('metadata_modified'))
+                for champ, valeur in champs.items():
+                    setattr(jeu_donnees, champ, valeur)
                 jeu_donnees.date_modification = timezone.now()
                 jeu_donnees.save()
             
-            # Créer/mettre à jour les objets Categorie à partir des catégories du jeu
-            self._synchroniser_categories(jeu_donnees)
+            # Lier les catégories et étiquettes du jeu (recomptées en fin de moissonnage)
+            self._synchroniser_categories([jeu_donnees])
             
             return jeu_donnees
             
@@ -254,34 +689,20 @@ class ServiceMoissonnage:
         
         for ressource_data in donnees_jeu.get('resources', []):
             try:
-                # Utiliser 'name' ou 'id' ou générer un nom par défaut
-                nom_ressource = ressource_data.get('name') or ressource_data.get('id') or f"Ressource-{ressource_data.get('url', 'inconnue')[:50]}"
+                champs = self.normaliser_ressource(ressource_data)
+                champs['source'] = self.source
                 
-                ressource, creee = Ressource.objects.get_or_create(
-                    nom=nom_ressource,
-                    jeu_donnees=jeu_donnees,
-                    defaults={
-                        'format_fichier': ressource_data.get('format', ''),
-                        'type_ressource': ressource_data.get('resource_type', 'Données'),
-                        'url': ressource_data.get('url', ''),
-                        'taille': ressource_data.get('size'),
-                        'description': ressource_data.get('description', ''),
-                        'methode_collecte': ressource_data.get('methodology', ''),
-                        'contexte_collecte': ressource_data.get('context', ''),
-                        'attributs': str(ressource_data.get('attributes', '')) if ressource_data.get('attributes') else ''
-                    }
+                ressource = self._trouver_par_identifiant(
+                    Ressource, champs['ckan_id'], jeu_donnees=jeu_donnees, nom=champs['nom']
                 )
                 
-                if not creee:
+                if ressource is None:
+                    Ressource.objects.create(jeu_donnees=jeu_donnees, **champs)
+                else:
                     # Mettre à jour les données existantes
-                    ressource.format_fichier = ressource_data.get('format', '')
-                    ressource.type_ressource = ressource_data.get('resource_type', 'Données')
-                    ressource.url = ressource_data.get('url', '')
-                    ressource.taille = ressource_data.get('size')
-                    ressource.description = ressource_data.get('description', '')
-                    ressource.methode_collecte = ressource_data.get('methodology', '')
-                    ressource.contexte_collecte = ressource_data.get('context', '')
-                    ressource.attributs = ressource_data.get('attributes', '')
+                    for champ, valeur in champs.items():
+                        setattr(ressource, champ, valeur)
+                    ressource.jeu_donnees = jeu_donnees
                     ressource.date_modification = timezone.now()
                     ressource.save()
                 
@@ -331,38 +752,27 @@ class ServiceMoissonnage:
         
         return '; '.join(filter(None, etiquettes))
     
-    def _synchroniser_categories(self, jeu_donnees):
-        """Crée ou met à jour les objets Categorie à partir des catégories d'un jeu de données"""
-        if not jeu_donnees.categories:
-            return
-        
-        # Séparer les catégories (séparées par ';' ou '; ')
-        categories_list = [cat.strip() for cat in jeu_donnees.categories.split(';') if cat.strip()]
-        
-        for nom_categorie in categories_list:
-            if nom_categorie:
-                # Créer ou récupérer la catégorie
-                categorie, creee = Categorie.objects.get_or_create(
-                    nom=nom_categorie,
-                    defaults={
-                        'description': f'Catégorie extraite automatiquement depuis les jeux de données',
-                        'nombre_jeux_donnees': 0
-                    }
-                )
-                
-                # Mettre à jour le compteur de jeux de données pour cette catégorie
-                if creee:
-                    # Nouvelle catégorie, compter les jeux qui l'utilisent
-                    categorie.nombre_jeux_donnees = JeuDonnees.objects.filter(
-                        categories__icontains=nom_categorie
-                    ).count()
-                    categorie.save()
-                else:
-                    # Catégorie existante, recalculer le compteur
-                    categorie.nombre_jeux_donnees = JeuDonnees.objects.filter(
-                        categories__icontains=nom_categorie
-                    ).count()
-                    categorie.save()
+    def _synchroniser_categories(self, jeux):
+        """
+        Lie les catégories et étiquettes des jeux de données écrits pendant le moissonnage
+
+        Les relations sont reconstruites par lot; les compteurs des objets Categorie
+        sont recalculés en une seule passe par finaliser_categories() en fin d'exécution.
+        """
+        with self.telemetrie.etape('liaison_categories'):
+            lier_categories_et_etiquettes(jeux)
+    
+    def finaliser_categories(self):
+        """
+        Recalcule en masse les compteurs des catégories
+
+        Returns:
+            int: Nombre de catégories mises à jour
+        """
+        # Recomptage global: il couvre aussi les catégories vidées par l'élagage ou par une
+        # tentative interrompue. Sérialisé entre les moissonnages parallèles d'un même processus
+        with self.telemetrie.etape('recomptage_categories'), verrou_ecriture(), transaction.atomic():
+            return recompter_categories()
     
     def _parser_date(self, date_string):
         """Parse une date depuis l'API CKAN"""
@@ -0,0 +1,86 @@
+"""
+Élagage des jeux de données et ressources retirés du catalogue CKAN.
+
+Après un parcours complet d'une source, les identifiants CKAN vus pendant
+l'exécution sont comparés à ceux enregistrés pour la source; les lignes
+absentes sont supprimées par lots. Un seuil de sécurité annule l'élagage
+lorsqu'une trop grande part de la source disparaîtrait d'un coup (catalogue
+tronqué, panne partielle du portail, changement d'identifiants).
+"""
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from donnees.models import JeuDonnees, Ressource
+from .ecriture import verrou_ecriture
+from .models import ArchiveJeuDonnees
+
+TAILLE_LOT_SUPPRESSION = 500
+
+
+def _absents(modele, source, vus):
+    """Clés primaires des lignes de la source dont l'identifiant CKAN n'a pas été vu"""
+    lignes = modele.objects.filter(source=source, ckan_id__isnull=False).values_list('pk', 'ckan_id')
+    total = 0
+    absents = []
+    for pk, ckan_id in lignes.iterator(chunk_size=5000):
+        total += 1
+        if ckan_id not in vus:
+            absents.append(pk)
+    return absents, total
+
+
+def _depasse_seuil(absents, total, seuil):
+    return total > 0 and len(absents) > seuil * total
+
+
+def _supprimer_par_lots(modele, pks):
+    """
+    Supprime les lignes par lots, chaque lot dans sa transaction
+
+    Returns:
+        Counter: Lignes supprimées par modèle (suppressions en cascade comprises)
+    """
+    supprimees = Counter()
+    for debut in range(0, len(pks), TAILLE_LOT_SUPPRESSION):
+        with verrou_ecriture(), transaction.atomic():
+            _, par_modele = modele.objects.filter(pk__in=pks[debut:debut + TAILLE_LOT_SUPPRESSION]).delete()
+        supprimees.update(par_modele)
+    return supprimees
+
+
+def elaguer_source(source, jeux_vus, ressources_vues, seuil=None):
+    """
+    Supprime les jeux de données et ressources de la source absents du dernier parcours
+
+    Args:
+        source: Instance de SourceDonnees parcourue intégralement
+        jeux_vus: Identifiants CKAN des jeux de données vus pendant le parcours
+        ressources_vues: Identifiants CKAN des ressources vues pendant le parcours
+        seuil: Part maximale (0-1) des lignes de la source pouvant disparaître
+               (par défaut, settings.MOISSONNAGE_SEUIL_SUPPRESSION)
+
+    Returns:
+        dict: {'jeux': n, 'ressources': n, 'annule': bool} - rien n'est supprimé si
+              le seuil est dépassé pour les jeux ou pour les ressources
+    """
+    if seuil is None:
+        seuil = getattr(settings, 'MOISSONNAGE_SEUIL_SUPPRESSION', 0.1)
+
+    jeux_absents, total_jeux = _absents(JeuDonnees, source, jeux_vus)
+    ressources_absentes, total_ressources = _absents(Ressource, source, ressources_vues)
+    if _depasse_seuil(jeux_absents, total_jeux, seuil) or _depasse_seuil(ressources_absentes, total_ressources, seuil):
+        print(
+            f"Élagage annulé pour {source.nom}: {len(jeux_absents)}/{total_jeux} jeux et "
+            f"{len(ressources_absentes)}/{total_ressources} ressources absents (seuil: {seuil:.0%})"
+        )
+        return {'jeux': 0, 'ressources': 0, 'annule': True}
+
+    # Les ressources des jeux supprimés disparaissent avec eux (suppression en cascade)
+    supprimees = _supprimer_par_lots(JeuDonnees, jeux_absents) + _supprimer_par_lots(Ressource, ressources_absentes)
+    # Les réponses archivées des jeux retirés ne doivent pas être rejouées par reprocess
+    _supprimer_par_lots(ArchiveJeuDonnees, _absents(ArchiveJeuDonnees, source, jeux_vus)[0])
+    return {
+        'jeux': supprimees[JeuDonnees._meta.label],
+        'ressources': supprimees[Ressource._meta.label],
+        'annule': False,
+    }
@@ -0,0 +1,325 @@
+"""
+Télémétrie d'un moissonnage.
+
+Telemetrie mesure, pour un ServiceMoissonnage, ce qui permet de savoir où
+passe le temps d'une exécution lente: durée des étapes (écriture des lots,
+archivage, catégories, élagage, statistiques...), appels HTTP par action
+CKAN avec l'histogramme de leurs latences et les octets reçus, requêtes SQL
+du fil d'écriture (nombre et durée par type) et lignes écrites par table
+(comptées par EcrivainLots: le nombre de lignes d'un INSERT ... RETURNING
+n'est pas connu du curseur).
+Les étapes peuvent s'imbriquer (la liaison des catégories fait partie de
+l'écriture des lots): leurs durées ne s'additionnent pas.
+
+L'instantané (instantane()) est enregistré sur MoissonnageExecution.telemetrie
+à chaque point de reprise; une reprise le recharge et cumule ses mesures.
+exposition_prometheus() rend la dernière exécution de chaque source au format
+texte de Prometheus (vue metriques).
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from django.db import connection
+
+# Bornes supérieures (secondes) des classes de l'histogramme des latences HTTP
+LIMITES_LATENCE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PERCENTILES = (50, 90, 99)
+
+TYPES_REQUETES = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+
+TYPE_CONTENU_PROMETHEUS = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogramme:
+    """Histogramme à classes fixes, cumulable d'une tentative à l'autre (format Prometheus)"""
+
+    def __init__(self, limites=LIMITES_LATENCE):
+        self.limites = tuple(limites)
+        # Une classe par borne, plus la classe +Inf
+        self.compteurs = [0] * (len(self.limites) + 1)
+        self.somme = 0.0
+        self.nombre = 0
+
+    def observer(self, valeur):
+        self.compteurs[bisect_left(self.limites, valeur)] += 1
+        self.somme += valeur
+        self.nombre += 1
+
+    def fusionner(self, autre):
+        for i, compte in enumerate(autre.compteurs):
+            self.compteurs[i] += compte
+        self.somme += autre.somme
+        self.nombre += autre.nombre
+
+    def percentile(self, p):
+        """
+        Estime un percentile par interpolation linéaire dans sa classe
+
+        Returns:
+            float ou None si l'histogramme est vide (la dernière borne si le
+            percentile tombe dans la classe +Inf)
+        """
+        if not self.nombre:
+            return None
+        rang = p / 100 * self.nombre
+        cumul = 0
+        for i, compte in enumerate(self.compteurs[:-1]):
+            if compte and cumul + compte >= rang:
+                bas = self.limites[i - 1] if i else 0.0
+                return round(bas + (self.limites[i] - bas) * (rang - cumul) / compte, 4)
+            cumul += compte
+        return self.limites[-1]
+
+    def en_dict(self):
+        return {
+            'limites': list(self.limites), 'compteurs': list(self.compteurs),
+            'somme': round(self.somme, 4), 'nombre': self.nombre,
+        }
+
+    @classmethod
+    def depuis_dict(cls, donnees):
+        """Recharge un histogramme enregistré (vide si ses bornes ont changé)"""
+        histogramme = cls()
+        if tuple(donnees.get('limites', ())) == histogramme.limites:
+            histogramme.compteurs = list(donnees['compteurs'])
+            histogramme.somme = donnees.get('somme', 0.0)
+            histogramme.nombre = donnees.get('nombre', 0)
+        return histogramme
+
+
+class Telemetrie:
+    """Mesures d'un moissonnage, partagées entre les fils de la source"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        # nom -> [durée cumulée, nombre de passages]
+        self.etapes = {}
+        # action CKAN -> {'appels', 'erreurs', 'octets', 'latence': Histogramme}
+        self.http = {}
+        # type de requête -> [nombre, durée cumulée]
+        self.requetes = {}
+        # table -> lignes insérées ou modifiées
+        self.lignes = Counter()
+
+    @contextmanager
+    def etape(self, nom):
+        """Cumule la durée du bloc sous le nom de l'étape"""
+        debut = time.monotonic()
+        try:
+            yield
+        finally:
+            duree = time.monotonic() - debut
+            with self._verrou:
+                cumul = self.etapes.setdefault(nom, [0.0, 0])
+                cumul[0] += duree
+                cumul[1] += 1
+
+    def _action(self, action):
+        return self.http.setdefault(action, {'appels': 0, 'erreurs': 0, 'octets': 0, 'latence': Histogramme()})
+
+    def appel_http(self, action, latence, octets=0, erreur=False):
+        """Enregistre une tentative d'appel CKAN (une nouvelle tentative compte comme un appel)"""
+        with self._verrou:
+            mesures = self._action(action)
+            mesures['appels'] += 1
+            mesures['erreurs'] += bool(erreur)
+            mesures['octets'] += octets
+            mesures['latence'].observer(latence)
+
+    def octets_recus(self, action, octets):
+        """Ajoute les octets d'une réponse lue en flux, après l'appel"""
+        with self._verrou:
+            self._action(action)['octets'] += octets
+
+    def lignes_ecrites(self, table, nombre):
+        with self._verrou:
+            self.lignes[table] += nombre
+
+    @contextmanager
+    def requetes_bd(self):
+        """Mesure les requêtes SQL émises par le fil courant pendant le bloc"""
+        with connection.execute_wrapper(self._mesurer_requete):
+            yield
+
+    def _mesurer_requete(self, execute, sql, params, many, context):
+        debut = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duree = time.monotonic() - debut
+            premier_mot = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+            type_requete = premier_mot if premier_mot in TYPES_REQUETES else 'AUTRE'
+            with self._verrou:
+                cumul = self.requetes.setdefault(type_requete, [0, 0.0])
+                cumul[0] += 1
+                cumul[1] += duree
+
+    def instantane(self):
+        """
+        Returns:
+            dict: {'etapes': {nom: {'duree', 'nombre'}},
+                   'http': {'appels', 'erreurs', 'octets', 'percentiles', 'actions': {action: {...}}},
+                   'bd': {type: {'requetes', 'duree'}}, 'lignes': {table: n}}
+        """
+        with self._verrou:
+            global_ = Histogramme()
+            actions = {}
+            for action, mesures in self.http.items():
+                global_.fusionner(mesures['latence'])
+                actions[action] = {
+                    'appels': mesures['appels'], 'erreurs': mesures['erreurs'], 'octets': mesures['octets'],
+                    'percentiles': _percentiles(mesures['latence']), 'latence': mesures['latence'].en_dict(),
+                }
+            return {
+                'etapes': {nom: {'duree': round(duree, 3), 'nombre': nombre} for nom, (duree, nombre) in self.etapes.items()},
+                'http': {
+                    'appels': sum(mesures['appels'] for mesures in actions.values()),
+                    'erreurs': sum(mesures['erreurs'] for mesures in actions.values()),
+                    'octets': sum(mesures['octets'] for mesures in actions.values()),
+                    'percentiles': _percentiles(global_),
+                    'actions': actions,
+                },
+                'bd': {
+                    type_requete: {'requetes': nombre, 'duree': round(duree, 3)}
+                    for type_requete, (nombre, duree) in self.requetes.items()
+                },
+                'lignes': dict(self.lignes),
+            }
+
+    def charger(self, donnees):
+        """Reprend les mesures d'un instantané (reprise d'une exécution)"""
+        with self._verrou:
+            for nom, etape in donnees.get('etapes', {}).items():
+                self.etapes[nom] = [etape['duree'], etape['nombre']]
+            for action, mesures in donnees.get('http', {}).get('actions', {}).items():
+                self.http[action] = {
+                    'appels': mesures['appels'], 'erreurs': mesures['erreurs'], 'octets': mesures['octets'],
+                    'latence': Histogramme.depuis_dict(mesures['latence']),
+                }
+            for type_requete, cumul in donnees.get('bd', {}).items():
+                self.requetes[type_requete] = [cumul['requetes'], cumul['duree']]
+            self.lignes.update(donnees.get('lignes', {}))
+
+
+def _percentiles(histogramme):
+    return {f'p{p}': histogramme.percentile(p) for p in PERCENTILES}
+
+
+class _Exposition:
+    """Familles de métriques au format texte de Prometheus (HELP et TYPE écrits une fois par famille)"""
+
+    def __init__(self):
+        self.familles = {}
+
+    def ajouter(self, nom, type_metrique, aide, valeur, **etiquettes):
+        lignes = self.familles.setdefault(nom, (type_metrique, aide, []))[2]
+        lignes.append(f'{nom}{_etiquettes(etiquettes)} {_nombre(valeur)}')
+
+    def histogramme(self, nom, aide, histogramme, **etiquettes):
+        lignes = self.familles.setdefault(nom, ('histogram', aide, []))[2]
+        cumul = 0
+        for limite, compte in zip((*histogramme.limites, '+Inf'), histogramme.compteurs):
+            cumul += compte
+            lignes.append(f'{nom}_bucket{_etiquettes({**etiquettes, "le": limite})} {cumul}')
+        lignes.append(f'{nom}_sum{_etiquettes(etiquettes)} {_nombre(histogramme.somme)}')
+        lignes.append(f'{nom}_count{_etiquettes(etiquettes)} {histogramme.nombre}')
+
+    def texte(self):
+        sortie = []
+        for nom, (type_metrique, aide, lignes) in self.familles.items():
+            sortie += [f'# HELP {nom} {aide}', f'# TYPE {nom} {type_metrique}', *lignes]
+        return '\n'.join(sortie) + '\n'
+
+
+def _etiquettes(etiquettes):
+    if not etiquettes:
+        return ''
+    return '{' + ','.join(f'{cle}="{_echapper(valeur)}"' for cle, valeur in etiquettes.items()) + '}'
+
+
+def _echapper(valeur):
+    """Échappe une valeur d'étiquette (barre oblique inverse, guillemet, saut de ligne)"""
+    return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _nombre(valeur):
+    return repr(float(valeur)) if isinstance(valeur, float) else str(valeur)
+
+
+def exposition_prometheus(executions_par_statut, dernieres_executions):
+    """
+    Rend les métriques de moissonnage au format texte de Prometheus
+
+    Les compteurs décrivent la dernière exécution de chaque source: ils
+    repartent de zéro à chaque nouvelle exécution, ce que rate() traite
+    comme une remise à zéro de compteur.
+
+    Args:
+        executions_par_statut: dict {statut: nombre d'exécutions}
+        dernieres_executions: MoissonnageExecution la plus récente de chaque source
+
+    Returns:
+        str: Corps de la réponse (TYPE_CONTENU_PROMETHEUS)
+    """
+    exposition = _Exposition()
+    for statut, nombre in sorted(executions_par_statut.items()):
+        exposition.ajouter('moissonnage_executions', 'gauge', 'Exécutions de moissonnage par statut', nombre, statut=statut)
+
+    for execution in dernieres_executions:
+        source = execution.source.nom
+        exposition.ajouter(
+            'moissonnage_derniere_execution_info', 'gauge', 'Dernière exécution de la source',
+            1, source=source, execution=execution.pk, statut=execution.statut, mode=execution.mode,
+        )
+        for bilan in ('jeux_nouveaux', 'jeux_modifies', 'jeux_inchanges', 'jeux_supprimes', 'erreurs'):
+            exposition.ajouter(
+                'moissonnage_jeux_donnees', 'gauge', 'Jeux de données de la dernière exécution, par bilan',
+                getattr(execution, bilan), source=source, bilan=bilan,
+            )
+        for phase, duree in execution.durees.items():
+            exposition.ajouter(
+                'moissonnage_phase_duree_secondes', 'gauge', 'Durée des phases de la dernière exécution',
+                duree, source=source, phase=phase,
+            )
+
+        telemetrie = execution.telemetrie or {}
+        for nom, etape in telemetrie.get('etapes', {}).items():
+            exposition.ajouter(
+                'moissonnage_etape_duree_secondes_total', 'counter', 'Durée cumulée des étapes',
+                etape['duree'], source=source, etape=nom,
+            )
+        for action, mesures in telemetrie.get('http', {}).get('actions', {}).items():
+            exposition.ajouter(
+                'moissonnage_http_requetes_total', 'counter', 'Appels HTTP à CKAN (tentatives comprises)',
+                mesures['appels'], source=source, action=action,
+            )
+            exposition.ajouter(
+                'moissonnage_http_erreurs_total', 'counter', 'Appels HTTP à CKAN en erreur',
+                mesures['erreurs'], source=source, action=action,
+            )
+            exposition.ajouter(
+                'moissonnage_http_octets_recus_total', 'counter', 'Octets reçus de CKAN',
+                mesures['octets'], source=source, action=action,
+            )
+            exposition.histogramme(
+                'moissonnage_http_latence_secondes', 'Latence des appels HTTP à CKAN',
+                Histogramme.depuis_dict(mesures['latence']), source=source, action=action,
+            )
+        for type_requete, cumul in telemetrie.get('bd', {}).items():
+            exposition.ajouter(
+                'moissonnage_bd_requetes_total', 'counter', 'Requêtes SQL du fil d\'écriture',
+                cumul['requetes'], source=source, type=type_requete,
+            )
+            exposition.ajouter(
+                'moissonnage_bd_duree_secondes_total', 'counter', 'Durée cumulée des requêtes SQL du fil d\'écriture',
+                cumul['duree'], source=source, type=type_requete,
+            )
+        for table, nombre in telemetrie.get('lignes', {}).items():
+            exposition.ajouter(
+                'moissonnage_lignes_ecrites_total', 'counter', 'Lignes insérées ou modifiées par table',
+                nombre, source=source, table=table,
+            )
+    return exposition.texte()
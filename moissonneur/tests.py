@@ -1,7 +1,42 @@
-from django.test import TestCase
-from unittest.mock import Mock, patch
-from donnees.models import Organisation, JeuDonnees, Ressource
-from moissonneur.services import ServiceMoissonnage
+from django.test import TestCase, TransactionTestCase, override_settings
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time as chrono
+from datetime import datetime, time, timedelta
+from io import StringIO
+from itertools import islice
+from unittest import skipUnless
+from unittest.mock import AsyncMock, Mock, patch
+import requests
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from donnees.models import (
+    Organisation, JeuDonnees, Ressource, Categorie, SourceDonnees,
+    ConfigurationFiltres, ConfigurationPlanification
+)
+from moissonneur.archive import decompresser
+from moissonneur.client_ckan import ClientCkan, ErreurCkan, LimiteurDebit
+from moissonneur.ecriture import EcrivainLots
+from moissonneur.faux_ckan import CatalogueSynthetique, ServeurCkanFactice
+from moissonneur.filtres import FiltresCompiles
+from moissonneur.flux_json import ErreurFluxJson, LecteurJson
+from moissonneur.execution import ExecuteurMoissonnage
+from moissonneur.importation import importer_jeux, ouvrir_dump
+from moissonneur.models import ArchiveJeuDonnees, MoissonnageExecution
+from moissonneur.pipeline import PipelineMoissonnage
+from moissonneur.planification import ExpressionCron, declencher_planifications_dues, prochaine_execution
+from moissonneur.progression import (
+    RapporteurProgression, cle_progression, demander_arret, evenements_progression,
+    instantane_execution, lire_progression
+)
+from moissonneur.services import TAILLE_PAGE_LISTE, ServiceMoissonnage, cle_tri
+from moissonneur.telemetrie import Telemetrie
 
 
 class ServiceMoissonnageTest(TestCase):
@@ -194,3 +229,1364 @@ class ServiceMoissonnageTest(TestCase):
         # Test avec None
         date_none = self.service._parser_date(None)
         self.assertIsNone(date_none)
+    
+    @staticmethod
+    def _reponse_json(contenu):
+        """Réponse HTTP simulée dont le corps est lu par blocs (iter_content)"""
+        corps = json.dumps(contenu).encode('utf-8')
+        reponse = Mock(status_code=200)
+        reponse.iter_content.side_effect = lambda taille: (corps[i:i + 7] for i in range(0, len(corps), 7))
+        return reponse
+    
+    @patch('moissonneur.services.requests.Session.get')
+    def test_iterer_pages_jeux_donnees(self, mock_get):
+        """Test du parcours paginé via package_search"""
+        self.service.source.taille_page = 2
+        pages = [
+            {'result': {'count': 3, 'results': [{'name': 'a'}, {'name': 'b'}]}},
+            {'result': {'count': 3, 'results': [{'name': 'c'}]}},
+        ]
+        mock_get.side_effect = [self._reponse_json(page) for page in pages]
+        
+        resultats = list(self.service.iterer_jeux_donnees())
+        
+        self.assertEqual([details['name'] for _, _, details in resultats], ['a', 'b', 'c'])
+        self.assertEqual(resultats[0][1], 3)
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(mock_get.call_args_list[1].kwargs['params']['start'], 2)
+        self.assertEqual(mock_get.call_args_list[1].kwargs['params']['rows'], 2)    
+    def test_reprise_apres_page_interrompue(self):
+        """Test qu'une réponse coupée en cours de page reprend au premier jeu non lu"""
+        self.service.source.taille_page = 4
+        catalogue = [{'name': f'jeu-{i}'} for i in range(6)]
+        appels = []
+        
+        def page(debut=0, taille_page=None, fq=None):
+            appels.append(debut)
+            
+            def jeux():
+                for i, jeu in enumerate(catalogue[debut:debut + 4]):
+                    if debut == 0 and i == 2:
+                        raise requests.exceptions.ChunkedEncodingError("Connexion coupée")
+                    yield jeu
+            return {'count': len(catalogue), 'results': jeux()}
+        
+        with patch.object(self.service, 'recuperer_page_jeux_donnees', side_effect=page):
+            noms = [details['name'] for _, _, details in self.service.iterer_jeux_donnees()]
+        
+        self.assertEqual(noms, [jeu['name'] for jeu in catalogue])
+        self.assertEqual(appels, [0, 2])
+        self.assertEqual(self.service.erreurs_recuperation, 0)
+    
+    def test_trouver_organisation_par_identifiant(self):
+        """Test de la résolution d'organisation par identifiant CKAN (sans recherche par titre)"""
+        details_jeu = {'organization': {'id': 'org-1', 'name': 'ville-de-montreal', 'title': 'Ville de Montréal'}}
+        
+        organisation = self.service.trouver_organisation(details_jeu)
+        
+        # L'organisation existante (sans identifiant) est adoptée
+        self.assertEqual(organisation.pk, self.organisation_test.pk)
+        self.assertEqual(organisation.ckan_id, 'org-1')
+        self.assertEqual(Organisation.objects.count(), 1)
+        
+        # Les appels suivants sont servis par le cache de l'exécution
+        with self.assertNumQueries(0):
+            self.assertEqual(self.service.trouver_organisation(details_jeu), organisation)
+    
+    def test_moissonner_jeu_donnees_organisation_incluse(self):
+        """Test de sauvegarde d'un jeu issu de package_search sans organization_show"""
+        details_jeu = {
+            'title': 'Arbres publics',
+            'notes': 'Inventaire des arbres',
+            'organization': {'name': 'ville-de-quebec', 'title': 'Ville de Québec'},
+            'resources': [{'name': 'arbres.csv', 'format': 'CSV', 'url': 'https://example.com/arbres.csv'}],
+        }
+        
+        with patch.object(self.service, 'recuperer_details_organisation') as mock_details:
+            nombre_ressources = self.service.moissonner_jeu_donnees(details_jeu)
+            mock_details.assert_not_called()
+        
+        self.assertEqual(nombre_ressources, 1)
+        self.assertEqual(JeuDonnees.objects.get(titre='Arbres publics').organisation.nom, 'Ville de Québec')
+    
+    @patch('moissonneur.services.requests.Session.get')
+    def test_iterer_jeux_donnees_incremental(self, mock_get):
+        """Test du filtre incrémental sur metadata_modified"""
+        from datetime import datetime, timezone as dt_timezone
+        self.service.source.mode_moissonnage = 'liste'
+        self.service.source.derniere_synchronisation = datetime(2024, 3, 1, 12, 0, tzinfo=dt_timezone.utc)
+        mock_get.return_value = self._reponse_json({'result': {'count': 1, 'results': [{'name': 'modifie'}]}})
+        
+        resultats = list(self.service.iterer_jeux_donnees(incremental=True))
+        
+        self.assertEqual(len(resultats), 1)
+        self.assertIn('package_search', mock_get.call_args.args[0])
+        self.assertEqual(
+            mock_get.call_args.kwargs['params']['fq'],
+            'metadata_modified:[2024-03-01T11:55:00Z TO *]'
+        )
+    
+    def test_finaliser_synchronisation(self):
+        """Test de l'avancement du filigrane de synchronisation"""
+        from django.utils import timezone
+        date_debut = timezone.now()
+        
+        self.assertTrue(self.service.finaliser_synchronisation(date_debut))
+        self.assertEqual(self.service.source.derniere_synchronisation, date_debut)
+        
+        # Le filigrane ne recule jamais
+        self.service.finaliser_synchronisation(date_debut - timedelta(days=1))
+        self.assertEqual(self.service.source.derniere_synchronisation, date_debut)
+    
+    def test_finaliser_synchronisation_incomplete(self):
+        """Test qu'un moissonnage incomplet n'avance pas le filigrane"""
+        from django.utils import timezone
+        self.service.erreurs_recuperation = 1
+        
+        self.assertFalse(self.service.finaliser_synchronisation(timezone.now()))
+        self.assertIsNone(self.service.source.derniere_synchronisation)
+    
+    def test_recuperer_en_parallele_ordre_et_limite(self):
+        """Test que les appels parallèles sont bornés et restent ordonnés"""
+        import threading
+        import time
+        self.service.concurrence = 3
+        verrou = threading.Lock()
+        etat = {'actifs': 0, 'maximum': 0}
+        
+        def recuperer(element):
+            with verrou:
+                etat['actifs'] += 1
+                etat['maximum'] = max(etat['maximum'], etat['actifs'])
+            time.sleep(0.01 * (element % 3))
+            with verrou:
+                etat['actifs'] -= 1
+            return element * 10
+        
+        resultats = list(self.service.recuperer_en_parallele(recuperer, range(12)))
+        
+        self.assertEqual(resultats, [(i, i * 10) for i in range(12)])
+        self.assertLessEqual(etat['maximum'], 3)
+        self.assertGreater(etat['maximum'], 1)
+
+
+class FiltresCompilesTest(TestCase):
+    """Tests pour les filtres compilés et leur transmission à package_search"""
+    
+    def setUp(self):
+        self.source = SourceDonnees.objects.create(
+            nom="CKAN test", url_base="https://ckan.example.com/api/3/action/", mode_moissonnage='liste'
+        )
+        self.configuration = ConfigurationFiltres.objects.create(
+            nom="Transport", source=self.source,
+            organisations_filtres="Ville de Montréal; STM",
+            categories_filtres="Transport",
+            formats_fichiers="csv; geojson",
+            date_debut=timezone.make_aware(datetime(2020, 1, 1)),
+            niveau_acces="Ouvert",
+        )
+        self.organisations = [
+            {'name': 'ville-de-montreal', 'title': 'Ville de Montréal'},
+            {'name': 'stm', 'title': 'STM'},
+            {'name': 'mtq', 'title': 'Ministère des Transports'},
+        ]
+        self.jeu = {
+            'organization': {'name': 'stm', 'title': 'STM'},
+            'groups': [{'name': 'transport', 'title': 'Transport'}],
+            'resources': [{'format': 'CSV'}],
+            'metadata_created': '2021-06-01T12:00:00.000000',
+            'private': False,
+        }
+    
+    def test_predicats(self):
+        """Test que chaque critère est évalué à partir des ensembles compilés"""
+        filtres = FiltresCompiles(self.configuration)
+        
+        self.assertTrue(filtres.accepte_jeu(self.jeu))
+        self.assertTrue(filtres.accepte_organisation('Autre titre', 'STM'))
+        variantes = [
+            {'organization': {'name': 'mtq', 'title': 'Ministère des Transports'}},
+            {'groups': [{'title': 'Santé'}]},
+            {'resources': [{'format': 'PDF'}]},
+            {'metadata_created': '2019-12-31T23:59:00'},
+            {'private': True},
+        ]
+        for variante in variantes:
+            with self.subTest(variante=variante):
+                self.assertFalse(filtres.accepte_jeu({**self.jeu, **variante}))
+        
+        self.configuration.actif = False
+        self.assertTrue(FiltresCompiles(self.configuration).accepte_jeu({'private': True}))
+    
+    def test_clause_fq(self):
+        """Test que seuls les critères résolus en noms CKAN sont transmis"""
+        filtres = FiltresCompiles(self.configuration)
+        filtres.resoudre_noms(organisations=self.organisations, groupes=[])
+        
+        self.assertEqual(
+            filtres.clause_fq(),
+            'organization:("stm" OR "ville-de-montreal") AND res_format:("CSV" OR "GEOJSON" OR "csv" OR "geojson")'
+            ' AND metadata_created:[2020-01-01T00:00:00Z TO *] AND private:false'
+        )
+        self.assertEqual(filtres.restreindre_organisations(['mtq', 'stm', 'ville-de-montreal']), ['stm', 'ville-de-montreal'])
+        
+        filtres.resoudre_noms(organisations=self.organisations, groupes=[{'name': 'transport', 'title': 'Transport'}])
+        self.assertIn('groups:("transport")', filtres.clause_fq())
+    
+    def test_liste_detaillee_portail_sans_pagination(self):
+        """Test que la liste détaillée se termine si le portail ignore offset ou limit"""
+        service = ServiceMoissonnage(source=self.source)
+        page_pleine = [{'name': f'org-{i}', 'title': f'Org {i}'} for i in range(TAILLE_PAGE_LISTE)]
+        
+        # offset ignoré: la même page revient à chaque appel
+        with patch.object(service.client, 'appeler', return_value=page_pleine) as appeler:
+            self.assertEqual(service.recuperer_liste_detaillee('organization_list'), page_pleine)
+        self.assertEqual(appeler.call_count, 2)
+        
+        # limit ignoré: la liste complète arrive au premier appel
+        liste_complete = page_pleine + [{'name': 'org-x', 'title': 'Org X'}]
+        with patch.object(service.client, 'appeler', return_value=liste_complete) as appeler:
+            self.assertEqual(service.recuperer_liste_detaillee('group_list'), liste_complete)
+        self.assertEqual(appeler.call_count, 1)
+        
+        # Pagination respectée: arrêt sur la page incomplète
+        with patch.object(service.client, 'appeler', side_effect=[page_pleine, liste_complete[-3:]]) as appeler:
+            self.assertEqual(len(service.recuperer_liste_detaillee('group_list')), TAILLE_PAGE_LISTE + 3)
+        self.assertEqual(appeler.call_args.args[1]['offset'], TAILLE_PAGE_LISTE)
+    
+    def test_recherche_filtree(self):
+        """Test qu'un moissonnage filtré passe par package_search avec la clause fq combinée"""
+        self.source.derniere_synchronisation = timezone.make_aware(datetime(2024, 1, 1))
+        service = ServiceMoissonnage(source=self.source, configuration_filtres=self.configuration)
+        listes = {'organization_list': self.organisations, 'group_list': [{'name': 'transport', 'title': 'Transport'}]}
+        
+        with patch.object(service, 'recuperer_liste_detaillee', side_effect=listes.get) as liste, \
+                patch.object(service, 'recuperer_page_jeux_donnees', return_value={'count': 1, 'results': [self.jeu]}) as page:
+            jeux = list(service.iterer_jeux_donnees(incremental=True))
+            service.clause_filtres()
+        
+        self.assertEqual(len(jeux), 1)
+        self.assertEqual(liste.call_count, 2)
+        fq = page.call_args.kwargs['fq']
+        self.assertTrue(fq.startswith('metadata_modified:[2023-12-31T23:55:00Z TO *] AND organization:'))
+        self.assertIn('groups:("transport")', fq)
+
+
+class EcrivainLotsTest(TestCase):
+    """Tests pour l'écriture en lots des jeux de données"""
+    
+    def setUp(self):
+        self.service = ServiceMoissonnage()
+        self.organisation = Organisation.objects.create(nom="Ville de Laval", type_organisation="Ville")
+    
+    def _jeu(self, titre, ressources=('donnees.csv',), notes='Description'):
+        return {
+            'id': f'id-{titre}',
+            'name': titre.lower().replace(' ', '-'),
+            'title': titre,
+            'notes': notes,
+            'groups': [{'title': 'Transport'}],
+            'resources': [
+                {'id': f'id-{titre}-{nom}', 'name': nom, 'format': 'CSV', 'url': f'https://example.com/{nom}'}
+                for nom in ressources
+            ],
+        }
+    
+    def test_ecriture_par_lots(self):
+        """Test que les jeux sont écrits quand le lot est plein puis au vidage"""
+        ecrivain = EcrivainLots(self.service, taille_lot=2)
+        
+        ecrivain.ajouter(self._jeu('Jeu A'), self.organisation)
+        self.assertEqual(JeuDonnees.objects.count(), 0)
+        ecrivain.ajouter(self._jeu('Jeu B', ressources=('b1.csv', 'b2.csv')), self.organisation)
+        self.assertEqual(JeuDonnees.objects.count(), 2)
+        ecrivain.ajouter(self._jeu('Jeu C'), self.organisation)
+        ecrivain.vider()
+        
+        self.assertEqual(JeuDonnees.objects.count(), 3)
+        self.assertEqual(Ressource.objects.count(), 4)
+        self.assertEqual(ecrivain.jeux_ecrits, 3)
+        self.assertEqual(ecrivain.ressources_ecrites, 4)
+        self.assertEqual(Ressource.objects.get(nom='b2.csv').jeu_donnees.titre, 'Jeu B')
+    
+    def test_mise_a_jour_existants(self):
+        """Test que les jeux et ressources existants sont mis à jour sans doublon"""
+        ecrivain = EcrivainLots(self.service, taille_lot=10)
+        ecrivain.ajouter(self._jeu('Jeu A'), self.organisation)
+        ecrivain.vider()
+        
+        ecrivain.ajouter(self._jeu('Jeu A', ressources=('donnees.csv', 'nouveau.csv'), notes='Modifiée'), self.organisation)
+        ecrivain.vider()
+        
+        self.assertEqual(JeuDonnees.objects.count(), 1)
+        self.assertEqual(JeuDonnees.objects.get().description, 'Modifiée')
+        self.assertEqual(Ressource.objects.count(), 2)
+    
+    def test_jeux_inchanges_non_reecrits(self):
+        """Test qu'un jeu dont l'empreinte n'a pas changé n'est ni réécrit ni relié de nouveau"""
+        ecrivain = EcrivainLots(self.service, taille_lot=10)
+        for titre in ('Jeu A', 'Jeu B'):
+            ecrivain.ajouter(self._jeu(titre, ressources=('r1.csv', 'r2.csv')), self.organisation)
+        ecrivain.vider()
+        date_modification = JeuDonnees.objects.get(ckan_id='id-Jeu A').date_modification
+        
+        ecrivain = EcrivainLots(self.service, taille_lot=10)
+        ecrivain.ajouter(self._jeu('Jeu A', ressources=('r1.csv', 'r2.csv')), self.organisation)
+        modifie = self._jeu('Jeu B', ressources=('r1.csv', 'r2.csv'))
+        modifie['resources'][1]['format'] = 'JSON'
+        ecrivain.ajouter(modifie, self.organisation)
+        ecrivain.ajouter(self._jeu('Jeu C'), self.organisation)
+        with CaptureQueriesContext(connection) as requetes:
+            ecrivain.vider()
+        
+        self.assertEqual((ecrivain.nouveaux, ecrivain.modifies, ecrivain.inchanges), (1, 1, 1))
+        self.assertEqual((ecrivain.jeux_ecrits, ecrivain.ressources_ecrites), (2, 2))
+        self.assertEqual(JeuDonnees.objects.get(ckan_id='id-Jeu A').date_modification, date_modification)
+        self.assertEqual(Ressource.objects.get(ckan_id='id-Jeu B-r2.csv').format_fichier, 'JSON')
+        
+        # Un catalogue stable ne produit plus aucune écriture
+        ecrivain = EcrivainLots(self.service, taille_lot=10)
+        for titre in ('Jeu A', 'Jeu C'):
+            ecrivain.ajouter(self._jeu(titre, ressources=('r1.csv', 'r2.csv') if titre == 'Jeu A' else ('donnees.csv',)), self.organisation)
+        with CaptureQueriesContext(connection) as requetes:
+            ecrivain.vider()
+        self.assertEqual(ecrivain.inchanges, 2)
+        self.assertFalse([requete for requete in requetes if requete['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))])
+    
+    def test_reprise_unitaire_conserve_les_empreintes(self):
+        """Test qu'un lot écrit par le chemin de repli est reconnu inchangé au moissonnage suivant"""
+        sans_identifiant = self._jeu('Jeu B')
+        del sans_identifiant['id']
+        ecrivain = EcrivainLots(self.service, taille_lot=10)
+        ecrivain.ajouter(self._jeu('Jeu A', ressources=('r1.csv', 'r2.csv')), self.organisation)
+        ecrivain.ajouter(sans_identifiant, self.organisation)
+        with patch.object(EcrivainLots, '_ecrire_lot', side_effect=RuntimeError("Lot invalide")):
+            ecrivain.vider()
+        
+        self.assertEqual((ecrivain.nouveaux, ecrivain.modifies, ecrivain.jeux_ecrits), (2, 0, 2))
+        self.assertFalse(JeuDonnees.objects.filter(empreinte='').exists())
+        self.assertFalse(Ressource.objects.filter(empreinte='').exists())
+        
+        # Remoissonnage par lots puis de nouveau par le chemin de repli: rien n'est réécrit
+        ecrivain = EcrivainLots(self.service, taille_lot=10)
+        ecrivain.ajouter(self._jeu('Jeu A', ressources=('r1.csv', 'r2.csv')), self.organisation)
+        ecrivain.ajouter(sans_identifiant, self.organisation)
+        ecrivain.vider()
+        self.assertEqual((ecrivain.inchanges, ecrivain.jeux_ecrits), (2, 0))
+        
+        ecrivain = EcrivainLots(self.service, taille_lot=10)
+        ecrivain.ajouter(self._jeu('Jeu A', ressources=('r1.csv', 'r2.csv')), self.organisation)
+        with patch.object(EcrivainLots, '_ecrire_lot', side_effect=RuntimeError("Lot invalide")):
+            ecrivain.vider()
+        self.assertEqual((ecrivain.inchanges, ecrivain.jeux_ecrits), (1, 0))
+    
+    def test_renommage_conserve_la_ligne(self):
+        """Test qu'un jeu renommé en amont est mis à jour grâce à son identifiant CKAN"""
+        ecrivain = EcrivainLots(self.service, taille_lot=10)
+        ecrivain.ajouter(self._jeu('Jeu A'), self.organisation)
+        ecrivain.vider()
+        
+        renomme = self._jeu('Jeu A')
+        renomme['title'] = 'Jeu A (révisé)'
+        ecrivain.ajouter(renomme, self.organisation)
+        ecrivain.vider()
+        
+        self.assertEqual(JeuDonnees.objects.count(), 1)
+        self.assertEqual(JeuDonnees.objects.get().titre, 'Jeu A (révisé)')
+        self.assertEqual(Ressource.objects.count(), 1)
+    
+    def test_adoption_des_lignes_historiques(self):
+        """Test que les lignes sans identifiant CKAN sont adoptées plutôt que dupliquées"""
+        ancien = JeuDonnees.objects.create(
+            titre='Jeu A', description='Ancienne', organisation=self.organisation, categories=''
+        )
+        Ressource.objects.create(nom='donnees.csv', jeu_donnees=ancien, url='https://example.com/donnees.csv')
+        
+        ecrivain = EcrivainLots(self.service, taille_lot=10)
+        ecrivain.ajouter(self._jeu('Jeu A'), self.organisation)
+        ecrivain.vider()
+        
+        self.assertEqual(JeuDonnees.objects.count(), 1)
+        jeu = JeuDonnees.objects.get()
+        self.assertEqual(jeu.pk, ancien.pk)
+        self.assertEqual(jeu.ckan_id, 'id-Jeu A')
+        self.assertEqual(jeu.source, self.service.source)
+        self.assertEqual(Ressource.objects.get().ckan_id, 'id-Jeu A-donnees.csv')
+    
+    def test_nombre_requetes_independant_du_lot(self):
+        """Test que le coût d'écriture d'un lot ne dépend pas du nombre de jeux"""
+        def requetes_pour(nombre_jeux, prefixe):
+            ecrivain = EcrivainLots(self.service, taille_lot=100)
+            for i in range(nombre_jeux):
+                ecrivain.ajouter(self._jeu(f'{prefixe} {i}', ressources=('a.csv', 'b.csv')), self.organisation)
+            with CaptureQueriesContext(connection) as requetes:
+                ecrivain.vider()
+            return len(requetes)
+        
+        # Un premier lot crée les catégories partagées par tous les jeux
+        requetes_pour(1, 'Amorce')
+        self.assertEqual(requetes_pour(3, 'Petit'), requetes_pour(30, 'Grand'))
+    
+    def test_categories_recomptees_en_fin_de_moissonnage(self):
+        """Test que les catégories sont créées et comptées en une passe finale"""
+        ecrivain = EcrivainLots(self.service, taille_lot=10)
+        ecrivain.ajouter(self._jeu('Jeu A'), self.organisation)
+        ecrivain.ajouter(self._jeu('Jeu B'), self.organisation)
+        ecrivain.vider()
+        
+        # Relations écrites avec le lot, compteurs recalculés à la fin
+        self.assertEqual(Categorie.objects.get(nom='Transport').jeux_donnees.count(), 2)
+        self.assertEqual(Categorie.objects.get(nom='Transport').nombre_jeux_donnees, 0)
+        
+        self.service.finaliser_categories()
+        
+        self.assertEqual(Categorie.objects.get(nom='Transport').nombre_jeux_donnees, 2)
+
+
+class PipelineMoissonnageTest(TestCase):
+    """Tests pour le pipeline récupération → normalisation → écriture"""
+    
+    def setUp(self):
+        self.source = SourceDonnees.objects.create(nom="CKAN test", url_base="https://ckan.example.com/api/3/action/")
+        self.service = ServiceMoissonnage(source=self.source)
+        self.ecrivain = EcrivainLots(self.service, taille_lot=3)
+        self.produits = 0
+        self.ferme = False
+    
+    def _jeux(self, nombre, panne_a=None):
+        try:
+            for i in range(nombre):
+                if i == panne_a:
+                    raise RuntimeError("Connexion perdue")
+                self.produits += 1
+                details = {
+                    'id': f'id-{i}', 'name': f'jeu-{i}', 'title': f'Jeu {i}',
+                    'organization': {'id': 'org-1', 'name': 'ville', 'title': 'Ville'},
+                    'resources': [{'id': f'res-{i}', 'name': f'{i}.csv', 'format': 'CSV'}],
+                }
+                yield i, nombre, details if i != 2 else None
+        finally:
+            self.ferme = True
+    
+    def test_ordre_et_statistiques(self):
+        """Test que les jeux sortent dans l'ordre du parcours, mis en lot, avec les mesures par étape"""
+        pipeline = PipelineMoissonnage(self.service, self.ecrivain, taille_file=2)
+        
+        resultats = [(idx, nombre) for idx, _, _, nombre in pipeline.executer(self._jeux(7))]
+        self.ecrivain.vider()
+        
+        self.assertEqual(resultats, [(0, 1), (1, 1), (2, None), (3, 1), (4, 1), (5, 1), (6, 1)])
+        self.assertEqual(JeuDonnees.objects.filter(source=self.source).count(), 6)
+        statistiques = pipeline.statistiques()
+        self.assertEqual([statistiques['etapes'][etape]['elements'] for etape in PipelineMoissonnage.ETAPES], [7, 7, 7])
+        self.assertLessEqual(statistiques['files']['jeux_recuperes']['profondeur_max'], 2)
+        self.assertTrue(self.ferme)
+    
+    def test_contre_pression(self):
+        """Test que la récupération s'arrête lorsque les files sont pleines"""
+        pipeline = PipelineMoissonnage(self.service, self.ecrivain, taille_file=2)
+        jeux = pipeline.executer(self._jeux(100))
+        
+        next(jeux)
+        chrono.sleep(0.3)
+        # Deux files de deux éléments, un élément en main par étape amont et celui en cours d'écriture
+        self.assertLessEqual(self.produits, 8)
+        self.assertGreater(pipeline.etapes['recuperation'].attente_aval, 0)
+        
+        jeux.close()
+        self.assertTrue(self.ferme)
+        self.assertFalse(any(fil.is_alive() for fil in pipeline._fils))
+    
+    def test_erreur_de_recuperation(self):
+        """Test qu'une erreur de récupération est levée après les jeux déjà récupérés"""
+        pipeline = PipelineMoissonnage(self.service, self.ecrivain)
+        traites = []
+        
+        with self.assertRaisesMessage(RuntimeError, "Connexion perdue"):
+            for idx, _, _, _ in pipeline.executer(self._jeux(5, panne_a=4)):
+                traites.append(idx)
+        
+        self.assertEqual(traites, [0, 1, 2, 3])
+
+
+@override_settings(MOISSONNAGE_TAILLE_LOT=2)
+class ExecuteurMoissonnageTest(TestCase):
+    """Tests pour l'exécution avec points de reprise"""
+    
+    def setUp(self):
+        cache.clear()
+        self.source = SourceDonnees.objects.create(
+            nom="CKAN test", url_base="https://ckan.example.com/api/3/action/",
+            taille_page=2, concurrence_max=1
+        )
+        self.catalogue = [
+            {
+                'id': f'id-{i}', 'name': f'jeu-{i}', 'title': f'Jeu {i}', 'notes': '',
+                'organization': {'id': 'org-1', 'name': 'ville', 'title': 'Ville'},
+                'resources': [{'id': f'res-{i}', 'name': f'{i}.csv', 'format': 'CSV', 'url': f'https://example.com/{i}.csv'}],
+            }
+            for i in range(5)
+        ]
+        self.debuts_demandes = []
+        self.panne_a = None
+    
+    def _page(self, debut=0, taille_page=None, fq=None):
+        self.debuts_demandes.append(debut)
+        if debut == self.panne_a:
+            raise RuntimeError("Connexion perdue")
+        return {'count': len(self.catalogue), 'results': self.catalogue[debut:debut + 2]}
+    
+    def _executer(self, execution):
+        service = ServiceMoissonnage(source=self.source)
+        with patch.object(service, 'recuperer_organisations', return_value=[]), \
+                patch.object(service, 'recuperer_page_jeux_donnees', side_effect=self._page):
+            return ExecuteurMoissonnage(execution, service).executer()
+    
+    def test_execution_complete(self):
+        """Test d'une exécution complète"""
+        execution = self._executer(MoissonnageExecution.objects.create(source=self.source))
+        
+        self.assertEqual(execution.statut, 'terminee')
+        self.assertEqual(execution.phase, 'finalisation')
+        self.assertEqual((execution.jeux_donnees, execution.ressources), (5, 5))
+        self.assertEqual(JeuDonnees.objects.count(), 5)
+        self.assertIn('jeux_donnees', execution.durees)
+        self.assertEqual(execution.pipeline['etapes']['ecriture']['elements'], 5)
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.derniere_synchronisation, execution.date_debut)
+    
+    def test_bilan_des_empreintes(self):
+        """Test que l'exécution rapporte les jeux nouveaux, modifiés et inchangés"""
+        self._executer(MoissonnageExecution.objects.create(source=self.source))
+        self.catalogue[0]['notes'] = 'Révisé'
+        
+        execution = self._executer(MoissonnageExecution.objects.create(source=self.source))
+        
+        self.assertEqual((execution.jeux_nouveaux, execution.jeux_modifies, execution.jeux_inchanges), (0, 1, 4))
+        self.assertIn('4 inchangés', execution.message)
+    
+    def test_elagage_des_jeux_retires(self):
+        """Test qu'un parcours complet supprime les jeux et ressources retirés en amont"""
+        self._executer(MoissonnageExecution.objects.create(source=self.source))
+        del self.catalogue[3]
+        self.catalogue[0] = {**self.catalogue[0], 'resources': []}
+        
+        with override_settings(MOISSONNAGE_SEUIL_SUPPRESSION=0.5):
+            execution = self._executer(MoissonnageExecution.objects.create(source=self.source))
+        
+        self.assertEqual((execution.jeux_supprimes, execution.ressources_supprimees), (1, 2))
+        self.assertFalse(JeuDonnees.objects.filter(ckan_id='id-3').exists())
+        self.assertEqual(Ressource.objects.count(), 3)
+        self.assertFalse(ArchiveJeuDonnees.objects.filter(ckan_id='id-3').exists())
+        self.assertEqual(ArchiveJeuDonnees.objects.filter(source=self.source).count(), 4)
+        self.assertIn('Supprimés: 1 jeux', execution.message)
+    
+    def test_elagage_annule_au_dela_du_seuil(self):
+        """Test que l'élagage est annulé si trop de lignes disparaîtraient, et ignoré en incrémental"""
+        self._executer(MoissonnageExecution.objects.create(source=self.source))
+        del self.catalogue[1:]
+        
+        execution = self._executer(MoissonnageExecution.objects.create(source=self.source))
+        self.assertEqual(execution.statut, 'terminee')
+        self.assertEqual(execution.jeux_supprimes, 0)
+        self.assertIn('Élagage annulé', execution.message)
+        
+        with override_settings(MOISSONNAGE_SEUIL_SUPPRESSION=1):
+            execution = self._executer(MoissonnageExecution.objects.create(source=self.source, mode='incremental'))
+        self.assertEqual(execution.jeux_supprimes, 0)
+        self.assertEqual(JeuDonnees.objects.count(), 5)
+    
+    def test_reprise_apres_interruption(self):
+        """Test qu'une exécution échouée reprend à son dernier point de reprise"""
+        self.panne_a = 4
+        execution = self._executer(MoissonnageExecution.objects.create(source=self.source))
+        
+        self.assertEqual(execution.statut, 'echouee')
+        self.assertEqual((execution.phase, execution.curseur, execution.jeux_donnees), ('jeux_donnees', 4, 4))
+        self.assertIn('Connexion perdue', execution.derniere_erreur)
+        date_debut = execution.date_debut
+        
+        self.panne_a = None
+        self.debuts_demandes = []
+        reprise = MoissonnageExecution.mettre_en_file(self.source)
+        self.assertEqual(reprise.pk, execution.pk)
+        reprise = self._executer(reprise)
+        
+        self.assertEqual(reprise.statut, 'terminee')
+        self.assertEqual(self.debuts_demandes, [4])
+        self.assertEqual((reprise.jeux_donnees, reprise.nombre_reprises), (5, 1))
+        self.assertEqual(reprise.date_debut, date_debut)
+        self.assertEqual(JeuDonnees.objects.count(), 5)
+    
+    def test_arret_demande(self):
+        """Test qu'un arrêt demandé laisse une exécution reprenable"""
+        execution = MoissonnageExecution.objects.create(source=self.source, arret_demande=True)
+        execution = self._executer(execution)
+        
+        self.assertEqual(execution.statut, 'arretee')
+        reprise = MoissonnageExecution.mettre_en_file(self.source)
+        self.assertEqual(reprise.pk, execution.pk)
+        self.assertEqual(self._executer(reprise).statut, 'terminee')
+    
+    def test_arret_ferme_le_pipeline(self):
+        """Test qu'un arrêt en cours de parcours arrête les fils du pipeline avant la publication"""
+        self.catalogue *= 40
+        
+        def page_lente(debut=0, taille_page=None, fq=None):
+            chrono.sleep(0.01)
+            return self._page(debut, taille_page, fq)
+        
+        execution = MoissonnageExecution.objects.create(source=self.source)
+        service = ServiceMoissonnage(source=self.source)
+        executeur = ExecuteurMoissonnage(execution, service)
+        fils_actifs = []
+        publier = ExecuteurMoissonnage._publier
+        
+        def publier_apres_arret(executeur):
+            fils_actifs.extend(fil for fil in executeur.pipeline._fils if fil.is_alive())
+            publier(executeur)
+        
+        with patch.object(service, 'recuperer_organisations', return_value=[]), \
+                patch.object(service, 'recuperer_page_jeux_donnees', side_effect=page_lente), \
+                patch.object(executeur.rapporteur, 'signaler', return_value=True), \
+                patch.object(ExecuteurMoissonnage, '_publier', autospec=True, side_effect=publier_apres_arret):
+            execution = executeur.executer()
+        
+        self.assertEqual(execution.statut, 'arretee')
+        self.assertEqual(fils_actifs, [])
+        self.assertLess(len(self.debuts_demandes), 100)
+    
+    def test_mettre_en_file(self):
+        """Test qu'un double déclenchement retourne l'exécution active"""
+        execution = MoissonnageExecution.mettre_en_file(self.source)
+        
+        self.assertEqual(execution.statut, 'en_attente')
+        self.assertEqual(MoissonnageExecution.mettre_en_file(self.source, 'incremental').pk, execution.pk)
+        self.assertEqual(MoissonnageExecution.objects.count(), 1)
+    
+    def test_execution_interrompue_remise_en_file(self):
+        """Test qu'une exécution sans point de reprise récent est remise en file"""
+        interrompue = MoissonnageExecution.objects.create(source=self.source, statut='en_cours')
+        MoissonnageExecution.objects.filter(pk=interrompue.pk).update(
+            date_modification=timezone.now() - timedelta(hours=1)
+        )
+        
+        execution = MoissonnageExecution.mettre_en_file(self.source)
+        
+        self.assertEqual(execution.pk, interrompue.pk)
+        self.assertEqual(execution.statut, 'en_attente')
+    
+    def test_reserver_suivante(self):
+        """Test qu'une exécution en attente n'est réservée qu'une fois"""
+        execution = MoissonnageExecution.mettre_en_file(self.source)
+        
+        reservee = MoissonnageExecution.reserver_suivante('hote:1')
+        
+        self.assertEqual(reservee.pk, execution.pk)
+        self.assertEqual(reservee.statut, 'en_cours')
+        self.assertIsNone(MoissonnageExecution.reserver_suivante('hote:2'))
+    
+    def test_vue_met_en_file_sans_executer(self):
+        """Test que la vue web ne fait que mettre en file"""
+        with patch.object(ServiceMoissonnage, 'source_par_defaut', return_value=self.source):
+            premiere = self.client.post('/moissonnage/ajax/complet/', '{}', content_type='application/json').json()
+            seconde = self.client.post('/moissonnage/ajax/complet/', '{}', content_type='application/json').json()
+        
+        self.assertEqual(premiere['execution'], seconde['execution'])
+        self.assertEqual(premiere['statut'], 'en_attente')
+        self.assertFalse(JeuDonnees.objects.exists())
+    
+    def test_statut_lu_depuis_la_progression_publiee(self):
+        """Test que le statut suit la progression publiée par l'exécution"""
+        execution = MoissonnageExecution.mettre_en_file(self.source)
+        session = self.client.session
+        session['moissonnage_execution'] = execution.pk
+        session.save()
+        self._executer(execution)
+        
+        statut = self.client.get('/moissonnage/ajax/statut/').json()
+        
+        self.assertEqual((statut['statut'], statut['en_cours'], statut['jeux']), ('terminee', False, 5))
+
+
+@override_settings(MOISSONNAGE_TAILLE_LOT=2)
+class CoordinateurMoissonnageTest(TransactionTestCase):
+    """Tests pour le moissonnage parallèle de plusieurs sources (fils et connexions distincts)"""
+    
+    def setUp(self):
+        cache.clear()
+        self.sources = [
+            SourceDonnees.objects.create(
+                nom=nom, url_base=f"https://{nom.lower()}.example.com/api/3/action/", taille_page=2, concurrence_max=1
+            )
+            for nom in ("Ville", "Region", "Panne")
+        ]
+        self.fils = set()
+        self.barriere = None
+    
+    def _page(self, service, debut=0, taille_page=None, fq=None):
+        self.fils.add(threading.current_thread().name)
+        if self.barriere and debut == 0:
+            self.barriere.wait()
+        nom = service.source.nom
+        if nom == "Panne":
+            raise RuntimeError("Portail indisponible")
+        catalogue = [
+            {
+                'id': f'{nom}-{i}', 'name': f'{nom}-{i}', 'title': f'{nom} {i}', 'notes': '',
+                'organization': {'id': f'org-{nom}', 'name': nom.lower(), 'title': nom},
+                'resources': [{'id': f'{nom}-res-{i}', 'name': f'{i}.csv', 'format': 'CSV', 'url': f'https://example.com/{i}.csv'}],
+            }
+            for i in range(5)
+        ]
+        return {'count': len(catalogue), 'results': catalogue[debut:debut + 2]}
+    
+    def _harvest_worker(self, *arguments):
+        sortie = StringIO()
+        with patch.object(ServiceMoissonnage, 'recuperer_organisations', return_value=[]), \
+                patch.object(ServiceMoissonnage, 'recuperer_page_jeux_donnees', autospec=True, side_effect=self._page):
+            call_command('harvest_worker', '--une-fois', *arguments, stdout=sortie)
+        return sortie.getvalue()
+    
+    def test_harvest_worker(self):
+        """Test que le travailleur exécute la file puis s'arrête avec --une-fois"""
+        execution = MoissonnageExecution.mettre_en_file(self.sources[0])
+        
+        self._harvest_worker()
+        
+        execution.refresh_from_db()
+        self.assertEqual(execution.statut, 'terminee')
+        self.assertTrue(execution.travailleur)
+        self.assertEqual(JeuDonnees.objects.count(), 5)
+    
+    @skipUnless(connection.vendor == 'postgresql', "Le moissonnage parallèle requiert PostgreSQL")
+    def test_toutes_sources_en_parallele(self):
+        """Test que chaque source active est moissonnée dans son fil, la panne d'une source restant isolée"""
+        # Chaque source attend les deux autres à sa première page: les trois sont moissonnées en même temps
+        self.barriere = threading.Barrier(3, timeout=5)
+        sortie = self._harvest_worker('--toutes-sources', '--paralleles', '3')
+        
+        statuts = dict(MoissonnageExecution.objects.values_list('source__nom', 'statut'))
+        self.assertEqual(statuts, {'Ville': 'terminee', 'Region': 'terminee', 'Panne': 'echouee'})
+        self.assertEqual(len(self.fils), 3)
+        self.assertEqual(JeuDonnees.objects.filter(source=self.sources[0]).count(), 5)
+        self.assertEqual(JeuDonnees.objects.filter(source=self.sources[1]).count(), 5)
+        self.assertIn('Portail indisponible', sortie)
+    
+    @skipUnless(connection.vendor == 'sqlite', "Repli propre à SQLite")
+    def test_une_source_a_la_fois_sur_sqlite(self):
+        """Test que SQLite, à écrivain unique, moissonne les sources l'une après l'autre"""
+        sortie = self._harvest_worker('--toutes-sources', '--paralleles', '3')
+        
+        self.assertIn('(1 source(s) en parallèle)', sortie)
+        statuts = dict(MoissonnageExecution.objects.values_list('source__nom', 'statut'))
+        self.assertEqual(statuts, {'Ville': 'terminee', 'Region': 'terminee', 'Panne': 'echouee'})
+        self.assertEqual(JeuDonnees.objects.count(), 10)
+
+
+class ServeurCkanFacticeTest(TestCase):
+    """Tests de bout en bout contre le serveur CKAN factice"""
+    
+    def setUp(self):
+        cache.clear()
+    
+    def test_moissonnage_modes_recherche_et_liste(self):
+        """Test qu'un moissonnage réel via HTTP récupère tout le catalogue synthétique"""
+        catalogue = CatalogueSynthetique(organisations=3, jeux=25, ressources_par_jeu=2)
+        with ServeurCkanFactice(catalogue) as serveur:
+            for mode in ('recherche', 'liste'):
+                with self.subTest(mode=mode):
+                    source = SourceDonnees.objects.create(
+                        nom=f"Factice {mode}", url_base=serveur.url_base, mode_moissonnage=mode, taille_page=10
+                    )
+                    execution = ExecuteurMoissonnage(MoissonnageExecution.objects.create(source=source)).executer()
+                    
+                    self.assertEqual(execution.statut, 'terminee')
+                    self.assertEqual((execution.organisations, execution.jeux_donnees), (3, 25))
+                    self.assertEqual(Ressource.objects.filter(source=source).count(), 50)
+        
+        # Trois pages en mode recherche, plus le décompte du mode liste
+        self.assertEqual(serveur.appels['package_search'], 4)
+        self.assertEqual(serveur.appels['package_show'], 25)    
+    def test_reprise_par_cle_apres_modifications_en_amont(self):
+        """Test qu'une reprise suit la clé du dernier jeu traité malgré les jeux modifiés en amont"""
+        catalogue = CatalogueSynthetique(organisations=2, jeux=25, ressources_par_jeu=1)
+        with ServeurCkanFactice(catalogue) as serveur:
+            source = SourceDonnees.objects.create(nom="Reprise", url_base=serveur.url_base, taille_page=10)
+            premiers = list(islice(ServiceMoissonnage(source=source).iterer_jeux_donnees(), 10))
+            cle = cle_tri(premiers[-1][2])
+            self.assertEqual(cle, ['2020-01-01T00:09:00', 'jeu-donnees-9'])
+            
+            # Un jeu déjà traité passe en fin de tri: une reprise par start=10 sauterait jeu-donnees-10
+            catalogue.jeu('jeu-donnees-2')['metadata_modified'] = '2020-01-02T00:00:00'
+            execution = MoissonnageExecution.objects.create(
+                source=source, phase='jeux_donnees', curseur=10, cle_reprise=cle
+            )
+            execution = ExecuteurMoissonnage(execution).executer()
+        
+        self.assertEqual(execution.statut, 'terminee')
+        self.assertEqual(
+            set(JeuDonnees.objects.values_list('ckan_name', flat=True)),
+            {f'jeu-donnees-{i}' for i in [2, *range(10, 25)]}
+        )
+        self.assertEqual((execution.jeux_donnees, execution.total_jeux_donnees), (16, 26))
+    
+    @patch('moissonneur.services.TAILLE_PAGE_LISTE', 10)
+    def test_mode_liste_par_pages(self):
+        """Test que package_list est parcouru par pages, depuis la position de reprise"""
+        with ServeurCkanFactice(CatalogueSynthetique(organisations=2, jeux=25)) as serveur:
+            source = SourceDonnees.objects.create(
+                nom="Liste", url_base=serveur.url_base, mode_moissonnage='liste', concurrence_max=2
+            )
+            service = ServiceMoissonnage(source=source)
+            
+            resultats = list(service.iterer_jeux_donnees(debut=5))
+        
+        self.assertEqual([details['name'] for _, _, details in resultats], [f'jeu-donnees-{i}' for i in range(5, 25)])
+        self.assertEqual({total for _, total, _ in resultats}, {25})
+        # Deux pages pleines, puis une page vide qui termine le parcours
+        self.assertEqual(serveur.appels['package_list'], 3)
+    
+    def test_commande_benchmark(self):
+        """Test que le banc d'essai rapporte ses mesures et annule ses écritures"""
+        sortie = StringIO()
+        
+        call_command(
+            'benchmark_moissonnage', '--jeux', '30', '--organisations', '2', '--taille-page', '10',
+            '--passes', '2', '--json', stdout=sortie
+        )
+        
+        premiere, seconde = json.loads(sortie.getvalue())
+        self.assertEqual((premiere['statut'], premiere['nouveaux']), ('terminee', 30))
+        self.assertEqual(seconde['inchanges'], 30)
+        self.assertEqual(premiere['appels_par_action']['package_search'], 3)
+        self.assertGreater(premiere['requetes_sql'], seconde['requetes_sql'])
+        self.assertGreater(premiere['pic_memoire_mo'], 0)
+        self.assertFalse(SourceDonnees.objects.exists())
+        self.assertFalse(JeuDonnees.objects.exists())
+
+class ImportDumpTest(TestCase):
+    """Tests pour l'import hors ligne d'un dump CKAN (JSON lines)"""
+    
+    def setUp(self):
+        cache.clear()
+        self.source = SourceDonnees.objects.create(nom="Dump", url_base="https://ckan.example.com/api/3/action/")
+        self.catalogue = CatalogueSynthetique(organisations=2, jeux=12, ressources_par_jeu=2)
+        self.repertoire = tempfile.TemporaryDirectory()
+        self.addCleanup(self.repertoire.cleanup)
+    
+    def _ecrire_dump(self, nom, ouvrir=open):
+        chemin = os.path.join(self.repertoire.name, nom)
+        with ouvrir(chemin, 'wt', encoding='utf-8') as fichier:
+            for jeu in self.catalogue.jeux:
+                fichier.write(json.dumps(jeu) + '\n')
+            fichier.write('{"tronque": \n\n')
+        return chemin
+    
+    def _importer(self, chemin, *arguments):
+        sortie = StringIO()
+        with patch('moissonneur.client_ckan.ClientCkan.appeler', side_effect=AssertionError("appel réseau")):
+            call_command('import_ckan_dump', chemin, '--source', 'Dump', *arguments, stdout=sortie)
+        return sortie.getvalue()
+    
+    def test_import_gzip_puis_reimport(self):
+        """Test de l'import d'un dump gzip, sans appel réseau, puis d'un réimport sans réécriture"""
+        chemin = self._ecrire_dump('jeux.jsonl.gz', gzip.open)
+        
+        sortie = self._importer(chemin, '--taille-lot', '5')
+        
+        self.assertEqual(JeuDonnees.objects.filter(source=self.source).count(), 12)
+        self.assertEqual(Ressource.objects.filter(source=self.source).count(), 24)
+        self.assertEqual(Organisation.objects.filter(source=self.source).count(), 2)
+        self.assertIn('12 jeux de données, 24 ressources, 1 ignorés', sortie)
+        self.assertIn('lignes/s', sortie)
+        
+        sortie = self._importer(self._ecrire_dump('jeux.jsonl'))
+        self.assertIn('0 nouveaux, 0 modifiés, 12 inchangés', sortie)
+    
+    def test_fermeture_du_dump_gzip(self):
+        """Test que fermer un dump gzip ferme aussi le fichier ouvert sur le disque"""
+        dump = ouvrir_dump(self._ecrire_dump('jeux.jsonl.gz', gzip.open))
+        brut = dump.fileobj
+        
+        self.assertEqual(json.loads(dump.readline())['id'], self.catalogue.jeux[0]['id'])
+        dump.close()
+        self.assertTrue(brut.closed)
+    
+    def test_import_filtre(self):
+        """Test que les filtres configurés s'appliquent aux jeux du dump"""
+        filtres = ConfigurationFiltres.objects.create(
+            nom="Ville", source=self.source, organisations_filtres='Ville de Test 0'
+        )
+        
+        self._importer(self._ecrire_dump('jeux.jsonl'), '--filtres', str(filtres.pk))
+        
+        self.assertEqual(JeuDonnees.objects.filter(source=self.source).count(), 6)
+        self.assertEqual(set(Organisation.objects.values_list('nom', flat=True)), {'Ville de Test 0'})
+    
+    def test_source_introuvable(self):
+        """Test qu'une source inconnue est signalée"""
+        with self.assertRaisesMessage(CommandError, 'Source de données introuvable'):
+            call_command('import_ckan_dump', self._ecrire_dump('jeux.jsonl'), '--source', 'Inconnue', stdout=StringIO())
+
+class ArchiveBruteTest(TransactionTestCase):
+    """Tests pour l'archive des réponses CKAN brutes et leur retraitement (reprocess)"""
+    
+    def setUp(self):
+        cache.clear()
+        self.source = SourceDonnees.objects.create(nom="Archive", url_base="https://ckan.example.com/api/3/action/")
+        self.catalogue = CatalogueSynthetique(organisations=2, jeux=8, ressources_par_jeu=2)
+    
+    def test_archivage_seulement_si_modifie(self):
+        """Test que chaque jeu est archivé compressé, puis réarchivé seulement si sa réponse change"""
+        service = ServiceMoissonnage(source=self.source)
+        importer_jeux(service, self.catalogue.jeux, taille_lot=3)
+        
+        archive = ArchiveJeuDonnees.objects.get(source=self.source, ckan_id=self.catalogue.jeux[0]['id'])
+        self.assertEqual(decompresser(archive.contenu), self.catalogue.jeux[0])
+        self.assertEqual(ArchiveJeuDonnees.objects.filter(source=self.source).count(), 8)
+        
+        dates = dict(ArchiveJeuDonnees.objects.values_list('ckan_id', 'date_archivage'))
+        # Un champ non normalisé ne change pas le jeu, mais bien sa réponse archivée
+        self.catalogue.jeux[1] = {**self.catalogue.jeux[1], 'champ_inconnu': 'valeur'}
+        bilan = importer_jeux(service, self.catalogue.jeux)
+        
+        self.assertEqual(bilan['inchanges'], 8)
+        reecrites = {
+            ckan_id for ckan_id, date in ArchiveJeuDonnees.objects.values_list('ckan_id', 'date_archivage')
+            if date != dates[ckan_id]
+        }
+        self.assertEqual(reecrites, {self.catalogue.jeux[1]['id']})
+        archive = ArchiveJeuDonnees.objects.get(source=self.source, ckan_id=self.catalogue.jeux[1]['id'])
+        self.assertEqual(decompresser(archive.contenu)['champ_inconnu'], 'valeur')
+    
+    def test_archivage_desactive(self):
+        """Test qu'aucune réponse n'est archivée si l'archivage est désactivé"""
+        with override_settings(MOISSONNAGE_ARCHIVE_BRUTE=False):
+            importer_jeux(ServiceMoissonnage(source=self.source), self.catalogue.jeux)
+        
+        self.assertEqual(JeuDonnees.objects.filter(source=self.source).count(), 8)
+        self.assertFalse(ArchiveJeuDonnees.objects.exists())
+    
+    def test_reprocess_sans_reseau(self):
+        """Test que reprocess reconstruit les champs dérivés depuis l'archive, sans appel réseau"""
+        importer_jeux(ServiceMoissonnage(source=self.source), self.catalogue.jeux)
+        
+        sortie = StringIO()
+        # Nouvelle règle d'extraction des étiquettes
+        with patch.object(ServiceMoissonnage, '_extraire_etiquettes', return_value='retraite'), \
+                patch('moissonneur.client_ckan.ClientCkan.appeler', side_effect=AssertionError("appel réseau")):
+            call_command('reprocess', '--source', 'Archive', '--taille-lot', '3', stdout=sortie)
+        
+        self.assertEqual(set(JeuDonnees.objects.values_list('etiquettes', flat=True)), {'retraite'})
+        self.assertIn('8 jeux relus', sortie.getvalue())
+        self.assertIn('8 réécrits, 0 inchangés', sortie.getvalue())
+        
+        sortie = StringIO()
+        with patch.object(ServiceMoissonnage, '_extraire_etiquettes', return_value='retraite'):
+            call_command('reprocess', stdout=sortie)
+        self.assertIn('0 réécrits, 8 inchangés', sortie.getvalue())
+    
+    def test_reprocess_source_sans_archive(self):
+        """Test qu'une source sans archive est signalée"""
+        with self.assertRaisesMessage(CommandError, 'Aucune archive pour la source'):
+            call_command('reprocess', '--source', 'Archive', stdout=StringIO())
+
+
+class LecteurJsonTest(TestCase):
+    """Tests pour la lecture incrémentale des réponses JSON"""
+    
+    def _blocs(self, contenu, taille=3):
+        corps = json.dumps(contenu, ensure_ascii=False).encode('utf-8')
+        return [corps[i:i + taille] for i in range(0, len(corps), taille)]
+    
+    def test_lecture_par_petits_blocs(self):
+        """Test que les clés et éléments sont décodés quel que soit le découpage (UTF-8 multioctet, nombres)"""
+        document = {'success': True, 'result': {'count': 12345, 'results': [{'titre': 'Québec é'}, 67890, [], 'ç']}}
+        
+        for taille in (1, 2, 5, 1000):
+            with self.subTest(taille=taille):
+                lecteur = LecteurJson(self._blocs(document, taille))
+                lus = {}
+                for cle in lecteur.cles():
+                    if cle != 'result':
+                        lus[cle] = lecteur.valeur()
+                        continue
+                    for cle_resultat in lecteur.cles():
+                        lus[cle_resultat] = list(lecteur.elements()) if cle_resultat == 'results' else lecteur.valeur()
+                self.assertEqual(lus, {'success': True, **document['result']})
+    
+    def test_document_tronque(self):
+        """Test qu'un document tronqué lève ErreurFluxJson"""
+        lecteur = LecteurJson([b'[{"a": 1}, {"b"'])
+        elements = lecteur.elements()
+        
+        self.assertEqual(next(elements), {'a': 1})
+        with self.assertRaises(ErreurFluxJson):
+            next(elements)
+    
+    def test_client_en_flux(self):
+        """Test que le client lit l'enveloppe CKAN jusqu'au tableau puis produit les jeux un à un"""
+        page = {'help': 'aide', 'success': True, 'result': {'count': 2, 'results': [{'name': 'a'}, {'name': 'b'}]}}
+        reponse = Mock(status_code=200)
+        reponse.iter_content.return_value = self._blocs(page)
+        session = Mock()
+        session.get.return_value = reponse
+        client = ClientCkan('https://ckan.example.com/api/3/action/', session=session)
+        
+        entete, jeux = client.appeler_en_flux('package_search', {'rows': 2})
+        
+        self.assertEqual(entete, {'count': 2})
+        self.assertTrue(session.get.call_args.kwargs['stream'])
+        self.assertEqual([jeu['name'] for jeu in jeux], ['a', 'b'])
+        reponse.close.assert_called_once()
+        
+        reponse.iter_content.return_value = self._blocs({'success': False, 'error': {'message': 'Accès refusé'}})
+        with self.assertRaises(ErreurCkan):
+            client.appeler_en_flux('package_search')
+
+class ClientCkanTest(TestCase):
+    """Tests pour les tentatives, Retry-After et la limitation de débit du client CKAN"""
+    
+    def _reponse(self, statut, resultat=None, entetes=None):
+        reponse = Mock(status_code=statut, headers=entetes or {})
+        reponse.json.return_value = {'success': True, 'result': resultat}
+        if statut >= 400:
+            reponse.raise_for_status.side_effect = requests.HTTPError(str(statut), response=reponse)
+        return reponse
+    
+    def _client(self, *reponses, **options):
+        session = Mock()
+        session.get.side_effect = list(reponses)
+        return ClientCkan('https://ckan.example.com/api/3/action/', session=session, concurrence=4, **options)
+    
+    @patch('moissonneur.client_ckan.time.sleep')
+    def test_nouvelles_tentatives_sur_erreurs_transitoires(self, sommeil):
+        """Test qu'un 502 ou une coupure réseau sont retentés avec une attente croissante"""
+        client = self._client(self._reponse(502), requests.ConnectionError("coupure"), self._reponse(200, ['a', 'b']))
+        
+        self.assertEqual(client.appeler('package_list'), ['a', 'b'])
+        self.assertEqual(client.nouvelles_tentatives, 2)
+        self.assertEqual(sommeil.call_count, 2)
+        self.assertLessEqual(sommeil.call_args_list[1].args[0], 1.0)
+        self.assertEqual(client.session.get.call_args.kwargs['timeout'], (10, 60))
+    
+    @patch('moissonneur.client_ckan.time.sleep')
+    def test_retry_after_et_reduction_de_la_concurrence(self, sommeil):
+        """Test qu'un 429 respecte Retry-After et divise la concurrence"""
+        client = self._client(self._reponse(429, entetes={'Retry-After': '3'}), self._reponse(200, []))
+        
+        client.appeler('package_search', {'rows': 10})
+        
+        self.assertGreaterEqual(sommeil.call_args.args[0], 3)
+        self.assertEqual(client.limiteur.concurrence, 3)
+    
+    @patch('moissonneur.client_ckan.time.sleep')
+    def test_echec_definitif(self, sommeil):
+        """Test des erreurs non retentées et de l'épuisement des tentatives"""
+        client = self._client(self._reponse(404))
+        with self.assertRaises(requests.HTTPError):
+            client.appeler('package_show', {'id': 'absent'})
+        self.assertEqual(client.session.get.call_count, 1)
+        
+        client = self._client(*[self._reponse(503)] * 4)
+        with self.assertRaises(ErreurCkan):
+            client.appeler('package_list')
+        self.assertEqual(client.session.get.call_count, 4)
+        
+        reponse = self._reponse(200)
+        reponse.json.return_value = {'success': True}
+        with self.assertRaisesMessage(ErreurCkan, 'package_list: champ result absent de la réponse'):
+            self._client(reponse).appeler('package_list')
+    
+    def test_seau_a_jetons(self):
+        """Test que le débit est limité une fois la capacité du seau consommée"""
+        limiteur = LimiteurDebit(debit=20, concurrence=10)
+        debut = chrono.monotonic()
+        for _ in range(25):
+            limiteur.acquerir()
+            limiteur.liberer()
+        self.assertGreaterEqual(chrono.monotonic() - debut, 0.2)
+    
+    def test_moissonnage_malgre_un_portail_instable(self):
+        """Test qu'un moissonnage contre un portail renvoyant des 503 récupère tout le catalogue"""
+        cache.clear()
+        with ServeurCkanFactice(CatalogueSynthetique(organisations=2, jeux=30), taux_erreur=0.2, graine=3) as serveur:
+            source = SourceDonnees.objects.create(nom="Instable", url_base=serveur.url_base, taille_page=10)
+            service = ServiceMoissonnage(source=source)
+            service.client.delai_base = 0.001
+            execution = ExecuteurMoissonnage(MoissonnageExecution.objects.create(source=source), service).executer()
+        
+        self.assertEqual(execution.statut, 'terminee')
+        self.assertEqual((execution.jeux_donnees, execution.erreurs_recuperation), (30, 0))
+        self.assertGreater(service.client.nouvelles_tentatives, 0)
+        # Chaque tentative est mesurée: les erreurs sont celles qui ont été retentées
+        http = execution.telemetrie['http']
+        self.assertEqual(http['erreurs'], service.client.nouvelles_tentatives)
+        self.assertGreater(http['octets'], 0)
+        self.assertEqual(http['actions']['package_search']['latence']['nombre'], http['actions']['package_search']['appels'])
+        self.assertEqual(execution.telemetrie['lignes'][JeuDonnees._meta.db_table], 30)
+        self.assertGreater(execution.telemetrie['bd']['INSERT']['requetes'], 0)
+        self.assertIn('recomptage_categories', execution.telemetrie['etapes'])
+
+class TelemetrieTest(TestCase):
+    """Tests pour la télémétrie des moissonnages et son exposition Prometheus"""
+    
+    def test_percentiles_et_cumul_des_tentatives(self):
+        """Test de l'estimation des percentiles et du cumul d'un instantané rechargé"""
+        telemetrie = Telemetrie()
+        for latence in [0.02] * 9 + [3.0]:
+            telemetrie.appel_http('package_search', latence, octets=100)
+        telemetrie.appel_http('package_show', 0.5, erreur=True)
+        with telemetrie.etape('ecriture_lots'):
+            pass
+        
+        instantane = telemetrie.instantane()
+        self.assertEqual((instantane['http']['appels'], instantane['http']['erreurs']), (11, 1))
+        self.assertEqual(instantane['http']['octets'], 1000)
+        percentiles = instantane['http']['actions']['package_search']['percentiles']
+        self.assertTrue(0.01 < percentiles['p50'] <= 0.025)
+        self.assertTrue(2.5 < percentiles['p99'] <= 5.0)
+        
+        # Une reprise poursuit les mesures de la tentative précédente
+        reprise = Telemetrie()
+        reprise.charger(json.loads(json.dumps(instantane)))
+        reprise.appel_http('package_search', 0.02)
+        instantane = reprise.instantane()
+        self.assertEqual(instantane['http']['actions']['package_search']['appels'], 11)
+        self.assertEqual(instantane['etapes']['ecriture_lots']['nombre'], 1)
+    
+    def test_requetes_bd_du_fil_courant(self):
+        """Test que les requêtes SQL émises dans le bloc sont comptées par type"""
+        telemetrie = Telemetrie()
+        with telemetrie.requetes_bd():
+            SourceDonnees.objects.create(nom="Mesurée", url_base="https://ckan.example.com/api/3/action/")
+            SourceDonnees.objects.filter(nom="Mesurée").exists()
+        SourceDonnees.objects.count()
+        
+        bd = telemetrie.instantane()['bd']
+        self.assertEqual(bd['INSERT']['requetes'], 1)
+        self.assertEqual(bd['SELECT']['requetes'], 1)
+    
+    def test_metriques_prometheus(self):
+        """Test de l'exposition de la dernière exécution de chaque source au format texte Prometheus"""
+        source = SourceDonnees.objects.create(nom='Portail "test"', url_base="https://ckan.example.com/api/3/action/")
+        MoissonnageExecution.objects.create(source=source, statut='echouee')
+        telemetrie = Telemetrie()
+        telemetrie.appel_http('package_search', 0.2, octets=2048)
+        telemetrie.appel_http('package_search', 7.0)
+        telemetrie.lignes_ecrites('donnees_jeudonnees', 12)
+        MoissonnageExecution.objects.create(
+            source=source, statut='terminee', durees={'jeux_donnees': 7.5}, telemetrie=telemetrie.instantane()
+        )
+        
+        reponse = self.client.get('/moissonnage/metriques/')
+        
+        self.assertEqual(reponse['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        lignes = reponse.content.decode().splitlines()
+        etiquettes = 'source="Portail \\"test\\"",action="package_search"'
+        self.assertIn('moissonnage_executions{statut="echouee"} 1', lignes)
+        self.assertIn('# TYPE moissonnage_http_latence_secondes histogram', lignes)
+        self.assertIn(f'moissonnage_http_latence_secondes_bucket{{{etiquettes},le="0.25"}} 1', lignes)
+        self.assertIn(f'moissonnage_http_latence_secondes_bucket{{{etiquettes},le="+Inf"}} 2', lignes)
+        self.assertIn(f'moissonnage_http_latence_secondes_count{{{etiquettes}}} 2', lignes)
+        self.assertIn(f'moissonnage_http_octets_recus_total{{{etiquettes}}} 2048', lignes)
+        self.assertIn('moissonnage_lignes_ecrites_total{source="Portail \\"test\\"",table="donnees_jeudonnees"} 12', lignes)
+        self.assertIn('moissonnage_phase_duree_secondes{source="Portail \\"test\\"",phase="jeux_donnees"} 7.5', lignes)
+        # Seule la dernière exécution de la source est décrite
+        self.assertEqual(sum(ligne.startswith('moissonnage_derniere_execution_info') for ligne in lignes), 1)
+
+class RapporteurProgressionTest(TestCase):
+    """Tests pour la publication de la progression dans le cache"""
+    
+    def setUp(self):
+        cache.clear()
+        source = SourceDonnees.objects.create(nom="CKAN test", url_base="https://ckan.example.com/api/3/action/")
+        self.execution = MoissonnageExecution.objects.create(source=source, statut='en_cours')
+    
+    def test_publication_par_intervalle_et_par_pas(self):
+        """Test que la progression n'est publiée qu'une fois par intervalle ou par pas"""
+        rapporteur = RapporteurProgression(self.execution, intervalle=60, pas=50)
+        
+        for jeux in range(1, 51):
+            self.execution.jeux_donnees = jeux
+            rapporteur.signaler()
+        self.assertEqual(rapporteur.publications, 1)
+        self.assertEqual(lire_progression(self.execution)['jeux_donnees'], 1)
+        
+        self.execution.jeux_donnees = 51
+        rapporteur.signaler()
+        self.assertEqual(rapporteur.publications, 2)
+        self.assertEqual(lire_progression(self.execution)['jeux_donnees'], 51)
+    
+    def test_arret_lu_a_la_publication(self):
+        """Test que la demande d'arrêt est transmise par le cache et la base"""
+        rapporteur = RapporteurProgression(self.execution, intervalle=60)
+        self.assertFalse(rapporteur.signaler())
+        
+        demander_arret(self.execution)
+        
+        self.assertTrue(rapporteur.signaler(force=True))
+        self.execution.refresh_from_db()
+        self.assertTrue(self.execution.arret_demande)
+    
+    def test_debit_et_temps_restant(self):
+        """Test du calcul du débit et du temps restant"""
+        self.execution.phase = 'jeux_donnees'
+        self.execution.total_jeux_donnees = 100
+        rapporteur = RapporteurProgression(self.execution)
+        self.execution.jeux_donnees = 20
+        
+        debit, eta = rapporteur.mesurer(rapporteur._debut + 10)
+        
+        self.assertEqual((debit, eta), (2.0, 40))
+    
+    def test_flux_sans_lecture_en_base(self):
+        """Test que le flux SSE est servi depuis le cache, sans requête SQL"""
+        en_cours = instantane_execution(self.execution)
+        terminee = dict(en_cours, statut='terminee', progression=100)
+        lectures = iter([en_cours, en_cours, terminee])
+        
+        with patch('moissonneur.progression.cache.get', side_effect=lambda cle: next(lectures)), \
+                self.assertNumQueries(0):
+            evenements = list(evenements_progression(self.execution, intervalle=0))
+        
+        self.assertEqual(evenements[0], 'retry: 2000\n\n')
+        self.assertEqual([e.split('\n')[0] for e in evenements[1:]], ['event: progression'] * 2 + ['event: fin'])
+        self.assertIn('"statut": "terminee"', evenements[2])
+    
+    def test_vue_flux(self):
+        """Test de l'endpoint text/event-stream"""
+        self.execution.statut = 'terminee'
+        cache.set(cle_progression(self.execution.pk), instantane_execution(self.execution))
+        
+        reponse = self.client.get(f'/moissonnage/ajax/flux/{self.execution.pk}/')
+        
+        self.assertEqual(reponse['Content-Type'], 'text/event-stream')
+        contenu = b''.join(reponse.streaming_content).decode()
+        self.assertIn('event: fin', contenu)
+    
+    async def test_flux_asynchrone_sous_asgi(self):
+        """Test que le flux servi en ASGI attend avec asyncio, sans bloquer de fil"""
+        en_cours = instantane_execution(self.execution)
+        terminee = dict(en_cours, statut='terminee', progression=100)
+        
+        with patch('moissonneur.progression.cache.aget', AsyncMock(side_effect=[en_cours, en_cours, terminee])), \
+                patch('moissonneur.progression.time.sleep', side_effect=AssertionError("attente bloquante")):
+            reponse = await self.async_client.get(f'/moissonnage/ajax/flux/{self.execution.pk}/')
+            self.assertTrue(reponse.is_async)
+            evenements = [evenement async for evenement in reponse.streaming_content]
+        
+        self.assertEqual([e.decode().split('\n')[0] for e in evenements[1:]], ['event: progression'] * 2 + ['event: fin'])
+
+
+class PlanificationTest(TestCase):
+    """Tests pour le calcul des prochaines exécutions et le déclenchement planifié"""
+    
+    def setUp(self):
+        self.source = SourceDonnees.objects.create(nom="CKAN test", url_base="https://ckan.example.com/api/3/action/")
+        # Mercredi 15 janvier 2025, 10h30
+        self.maintenant = timezone.make_aware(datetime(2025, 1, 15, 10, 30))
+    
+    def _date(self, *args):
+        return timezone.make_aware(datetime(*args))
+    
+    def test_expression_cron(self):
+        """Test du calcul de la prochaine occurrence d'expressions cron"""
+        cas = {
+            '0 3 * * *': self._date(2025, 1, 16, 3, 0),
+            '*/15 * * * *': self._date(2025, 1, 15, 10, 45),
+            '0 9-17/4 * * MON-FRI': self._date(2025, 1, 15, 13, 0),
+            '0 0 * * 0': self._date(2025, 1, 19, 0, 0),
+            '0 0 * * 7': self._date(2025, 1, 19, 0, 0),
+            '0 0 1 * 5': self._date(2025, 1, 17, 0, 0),  # jour du mois OU vendredi
+            '30 2 29 2 *': self._date(2028, 2, 29, 2, 30),
+        }
+        for expression, attendu in cas.items():
+            with self.subTest(expression=expression):
+                self.assertEqual(ExpressionCron(expression).prochaine(self.maintenant), attendu)
+    
+    def test_expression_cron_invalide(self):
+        """Test que les expressions invalides sont refusées"""
+        for expression in ['', '0 3 * *', '60 * * * *', '0 5-2 * * *', '*/0 * * * *', 'a b c d e']:
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError):
+                    ExpressionCron(expression)
+    
+    def test_prochaine_execution_par_frequence(self):
+        """Test du calcul selon la fréquence de la planification"""
+        planification = ConfigurationPlanification(
+            source=self.source, frequence='hebdomadaire', heure_execution=time(3, 0), jour_semaine=0
+        )
+        self.assertEqual(prochaine_execution(planification, self.maintenant), self._date(2025, 1, 20, 3, 0))
+        
+        planification.frequence = 'mensuel'
+        planification.jour_mois = 31
+        self.assertEqual(prochaine_execution(planification, self._date(2025, 2, 1)), self._date(2025, 2, 28, 3, 0))
+        
+        planification.frequence = 'quotidien'
+        self.assertEqual(prochaine_execution(planification, self.maintenant), self._date(2025, 1, 16, 3, 0))
+        
+        planification.frequence = 'personnalise'
+        planification.expression_cron = 'invalide'
+        with self.assertRaises(ValueError):
+            prochaine_execution(planification, self.maintenant)
+    
+    def test_declenchement_avec_filtres_et_plafond(self):
+        """Test que les planifications dues sont mises en file avec leurs filtres, dans la limite du plafond"""
+        autre_source = SourceDonnees.objects.create(nom="Autre CKAN", url_base="https://autre.example.com/api/3/action/")
+        filtres = ConfigurationFiltres.objects.create(nom="Transport", source=self.source)
+        echeance = self.maintenant - timedelta(minutes=5)
+        premiere = ConfigurationPlanification.objects.create(
+            nom="Nuit", source=self.source, configuration_filtres=filtres, active=True,
+            prochaine_execution=echeance
+        )
+        seconde = ConfigurationPlanification.objects.create(
+            nom="Autre", source=autre_source, active=True, prochaine_execution=echeance + timedelta(minutes=1)
+        )
+        ConfigurationPlanification.objects.create(
+            nom="Future", source=autre_source, active=True, prochaine_execution=self.maintenant + timedelta(hours=1)
+        )
+        
+        bilan = declencher_planifications_dues(self.maintenant, max_concurrence=1)
+        
+        self.assertEqual(len(bilan['declenchees']), 1)
+        self.assertEqual(bilan['differees'], 1)
+        execution = bilan['declenchees'][0]
+        self.assertEqual(execution.configuration_filtres, filtres)
+        self.assertEqual(execution.planification, premiere)
+        premiere.refresh_from_db()
+        self.assertEqual(premiere.derniere_execution, self.maintenant)
+        self.assertEqual(premiere.prochaine_execution, self._date(2025, 1, 16, 3, 0))
+        seconde.refresh_from_db()
+        self.assertEqual(seconde.prochaine_execution, echeance + timedelta(minutes=1))
+        self.assertIsNone(seconde.derniere_execution)
+        
+        # Au tour suivant, la source encore en file saute son occurrence
+        premiere.prochaine_execution = echeance
+        premiere.save()
+        bilan = declencher_planifications_dues(self.maintenant, max_concurrence=2)
+        self.assertEqual(len(bilan['declenchees']), 1)
+        self.assertEqual(bilan['declenchees'][0].source, autre_source)
+        self.assertEqual(bilan['ignorees'], 1)
+        self.assertEqual(MoissonnageExecution.objects.filter(source=self.source).count(), 1)
+
+
+class RunSchedulerTest(TransactionTestCase):
+    """Test de la commande run_scheduler (qui recycle les connexions comme un démon)"""
+    
+    def test_commande_run_scheduler(self):
+        """Test que la commande initialise et déclenche les planifications"""
+        planification = ConfigurationPlanification.objects.create(
+            nom="Nuit", source=SourceDonnees.objects.create(nom="CKAN test", url_base="https://ckan.example.com/api/3/action/"),
+            active=True, frequence='personnalise', expression_cron='* * * * *'
+        )
+        sortie = StringIO()
+        
+        call_command('run_scheduler', '--une-fois', stdout=sortie)
+        
+        planification.refresh_from_db()
+        self.assertIsNotNone(planification.prochaine_execution)
+        self.assertFalse(MoissonnageExecution.objects.exists())
+        self.assertIn('Planificateur arrêté', sortie.getvalue())
+
@@ -7,5 +7,7 @@ urlpatterns = [
     path('ajax/', views.moissonnage_ajax, name='moissonnage_ajax'),
     path('ajax/complet/', views.moissonnage_complet_ajax, name='moissonnage_complet_ajax'),
     path('ajax/statut/', views.moissonnage_statut, name='moissonnage_statut'),
+    path('ajax/flux/<int:execution_id>/', views.moissonnage_flux, name='moissonnage_flux'),
     path('ajax/arreter/', views.moissonnage_arreter, name='moissonnage_arreter'),
+    path('metriques/', views.moissonnage_metriques, name='moissonnage_metriques'),
 ]
@@ -1,10 +1,18 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import aget_object_or_404, render, redirect
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, OuterRef, Subquery
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
+from .models import MoissonnageExecution
+from .progression import aevenements_progression, demander_arret, evenements_progression, lire_progression
 from .services import ServiceMoissonnage
+from .telemetrie import TYPE_CONTENU_PROMETHEUS, exposition_prometheus
 from donnees.models import Organisation, JeuDonnees, Ressource
-import threading
+import json
+
+# Durée (secondes) d'un flux SSE servi par un worker WSGI synchrone
+DUREE_FLUX_WSGI = 5
 
 def page_moissonnage(request):
     """Page principale du moissonnage"""
@@ -16,82 +24,13 @@ def page_moissonnage(request):
     return render(request, 'moissonneur/moissonnage.html', context)
 
 def declencher_moissonnage(request):
-    """Déclenche le processus de moissonnage"""
+    """Met un moissonnage en file d'attente (exécuté par harvest_worker)"""
     if request.method == 'POST':
         try:
-            service = ServiceMoissonnage()
-            
-            # Étape 1: Récupérer et sauvegarder les organisations
-            organisations_api = service.recuperer_organisations()
-            organisations_sauvegardees = 0
-            
-            for nom_org in organisations_api:
-                details_org = service.recuperer_details_organisation(nom_org)
-                if details_org:
-                    organisation = service.sauvegarder_organisation(details_org)
-                    if organisation:
-                        organisations_sauvegardees += 1
-            
-            # Étape 2: Récupérer et sauvegarder les jeux de données
-            jeux_donnees_api = service.recuperer_jeux_donnees()
-            jeux_sauvegardes = 0
-            ressources_sauvegardees = 0
-            erreurs_jeux = 0
-            
-            print(f"Traitement de {len(jeux_donnees_api)} jeux de données...")
-            
-            for nom_jeu in jeux_donnees_api:
-                details_jeu = service.recuperer_details_jeu_donnees(nom_jeu)
-                if details_jeu:
-                    # Trouver l'organisation
-                    org_data = details_jeu.get('organization')
-                    if org_data:
-                        org_name = org_data.get('name') or org_data.get('title', '')
-                    else:
-                        org_name = ''
-                    
-                    if org_name:
-                        # Essayer de trouver l'organisation par son nom exact ou par titre
-                        organisation = None
-                        try:
-                            organisation = Organisation.objects.filter(
-                                nom__icontains=org_name
-                            ).first()
-                        except:
-                            pass
-                        
-                        if not organisation:
-                            # Créer l'organisation si elle n'existe pas
-                            org_details = service.recuperer_details_organisation(org_name)
-                            if org_details:
-                                organisation = service.sauvegarder_organisation(org_details)
-                        
-                        if organisation:
-                            # Sauvegarder le jeu de données
-                            jeu_donnees = service.sauvegarder_jeu_donnees(details_jeu, organisation)
-                            if jeu_donnees:
-                                jeux_sauvegardes += 1
-                                
-                                # Sauvegarder les ressources
-                                ressources_sauvegardees += service.sauvegarder_ressources(details_jeu, jeu_donnees)
-                            else:
-                                erreurs_jeux += 1
-                        else:
-                            erreurs_jeux += 1
-                    else:
-                        erreurs_jeux += 1
-                else:
-                    erreurs_jeux += 1
-            
-            if erreurs_jeux > 0:
-                print(f"⚠️ {erreurs_jeux} jeux de données n'ont pas pu être sauvegardés")
-            
-            messages.success(request, 
-                f"Moissonnage terminé ! "
-                f"Organisations: {organisations_sauvegardees}, "
-                f"Jeux de données: {jeux_sauvegardes}, "
-                f"Ressources: {ressources_sauvegardees}"
-            )
+            mode = 'incremental' if request.POST.get('mode') == 'incremental' else 'complet'
+            execution = MoissonnageExecution.mettre_en_file(ServiceMoissonnage.source_par_defaut(), mode)
+            request.session['moissonnage_execution'] = execution.pk
+            messages.success(request, f"Moissonnage #{execution.pk} en file d'attente ({execution.get_statut_display()})")
             
         except Exception as e:
             messages.error(request, f"Erreur lors du moissonnage: {str(e)}")
@@ -132,169 +71,112 @@ def moissonnage_ajax(request):
     return JsonResponse({'success': False, 'message': 'Méthode non autorisée'})
 
 def moissonnage_complet_ajax(request):
-    """Démarre le moissonnage complet en arrière-plan"""
+    """
+    Met le moissonnage complet en file d'attente
+    
+    L'exécution est réalisée par la commande harvest_worker, hors du serveur web.
+    Un second clic retourne l'exécution déjà en file ou en cours; une exécution
+    arrêtée ou échouée du même mode reprend depuis son dernier point de reprise.
+    """
     if request.method == 'POST':
-        # Initialiser la session pour stocker la progression
-        request.session['moissonnage_en_cours'] = True
-        request.session['moissonnage_arrete'] = False
-        request.session['moissonnage_progression'] = 0
-        request.session['moissonnage_message'] = 'Initialisation...'
-        request.session['moissonnage_organisations'] = 0
-        request.session['moissonnage_jeux'] = 0
-        request.session['moissonnage_ressources'] = 0
-        request.session.save()
+        try:
+            parametres = json.loads(request.body or '{}')
+        except ValueError:
+            parametres = {}
+        mode = 'incremental' if parametres.get('mode') == 'incremental' else 'complet'
         
-        # Démarrer le moissonnage dans un thread séparé
-        thread = threading.Thread(target=executer_moissonnage_complet, args=(request.session.session_key,))
-        thread.daemon = True
-        thread.start()
+        execution = MoissonnageExecution.mettre_en_file(ServiceMoissonnage.source_par_defaut(), mode)
+        request.session['moissonnage_execution'] = execution.pk
         
         return JsonResponse({
             'success': True,
-            'message': 'Moissonnage démarré',
-            'progression': 0
+            'message': 'Moissonnage repris' if execution.date_debut else 'Moissonnage en file d\'attente',
+            'execution': execution.pk,
+            'statut': execution.statut,
+            'progression': execution.progression
         })
     
     return JsonResponse({'success': False, 'message': 'Méthode non autorisée'})
 
-def executer_moissonnage_complet(session_key):
-    """Exécute le moissonnage complet dans un thread séparé"""
-    from django.contrib.sessions.models import Session
-    from django.contrib.sessions.backends.db import SessionStore
-    
-    session_store = SessionStore(session_key=session_key)
-    service = ServiceMoissonnage()
-    
-    try:
-        # Étape 1: Organisations
-        session_store['moissonnage_message'] = 'Récupération des organisations...'
-        session_store['moissonnage_progression'] = 5
-        session_store.save()
-        
-        organisations_api = service.recuperer_organisations()
-        total_orgs = len(organisations_api)
-        organisations_sauvegardees = 0
-        
-        for idx, nom_org in enumerate(organisations_api):
-            if session_store.get('moissonnage_arrete', False):
-                session_store['moissonnage_message'] = '⚠️ Moissonnage arrêté'
-                session_store['moissonnage_en_cours'] = False
-                session_store.save()
-                return
-            
-            details_org = service.recuperer_details_organisation(nom_org)
-            if details_org:
-                organisation = service.sauvegarder_organisation(details_org)
-                if organisation:
-                    organisations_sauvegardees += 1
-            
-            # Mettre à jour la progression (5% à 25%)
-            progression = 5 + int((idx + 1) / total_orgs * 20)
-            session_store['moissonnage_progression'] = progression
-            session_store['moissonnage_organisations'] = organisations_sauvegardees
-            session_store.save()
-        
-        # Étape 2: Jeux de données
-        session_store['moissonnage_message'] = 'Récupération des jeux de données...'
-        session_store['moissonnage_progression'] = 25
-        session_store.save()
-        
-        jeux_donnees_api = service.recuperer_jeux_donnees()
-        total_jeux = len(jeux_donnees_api)
-        jeux_sauvegardes = 0
-        ressources_sauvegardees = 0
-        erreurs_jeux = 0
-        
-        for idx, nom_jeu in enumerate(jeux_donnees_api):
-            if session_store.get('moissonnage_arrete', False):
-                session_store['moissonnage_message'] = '⚠️ Moissonnage arrêté'
-                session_store['moissonnage_en_cours'] = False
-                session_store.save()
-                return
-            
-            # Mettre à jour la progression (25% à 95%)
-            progression = 25 + int((idx + 1) / total_jeux * 70)
-            session_store['moissonnage_progression'] = progression
-            session_store['moissonnage_message'] = f'Traitement des jeux de données ({idx + 1}/{total_jeux})...'
-            session_store.save()
-            
-            details_jeu = service.recuperer_details_jeu_donnees(nom_jeu)
-            if details_jeu:
-                org_data = details_jeu.get('organization')
-                if org_data:
-                    org_name = org_data.get('name') or org_data.get('title', '')
-                else:
-                    org_name = ''
-                
-                if org_name:
-                    organisation = None
-                    try:
-                        organisation = Organisation.objects.filter(
-                            nom__icontains=org_name
-                        ).first()
-                    except:
-                        pass
-                    
-                    if not organisation:
-                        org_details = service.recuperer_details_organisation(org_name)
-                        if org_details:
-                            organisation = service.sauvegarder_organisation(org_details)
-                    
-                    if organisation:
-                        jeu_donnees = service.sauvegarder_jeu_donnees(details_jeu, organisation)
-                        if jeu_donnees:
-                            jeux_sauvegardes += 1
-                            ressources_sauvegardees += service.sauvegarder_ressources(details_jeu, jeu_donnees)
-                        else:
-                            erreurs_jeux += 1
-                    else:
-                        erreurs_jeux += 1
-                else:
-                    erreurs_jeux += 1
-            else:
-                erreurs_jeux += 1
-            
-            # Mettre à jour les compteurs
-            session_store['moissonnage_jeux'] = jeux_sauvegardes
-            session_store['moissonnage_ressources'] = ressources_sauvegardees
-            session_store.save()
-        
-        # Terminé
-        session_store['moissonnage_progression'] = 100
-        session_store['moissonnage_message'] = f'✅ Terminé ! Organisations: {organisations_sauvegardees}, Jeux: {jeux_sauvegardes}, Ressources: {ressources_sauvegardees}'
-        session_store['moissonnage_en_cours'] = False
-        session_store.save()
-        
-    except Exception as e:
-        session_store['moissonnage_message'] = f'❌ Erreur: {str(e)}'
-        session_store['moissonnage_en_cours'] = False
-        session_store.save()
+def _execution_suivie(request):
+    """Exécution suivie par la session, à défaut la plus récente"""
+    execution_id = request.session.get('moissonnage_execution')
+    executions = MoissonnageExecution.objects.all()
+    if execution_id:
+        execution = executions.filter(pk=execution_id).first()
+        if execution:
+            return execution
+    return executions.first()
 
 @require_http_methods(["GET"])
 def moissonnage_statut(request):
-    """Récupère le statut du moissonnage en cours"""
-    progression = request.session.get('moissonnage_progression', 0)
-    message = request.session.get('moissonnage_message', 'Aucun moissonnage en cours')
-    en_cours = request.session.get('moissonnage_en_cours', False)
-    organisations = request.session.get('moissonnage_organisations', 0)
-    jeux = request.session.get('moissonnage_jeux', 0)
-    ressources = request.session.get('moissonnage_ressources', 0)
+    """Récupère le statut du moissonnage en cours (progression publiée dans le cache)"""
+    execution = _execution_suivie(request)
+    if execution is None:
+        return JsonResponse({
+            'en_cours': False, 'progression': 0, 'message': 'Aucun moissonnage en cours',
+            'organisations': 0, 'jeux': 0, 'ressources': 0
+        })
     
+    progression = lire_progression(execution)
     return JsonResponse({
-        'en_cours': en_cours,
-        'progression': progression,
-        'message': message,
-        'organisations': organisations,
-        'jeux': jeux,
-        'ressources': ressources
+        'execution': execution.pk,
+        'statut': progression['statut'],
+        'phase': progression['phase'],
+        'en_cours': progression['statut'] in MoissonnageExecution.STATUTS_ACTIFS,
+        'progression': progression['progression'],
+        'message': progression['message'] or "En attente d'un travailleur (harvest_worker)...",
+        'organisations': progression['organisations'],
+        'jeux': progression['jeux_donnees'],
+        'ressources': progression['ressources'],
+        'erreurs': progression['erreurs']
     })
 
+@require_http_methods(["GET"])
+async def moissonnage_flux(request, execution_id):
+    """
+    Flux Server-Sent Events de la progression d'une exécution
+    
+    Les observateurs lisent l'instantané publié dans le cache par l'exécution:
+    leur nombre ne multiplie pas les lectures en base. Servi par asgi.py, le
+    flux est asynchrone et dure jusqu'à la fin de l'exécution; sous WSGI, où
+    chaque flux ouvert occupe un worker, il est coupé après quelques secondes
+    et EventSource se reconnecte.
+    """
+    execution = await aget_object_or_404(MoissonnageExecution, pk=execution_id)
+    if isinstance(request, ASGIRequest):
+        evenements = aevenements_progression(execution)
+    else:
+        evenements = evenements_progression(execution, duree_max=DUREE_FLUX_WSGI)
+    reponse = StreamingHttpResponse(evenements, content_type='text/event-stream')
+    reponse['Cache-Control'] = 'no-cache'
+    # Désactive la mise en tampon des proxys (nginx) pour recevoir les événements au fil de l'eau
+    reponse['X-Accel-Buffering'] = 'no'
+    return reponse
+
 @require_http_methods(["POST"])
 def moissonnage_arreter(request):
     """Arrête le moissonnage en cours"""
-    request.session['moissonnage_arrete'] = True
-    request.session.save()
+    execution = _execution_suivie(request)
+    if execution is not None:
+        demander_arret(execution)
     return JsonResponse({
         'success': True,
         'message': 'Arrêt demandé'
     })
+
+@require_http_methods(["GET"])
+def moissonnage_metriques(request):
+    """
+    Métriques de moissonnage au format texte de Prometheus
+
+    Exécutions par statut et, pour la dernière exécution de chaque source,
+    durées des phases et des étapes, appels HTTP (latences, octets), requêtes SQL
+    et lignes écrites enregistrés dans sa télémétrie.
+    """
+    par_statut = dict(
+        MoissonnageExecution.objects.order_by().values_list('statut').annotate(nombre=Count('pk'))
+    )
+    plus_recente = MoissonnageExecution.objects.filter(source=OuterRef('source')).order_by('-date_creation').values('pk')[:1]
+    dernieres = MoissonnageExecution.objects.filter(pk=Subquery(plus_recente)).select_related('source').order_by('source__nom')
+    return HttpResponse(exposition_prometheus(par_statut, dernieres), content_type=TYPE_CONTENU_PROMETHEUS)
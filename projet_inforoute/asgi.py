@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Servi en ASGI, le flux de progression des moissonnages (Server-Sent Events)
+n'occupe aucun worker pendant qu'il est ouvert:
+
+    gunicorn projet_inforoute.asgi:application -k uvicorn.workers.UvicornWorker
 """
 
 import os
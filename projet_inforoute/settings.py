@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 
 # Import conditionnel pour le déploiement sur Render
 try:
@@ -105,6 +106,35 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # Attente (secondes) du verrou d'écriture avant « database is locked ». Les
+            # transactions des moissonnages parallèles d'un même processus sont en plus
+            # sérialisées par moissonneur.ecriture.VERROU_ECRITURE
+            'OPTIONS': {
+                'timeout': 30,
+            },
+        }
+    }
+
+
+# Cache
+# Partagé entre le serveur web et harvest_worker (progression des moissonnages,
+# tableau de bord de l'accueil). Sur Render, ce sont deux services sur des hôtes
+# distincts: le cache est une table de la base PostgreSQL commune, créée par
+# « manage.py createcachetable » (build.sh). En local, le serveur et le
+# travailleur tournent sur le même hôte: un cache sur disque suffit.
+
+if 'DATABASE_URL' in os.environ and dj_database_url:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'cache_projet_inforoute',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'projet_inforoute_cache')),
         }
     }
 
@@ -178,6 +208,34 @@ except ImportError:
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Configuration du moissonnage
+# Nombre de jeux de données écrits par transaction (bulk_create / bulk_update)
+MOISSONNAGE_TAILLE_LOT = int(os.environ.get('MOISSONNAGE_TAILLE_LOT', 500))
+# Capacité (jeux de données) de chaque file du pipeline récupération → normalisation → écriture
+MOISSONNAGE_TAILLE_FILE = int(os.environ.get('MOISSONNAGE_TAILLE_FILE', 1000))
+# Archiver les réponses CKAN brutes (compressées) pour rejouer la normalisation avec reprocess
+MOISSONNAGE_ARCHIVE_BRUTE = os.environ.get('MOISSONNAGE_ARCHIVE_BRUTE', 'True') == 'True'
+# Délai (secondes) sans point de reprise après lequel une exécution « en cours » est considérée interrompue
+MOISSONNAGE_DELAI_INACTIVITE = int(os.environ.get('MOISSONNAGE_DELAI_INACTIVITE', 600))
+# Appels CKAN: tentatives par appel (erreurs transitoires), délai de lecture (secondes)
+# et débit maximal par source en requêtes par seconde (0 = illimité)
+MOISSONNAGE_TENTATIVES_HTTP = int(os.environ.get('MOISSONNAGE_TENTATIVES_HTTP', 4))
+MOISSONNAGE_DELAI_EXPIRATION_HTTP = float(os.environ.get('MOISSONNAGE_DELAI_EXPIRATION_HTTP', 60))
+MOISSONNAGE_DEBIT_MAX = float(os.environ.get('MOISSONNAGE_DEBIT_MAX', 0))
+# Part maximale (0-1) des jeux ou ressources d'une source pouvant être supprimés en une exécution
+# (au-delà, l'élagage des lignes retirées en amont est annulé)
+MOISSONNAGE_SEUIL_SUPPRESSION = float(os.environ.get('MOISSONNAGE_SEUIL_SUPPRESSION', 0.1))
+# Nombre maximal de sources moissonnées en parallèle par un travailleur (harvest_worker, PostgreSQL seulement)
+MOISSONNAGE_SOURCES_PARALLELES = int(os.environ.get('MOISSONNAGE_SOURCES_PARALLELES', 4))
+# Nombre maximal de moissonnages en file ou en cours au-delà duquel run_scheduler diffère les planifications dues
+MOISSONNAGE_MAX_PLANIFIES = int(os.environ.get('MOISSONNAGE_MAX_PLANIFIES', 1))
+
+# Intervalle (secondes) entre deux publications de la progression d'un moissonnage dans le cache
+MOISSONNAGE_INTERVALLE_PROGRESSION = float(os.environ.get('MOISSONNAGE_INTERVALLE_PROGRESSION', 1))
+
+# Durée de vie (secondes) du tableau de bord de l'accueil en cache (invalidé en fin de moissonnage)
+TABLEAU_BORD_DUREE_CACHE = int(os.environ.get('TABLEAU_BORD_DUREE_CACHE', 900))
+
 # Configuration GraphQL
 GRAPHENE = {
     'SCHEMA': 'donnees.schema.schema'